@@ -1,9 +1,12 @@
 
 import ast
 import base64
-from collections import OrderedDict, Sequence, defaultdict
+import copy
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Sequence
 from functools import partial
 import gc
+import io
 from itertools import islice
 import math
 import multiprocessing
@@ -21,12 +24,16 @@ import pandas as pd
 import psutil
 from scipy import stats
 
+import data.columnar as columnar
 import data.submodule_loader as submodule_loader
 import data.testbed
 from data.progress import Progress
+from data.scheduler import MemoryAwareScheduler
+from data.util import RunningMoments, QuantileSketch
 
 import simulator.sim
 import simulator.Configuration as Configuration
+import simulator.DeterminismCheck as DeterminismCheck
 import simulator.SourcePeriodModel as SourcePeriodModel
 from simulator.Topology import TopologyId
 
@@ -183,6 +190,43 @@ def _parse_float_nan_if_none(x):
 def _parse_float_None_if_none(x):
     return None if x == "None" else np.float_(x)
 
+def _parse_compressed_literal(x):
+    return ast.literal_eval(zlib.decompress(base64.b64decode(x)).decode("utf-8"))
+
+def _row_for_safety_factor(row, cut_off_duration):
+    """Calculates the results of a row from an extended horizon run,
+    as if the run had stopped after cut_off_duration."""
+    if row["DurationStartTime"] is None or np.isnan(row["DurationStartTime"]):
+        cut_off_time = float('inf')
+    else:
+        cut_off_time = row["DurationStartTime"] + cut_off_duration
+
+    capture_times = row["SourceCaptureTime"].values()
+    capture_time = min(capture_times) if capture_times else float('inf')
+
+    captured = capture_time <= cut_off_time
+    end_time = min(row["TimeTaken"], capture_time, cut_off_time)
+
+    sent_receive = [(sent, rcvd) for (sent, rcvd) in row["NormalSentReceiveTimes"] if sent <= end_time]
+    latencies = [rcvd - sent for (sent, rcvd) in sent_receive if rcvd is not None and rcvd <= end_time]
+
+    # Match MetricsCommon.receive_ratio by discounting a message sent just before the end
+    if len(sent_receive) == 0:
+        receive_ratio = float('NaN')
+    elif len(latencies) == len(sent_receive):
+        receive_ratio = 1.0
+    else:
+        send_modifier = 1 if len(sent_receive) > 1 and np.isclose(max(sent for (sent, rcvd) in sent_receive), end_time, atol=0.07) else 0
+        receive_ratio = len(latencies) / (len(sent_receive) - send_modifier)
+
+    return pd.Series({
+        "Captured": captured,
+        "TimeTaken": end_time,
+        "ReceiveRatio": receive_ratio,
+        "NormalLatency": np.mean(latencies) if latencies else float('inf'),
+        "UniqueNormalGenerated": len(sent_receive),
+    })
+
 """
 def _energy_impact(columns, cached_cols, constants):
     # Magic constants are from Great Duck Island paper, in nanoamp hours
@@ -244,6 +288,56 @@ def _get_calculation_columns():
         "average_duty_cycle": _average_duty_cycle,
     }
 
+def _ci95(sample_mean, sample_sem, count):
+    #t_critical = stats.t.ppf(q=0.975, df=count-1) # 95% (two tailed)
+    #confidence_interval = (sample_mean - t_critical * sample_sem, sample_mean + t_critical * sample_sem)
+
+    # https://hamelg.blogspot.com/2015/11/python-for-data-analysis-part-23-point.html
+    if sample_sem == 0.0:
+        return 0
+    else:
+        confidence_interval_95 = stats.t.interval(
+            0.95,                   # Confidence level
+            df=count-1,
+            loc=sample_mean,
+            scale=sample_sem)
+
+        return confidence_interval_95[1] - sample_mean
+
+def _complete_lines_length(path, chunk_size=64 * 1024):
+    """The number of bytes in the file up to and including its last new line."""
+    with open(path, 'rb') as infile:
+        end = infile.seek(0, os.SEEK_END)
+
+        while end > 0:
+            start = max(0, end - chunk_size)
+            infile.seek(start)
+            chunk = infile.read(end - start)
+
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+
+            end = start
+
+    return 0
+
+def _attacker_model_counts(df):
+    """The number of rows for each attacker model, when several were evaluated in the same run."""
+    return Counter(df["AttackerModel"]) if "AttackerModel" in df.columns else Counter()
+
+def _check_determinism_verdict(lines, infile_path):
+    """Raises if the result file records that its determinism check failed."""
+    if any(line.startswith(DeterminismCheck.FAILED_META) for line in lines):
+        raise RuntimeError(f"The determinism check recorded in {infile_path} failed, so runs with the same seed gave different results")
+
+def _seed_check_columns(df):
+    """The columns that must be equal for rows with the same seed."""
+    columns_to_check = ["Seed", "Sent", "Received", "Delivered", "Captured", "FirstNormalSentTime", "EventCount"]
+    if "AttackerModel" in df.columns:
+        columns_to_check.insert(0, "AttackerModel")
+    return columns_to_check
+
 class Analyse(object):
 
     HEADING_DTYPES = {
@@ -315,6 +409,10 @@ class Analyse(object):
         "FailedAvoidSink": _parse_float_nan_if_none,
         "SourceDropped": _parse_float_nan_if_none,
 
+        "DurationStartTime": _parse_float_nan_if_none,
+        "SourceCaptureTime": _parse_dict_node_to_value,
+        "NormalSentReceiveTimes": _parse_compressed_literal,
+
         "DutyCycleStart": _parse_float_None_if_none, # Either None or float
         "DutyCycle": _parse_dict_node_to_value,
 
@@ -326,7 +424,7 @@ class Analyse(object):
 
     def __init__(self, infile_path, normalised_values, filtered_values, with_converters=True,
                  with_normalised=True, headers_to_skip=None, keep_if_hit_upper_time_bound=False,
-                 verify_seeds=True):
+                 verify_seeds=True, byte_range=None):
 
         self.attributes = {}
         self.opts = {}
@@ -336,54 +434,92 @@ class Analyse(object):
 
         self.normalised_columns = None
 
-        with open(infile_path, 'r') as infile:
-            line_number = 0
-            hash_line_number = None
+        columnar_results = None
+
+        # The byte offset in a text file at which the rows start
+        self.rows_offset = None
+
+        if columnar.is_columnar(infile_path):
+            columnar_results = columnar.ColumnarResults(infile_path)
+
+            all_headings = columnar_results.headings
 
-            for line in infile:
+            for line in columnar_results.preamble:
+                self._parse_preamble_line(line.strip())
 
-                line_number += 1
+            if columnar_results.row_count == 0:
+                raise EmptyFileError(infile_path)
 
-                # We need to remove the new line at the end of the line
-                line = line.strip()
+            if verify_seeds:
+                _check_determinism_verdict((line for (_, line) in columnar_results.extra), infile_path)
 
-                # If we have found the # line
-                if len(all_headings) != 0:
-                    if line.startswith('@'):
-                        raise RuntimeError(f"Multiple sets of metadata in {infile_path}")
+            if byte_range is not None:
+                raise RuntimeError(f"Cannot read a byte range of the columnar results {infile_path}")
+
+        else:
+            with open(infile_path, 'r', newline='') as infile:
+                line_number = 0
+                hash_line_number = None
+                offset = 0
+
+                for line in infile:
+
+                    line_number += 1
+                    offset += len(line.encode("utf-8"))
+
+                    # We need to remove the new line at the end of the line
+                    line = line.strip()
+
+                    # If we have found the # line
+                    if len(all_headings) != 0:
+                        if line.startswith('@'):
+                            raise RuntimeError(f"Multiple sets of metadata in {infile_path}")
+                        else:
+                            break
+
+                    if line.startswith('#'):
+                        # Read the headings
+                        all_headings = line[1:].split('|')
+                        hash_line_number = line_number
+                        self.rows_offset = offset
                     else:
-                        break
+                        self._parse_preamble_line(line)
 
-                if line.startswith('@'):
-                    # The attributes that contain some extra info
+            if line_number == 0 or line_number == hash_line_number:
+                raise EmptyFileError(infile_path)
 
-                    k, v = line[1:].split(":", 1)
+            if byte_range is None:
+                rows_source = infile_path
 
-                    self.attributes[k] = v
+                # Skip the preamble and headings, but not the first row
+                skip_lines.extend(list(range(hash_line_number)))
 
-                elif len(all_headings) == 0 and '=' in line:
-                    # We are reading the options so record them.
-                    # Some option values will have an '=' in them so only split once.
-                    opt = line.split('=', 1)
+                with open(infile_path, 'r') as infile:
+                    # Look for bad lines to skip
+                    for i, line in enumerate(infile):
+                        if line.startswith('Time taken'):
+                            skip_lines.append(i)
 
-                    self.opts[opt[0]] = opt[1]
+                        elif verify_seeds and line.startswith('@'):
+                            _check_determinism_verdict((line,), infile_path)
+            else:
+                # Only parse the rows in the given range of bytes
+                (start, end) = byte_range
+                start = max(start, self.rows_offset)
 
-                elif line.startswith('#'):
-                    # Read the headings
-                    all_headings = line[1:].split('|')
-                    hash_line_number = line_number
+                with open(infile_path, 'rb') as infile:
+                    infile.seek(start)
+                    rows_text = infile.read(max(end - start, 0)).decode("utf-8")
 
-        skip_lines.extend(list(range(line_number)))
+                if len(rows_text.strip()) == 0:
+                    raise EmptyDataFrameError(infile_path)
 
-        with open(infile_path, 'r') as infile:
-            # Look for bad lines to skip
-            for i, line in enumerate(infile):
-                if line.startswith('Time taken'):
-                    skip_lines.append(i)
+                rows_source = io.StringIO(rows_text)
 
+                if verify_seeds:
+                    _check_determinism_verdict(rows_text.splitlines(), infile_path)
 
-        if line_number == 0 or line_number == hash_line_number:
-            raise EmptyFileError(infile_path)
+                skip_lines.extend(i for (i, line) in enumerate(rows_text.splitlines()) if line.startswith('Time taken'))
 
         self.headers_to_skip = {header for header in all_headings if self._should_skip(header, headers_to_skip)}
 
@@ -408,17 +544,26 @@ class Analyse(object):
 
         print("Loading: ", self.unnormalised_headings)
 
-        df = pd.read_csv(
-            infile_path,
-            names=all_headings, header=None,
-            usecols=self.unnormalised_headings,
-            sep='|',
-            skiprows=skip_lines,
-            comment='@',
-            dtype=self.HEADING_DTYPES, converters=converters,
-            compression=None,
-            verbose=True,
-        )
+        if columnar_results is not None:
+            with columnar_results:
+                df = columnar.dataframe(
+                    columnar_results,
+                    usecols=self.unnormalised_headings,
+                    dtype=self.HEADING_DTYPES, converters=converters,
+                    node_dict_converters=(_parse_dict_node_to_value,),
+                )
+        else:
+            df = pd.read_csv(
+                rows_source,
+                names=all_headings, header=None,
+                usecols=self.unnormalised_headings,
+                sep='|',
+                skiprows=skip_lines,
+                comment='@',
+                dtype=self.HEADING_DTYPES, converters=converters,
+                compression=None,
+                verbose=True,
+            )
 
         initial_length = len(df.index)
 
@@ -429,10 +574,15 @@ class Analyse(object):
         # If NormalLatency is inf then no Normal messages were ever received by a sink
         # If FirstNormalSentTime is nan then no messages were ever sent by a source
         df = df.replace([np.inf, -np.inf], np.nan)
+
+        loaded_attacker_models = _attacker_model_counts(df)
+
         df.dropna(subset=("NormalLatency", "FirstNormalSentTime"), how="any", inplace=True)
 
         current_length = len(df.index)
 
+        delivered_attacker_models = _attacker_model_counts(df)
+
         self.removed_rows_due_to_no_sink_delivery_count = initial_length - current_length
 
         print("Removed {} out of {} rows as no Normal message was ever received at the sink".format(
@@ -454,16 +604,22 @@ class Analyse(object):
         else:
             self.removed_rows_due_to_upper_bound = 0
 
+        bounded_attacker_models = _attacker_model_counts(df)
+
         # Remove any duplicated seeds. Their result will be the same so shouldn't be counted.
         if verify_seeds:
-            duplicated_seeds_filter = df.duplicated(subset="Seed", keep=False)
+            # When several attacker models were evaluated in the same run,
+            # the same seed legitimately appears once per attacker model.
+            seed_key = ["AttackerModel", "Seed"] if "AttackerModel" in df.columns else "Seed"
+
+            duplicated_seeds_filter = df.duplicated(subset=seed_key, keep=False)
             if duplicated_seeds_filter.any():
                 print("Removing the following duplicated seeds:")
                 print(df["Seed"][duplicated_seeds_filter])
 
                 print("Checking that duplicate seeds have the same results...")
-                columns_to_check = ["Seed", "Sent", "Received", "Delivered", "Captured", "FirstNormalSentTime", "EventCount"]
-                dupe_seeds = df[columns_to_check][duplicated_seeds_filter].groupby("Seed", sort=False)
+                columns_to_check = _seed_check_columns(df)
+                dupe_seeds = df[columns_to_check][duplicated_seeds_filter].groupby(seed_key, sort=False)
 
                 dupe_differing_seeds = {}
 
@@ -482,7 +638,7 @@ class Analyse(object):
 
                 initial_length = len(df.index)
 
-                df.drop_duplicates(subset="Seed", keep="first", inplace=True)
+                df.drop_duplicates(subset=seed_key, keep="first", inplace=True)
 
                 current_length = len(df.index)
 
@@ -497,110 +653,128 @@ class Analyse(object):
         else:
             self.removed_rows_due_to_duplicates = 0
 
+        # The number of rows removed for each reason, by the attacker model they were for
+        kept_attacker_models = _attacker_model_counts(df)
+        self.removed_rows_by_attacker_model = {
+            "removed_rows_due_to_no_sink_delivery_count": loaded_attacker_models - delivered_attacker_models,
+            "removed_rows_due_to_upper_bound": delivered_attacker_models - bounded_attacker_models,
+            "removed_rows_due_to_duplicates": bounded_attacker_models - kept_attacker_models,
+        }
+
         if len(df.index) == 0:
             raise EmptyDataFrameError(infile_path)
 
+        # Kept so the normalised columns can be calculated again for derived results
+        self._normalisation = (normalised_values, filtered_values) if with_normalised else None
+
         self.filtered_columns = {}
 
         if with_normalised:
-            # Calculate any constants that do not change (e.g. from simulation options)
-            constants = self._get_constants_from_opts()
+            self._calculate_normalised(df, normalised_values, filtered_values)
+
+        print("Columns:", df.info(memory_usage='deep'))
+
+        if self.normalised_columns is not None:
+            print("Normalised Columns:", self.normalised_columns.info(memory_usage='deep'))
 
-            calc_cols = _get_calculation_columns()
-            cached_cols = {}
+        self.columns = df
 
-            def get_cached_calc_cols(name):
-                if name in cached_cols:
-                    return cached_cols[name]
+    def _calculate_normalised(self, df, normalised_values, filtered_values):
+        """Calculates the normalised and filtered columns of the rows in df."""
+        self.normalised_columns = None
+        self.filtered_columns = {}
 
-                cached_cols[name] = calc_cols[num](df, cached_cols, constants)
+        # Calculate any constants that do not change (e.g. from simulation options)
+        constants = self._get_constants_from_opts()
 
+        calc_cols = _get_calculation_columns()
+        cached_cols = {}
+
+        def get_cached_calc_cols(name):
+            if name in cached_cols:
                 return cached_cols[name]
 
-            normalised_values_names = [
-                (_normalised_value_name(num, "norm"), _normalised_value_name(den, "norm"))
-                for num, den
-                in normalised_values
-            ]
+            cached_cols[name] = calc_cols[num](df, cached_cols, constants)
 
-            columns_to_add = OrderedDict()
+            return cached_cols[name]
 
-            for (norm_head, (num, den)) in zip(self.additional_normalised_headings, normalised_values_names):
+        normalised_values_names = [
+            (_normalised_value_name(num, "norm"), _normalised_value_name(den, "norm"))
+            for num, den
+            in normalised_values
+        ]
 
-                if num in self.headings and den in self.headings:
-                    print(f"Creating {norm_head} using ({num},{den}) on the fast path n1")
+        columns_to_add = OrderedDict()
 
-                    num_col = columns_to_add[num] if num in columns_to_add else df[num]
-                    den_col = columns_to_add[den] if den in columns_to_add else df[den]
+        for (norm_head, (num, den)) in zip(self.additional_normalised_headings, normalised_values_names):
 
-                    columns_to_add[norm_head] = num_col / den_col
-                    
+            if num in self.headings and den in self.headings:
+                print(f"Creating {norm_head} using ({num},{den}) on the fast path n1")
 
-                elif num in self.headings and den in constants:
-                    print(f"Creating {norm_head} using ({num},{den}) on the fast path n2")
+                num_col = columns_to_add[num] if num in columns_to_add else df[num]
+                den_col = columns_to_add[den] if den in columns_to_add else df[den]
 
-                    num_col = columns_to_add[num] if num in columns_to_add else df[num]
+                columns_to_add[norm_head] = num_col / den_col
 
-                    try:
-                        columns_to_add[norm_head] = num_col if den == "1" else num_col / constants[den]
-                    except TypeError:
-                        #axis=1 means to apply per row
-                        columns_to_add[norm_head] = df.apply(self._get_norm_dict_value,
-                                                         axis=1, raw=True, reduce=True,
-                                                         args=(num, den, constants))
 
-                elif num in calc_cols and den in constants:
-                    print(f"Creating {norm_head} using ({num},{den}) on the fast path n3")
+            elif num in self.headings and den in constants:
+                print(f"Creating {norm_head} using ({num},{den}) on the fast path n2")
 
-                    num_col = get_cached_calc_cols(num)
+                num_col = columns_to_add[num] if num in columns_to_add else df[num]
 
+                try:
                     columns_to_add[norm_head] = num_col if den == "1" else num_col / constants[den]
+                except TypeError:
+                    #axis=1 means to apply per row
+                    columns_to_add[norm_head] = df.apply(self._get_norm_dict_value,
+                                                     axis=1, raw=True, reduce=True,
+                                                     args=(num, den, constants))
 
-                else:
-                    print(f"Creating {norm_head} using ({num},{den}) on the slow path ns")
+            elif num in calc_cols and den in constants:
+                print(f"Creating {norm_head} using ({num},{den}) on the fast path n3")
 
-                    #axis=1 means to apply per row
-                    columns_to_add[norm_head] = df.apply(self._get_norm_value,
-                                                         axis=1, raw=True, reduce=True,
-                                                         args=(num, den, constants))
+                num_col = get_cached_calc_cols(num)
 
+                columns_to_add[norm_head] = num_col if den == "1" else num_col / constants[den]
 
-            filtered_values_names = [
-                (_normalised_value_name(num, "filtered"), _normalised_value_name(den, "filtered"))
-                for num, den
-                in filtered_values
-            ]
+            else:
+                print(f"Creating {norm_head} using ({num},{den}) on the slow path ns")
 
-            for (filtered_head, (num, den)) in zip(self.additional_filtered_headings, filtered_values_names):
-                
-                if num in self.headings and den in df:
-                    print(f"Creating {filtered_head} using ({num},{den}) on the fast path f1")
+                #axis=1 means to apply per row
+                columns_to_add[norm_head] = df.apply(self._get_norm_value,
+                                                     axis=1, raw=True, reduce=True,
+                                                     args=(num, den, constants))
 
-                    num_col = columns_to_add[num] if num in columns_to_add else df[num]
-                    den_col = df[den]
 
-                    self.filtered_columns[filtered_head] = num_col[den_col]
+        filtered_values_names = [
+            (_normalised_value_name(num, "filtered"), _normalised_value_name(den, "filtered"))
+            for num, den
+            in filtered_values
+        ]
 
-                else:
-                    raise RuntimeError(f"Don't know how to calculate {filtered_head}")
+        for (filtered_head, (num, den)) in zip(self.additional_filtered_headings, filtered_values_names):
 
-            if len(columns_to_add) > 0:
-                print("Merging normalised columns with the loaded data...")
-                self.normalised_columns = pd.DataFrame.from_dict(columns_to_add)
+            if num in self.headings and den in df:
+                print(f"Creating {filtered_head} using ({num},{den}) on the fast path f1")
 
-                if __debug__:
-                    # Lets do a sanity check that the columns were merged correctly
-                    for (name, col) in columns_to_add.items():
-                        if self.normalised_columns[name].iloc[0] != col.iloc[0]:
-                            raise RuntimeError("Mismatch between {} expected {} obtained {}".format(
-                                name, col.iloc[0], self.normalised_columns[name].iloc[0]))
+                num_col = columns_to_add[num] if num in columns_to_add else df[num]
+                den_col = df[den]
 
-        print("Columns:", df.info(memory_usage='deep'))
+                self.filtered_columns[filtered_head] = num_col[den_col]
 
-        if self.normalised_columns is not None:
-            print("Normalised Columns:", self.normalised_columns.info(memory_usage='deep'))
+            else:
+                raise RuntimeError(f"Don't know how to calculate {filtered_head}")
 
-        self.columns = df
+        if len(columns_to_add) > 0:
+            print("Merging normalised columns with the loaded data...")
+            self.normalised_columns = pd.DataFrame.from_dict(columns_to_add)
+
+            if __debug__:
+                # Lets do a sanity check that the columns were merged correctly
+                for (name, col) in columns_to_add.items():
+                    if self.normalised_columns[name].iloc[0] != col.iloc[0]:
+                        raise RuntimeError("Mismatch between {} expected {} obtained {}".format(
+                            name, col.iloc[0], self.normalised_columns[name].iloc[0]))
 
     def sim_name(self):
         """The sim used to gather these results"""
@@ -610,6 +784,20 @@ class Analyse(object):
     def headings_index(self, name):
         return self.headings.index(name)
 
+    def _parse_preamble_line(self, line):
+        if line.startswith('@'):
+            # The attributes that contain some extra info
+            k, v = line[1:].split(":", 1)
+
+            self.attributes[k] = v
+
+        elif '=' in line:
+            # We are reading the options so record them.
+            # Some option values will have an '=' in them so only split once.
+            opt = line.split('=', 1)
+
+            self.opts[opt[0]] = opt[1]
+
     def _should_skip(self, heading_name, headers_to_skip):
         if headers_to_skip is None:
             return False
@@ -825,6 +1013,90 @@ class Analyse(object):
 
         raise KeyError(f"Unable to find {header}")
 
+    def derive_safety_factor(self, safety_factor):
+        """Derive the results that would have been obtained with a smaller safety
+        factor from a run performed with an extended horizon.
+        Returns a copy of the columns with the derived values replaced."""
+        required = ("DurationStartTime", "SourceCaptureTime", "NormalSentReceiveTimes")
+        missing = [name for name in required if name not in self.columns]
+        if missing:
+            raise RuntimeError(f"Cannot derive results for a safety factor as {missing} were not recorded. Run with --extended-horizon.")
+
+        run_safety_factor = float(self.opts.get("safety_factor", 1.0))
+        if safety_factor > run_safety_factor:
+            raise RuntimeError(f"Cannot derive results for a safety factor ({safety_factor}) larger than the one simulated ({run_safety_factor})")
+
+        cut_off_duration = float(self.opts["safety_period"]) * safety_factor
+
+        derived = self.columns.apply(_row_for_safety_factor, axis=1, args=(cut_off_duration,))
+
+        df = self.columns.copy()
+        for name in derived.columns:
+            if name in df:
+                df[name] = derived[name]
+
+        return df
+
+    def by_attacker_model(self):
+        """Copies of this analysis for each attacker model that was evaluated in the same run.
+        If only one attacker model was evaluated, this analysis is the only one."""
+        if "AttackerModel" not in self.columns:
+            return [self]
+
+        analyses = []
+
+        for (attacker_model, df) in self.columns.groupby("AttackerModel", sort=False):
+            # Each copy looks like the analysis of a run with only that attacker model
+            analysis = copy.copy(self)
+            analysis.opts = dict(self.opts)
+            analysis.opts["attacker_model"] = attacker_model
+            analysis.columns = df.drop(columns="AttackerModel")
+            analysis.headings = [heading for heading in self.headings if heading != "AttackerModel"]
+
+            if self.normalised_columns is not None:
+                analysis.normalised_columns = self.normalised_columns.loc[df.index]
+
+            analysis.filtered_columns = {
+                name: values[values.index.isin(df.index)]
+                for (name, values) in self.filtered_columns.items()
+            }
+
+            for (name, removed) in self.removed_rows_by_attacker_model.items():
+                setattr(analysis, name, removed[attacker_model])
+
+            analyses.append(analysis)
+
+        return analyses
+
+    def derivable_safety_factors(self, safety_factors):
+        """The safety factors smaller than the one simulated that results can be derived for."""
+        if not safety_factors or not all(name in self.columns for name in ("DurationStartTime", "SourceCaptureTime", "NormalSentReceiveTimes")):
+            return []
+
+        run_safety_factor = float(self.opts.get("safety_factor", 1.0))
+
+        return sorted({float(safety_factor) for safety_factor in safety_factors if float(safety_factor) < run_safety_factor})
+
+    def with_safety_factor(self, safety_factor):
+        """A copy of this analysis with the results derived for a smaller safety factor."""
+        df = self.derive_safety_factor(safety_factor)
+
+        # As when loading, remove rows where no Normal message reached the sink before the cut off
+        initial_length = len(df.index)
+        df = df[np.isfinite(df["NormalLatency"].astype(np.float_))]
+
+        derived = copy.copy(self)
+        derived.opts = dict(self.opts)
+        derived.opts["safety_factor"] = str(safety_factor)
+        derived.removed_rows_due_to_no_sink_delivery_count += initial_length - len(df.index)
+
+        if self._normalisation is not None:
+            derived._calculate_normalised(df, *self._normalisation)
+
+        derived.columns = df
+
+        return derived
+
     @staticmethod
     def series_describe(values):
         """def dennis_convergence(window):
@@ -849,21 +1121,7 @@ class Analyse(object):
         sample_std = values.std()
         sample_sem = values.sem()
 
-        #t_critical = stats.t.ppf(q=0.975, df=values.count()-1) # 95% (two tailed)
-        #confidence_interval = (sample_mean - t_critical * sample_sem, sample_mean + t_critical * sample_sem)
-
-        # https://hamelg.blogspot.com/2015/11/python-for-data-analysis-part-23-point.html
-        if sample_sem == 0.0:
-            ci95 = 0
-        else:
-            confidence_interval_95 = stats.t.interval(
-                alpha=0.95,             # Confidence level
-                df=values.count()-1,
-                loc=sample_mean,
-                scale=sample_sem)
-
-            ci95 = confidence_interval_95[1] - sample_mean
-
+        ci95 = _ci95(sample_mean, sample_sem, values.count())
 
         l = {'nobs'  : len(values.index),
              'valid' : values.count()   ,
@@ -907,15 +1165,15 @@ class Analyse(object):
 
 
 class AnalysisResults(object):
-    def __init__(self, analysis):
-        self.describe_of = {}
+    skip = ["Seed"]
 
-        skip = ["Seed"]
+    expected_fail = ['Collisions', "NodeWasSource", "AttackerMovesInResponseTo", "SentOverTime"]
 
-        expected_fail = ['Collisions', "NodeWasSource", "AttackerMovesInResponseTo", "SentOverTime"]
+    def __init__(self, analysis):
+        self.describe_of = {}
 
         for heading in analysis.headings:
-            if heading in skip:
+            if heading in self.skip:
                 continue
 
             try:
@@ -923,7 +1181,7 @@ class AnalysisResults(object):
             except NotImplementedError:
                 pass
             except (TypeError, RuntimeError) as ex:
-                if heading not in expected_fail:
+                if heading not in self.expected_fail:
                     print("Failed to describe {}: {}".format(heading, ex), file=sys.stderr)
                     #print(traceback.format_exc(), file=sys.stderr)
 
@@ -938,6 +1196,277 @@ class AnalysisResults(object):
 
         self.configuration = analysis._get_configuration()
 
+    @classmethod
+    def of_each_attacker_model(cls, analysis):
+        """The results of each attacker model that was evaluated in the same run."""
+        return [cls(attacker_model_analysis) for attacker_model_analysis in analysis.by_attacker_model()]
+
+class ColumnSummary(object):
+    """The mergeable state needed to describe a column of numbers (see Analyse.series_describe)."""
+    def __init__(self):
+        self.nobs = 0
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch()
+
+    def push(self, values):
+        self.nobs += len(values.index)
+
+        valid = values.dropna().to_numpy()
+        if valid.dtype == object:
+            valid = valid.astype(np.float64)
+
+        self.moments.push_many(valid)
+        self.sketch.push_many(valid)
+
+    def describe(self, nobs=None):
+        moments = self.moments
+
+        valid = moments.count()
+
+        sample_mean = moments.mean()
+        sample_std = moments.stddev()
+        sample_sem = sample_std / math.sqrt(valid) if valid > 0 else float('NaN')
+
+        l = {'nobs'  : self.nobs if nobs is None else nobs,
+             'valid' : valid,
+             'mean'  : sample_mean,
+             'min'   : moments.min if valid > 0 else float('NaN'),
+             'max'   : moments.max if valid > 0 else float('NaN'),
+             'std'   : sample_std,
+             '10%'   : self.sketch.quantile(0.10),
+             '25%'   : self.sketch.quantile(0.25),
+             '50%'   : self.sketch.quantile(0.50),
+             '75%'   : self.sketch.quantile(0.75),
+             '90%'   : self.sketch.quantile(0.90),
+             'skew'  : moments.skew(),
+             'kurt'  : moments.kurt(),
+             'sem'   : sample_sem,
+             'ci95'  : _ci95(sample_mean, sample_sem, valid),
+            }
+        return l
+
+class DictColumnSummary(object):
+    """The mergeable state needed to describe a column of dicts, with one ColumnSummary per key."""
+    def __init__(self):
+        self.nobs = 0
+        self.keys = OrderedDict()
+
+    def push(self, values):
+        self.nobs += len(values.index)
+
+        if len(values.index) == 0:
+            return
+
+        # Need to reset the index, as rows may have been removed earlier
+        ddf = pd.DataFrame.from_records(values.reset_index(drop=True))
+
+        for (key, column) in ddf.items():
+            self.keys.setdefault(key, ColumnSummary()).push(column)
+
+    def describe(self):
+        # Keys missing from a row count as an observation that is not valid
+        return {key: summary.describe(nobs=self.nobs) for (key, summary) in self.keys.items()}
+
+class AnalysisSummary(object):
+    """The mergeable summary of the rows of a result file that have been analysed so far.
+    Rows appended to the result file can be analysed on their own and then merged in.
+    This provides the same attributes as AnalysisResults."""
+
+    # The number of bytes before the end of the analysed rows that must be unchanged
+    check_length = 64 * 1024
+
+    def __init__(self, kwargs, safety_factors=None):
+        self.kwargs = kwargs
+        self.safety_factors = safety_factors
+
+        # The summaries of the results derived for smaller safety factors
+        self.derived = OrderedDict()
+
+        # The summaries of each attacker model, when several were evaluated in the same run
+        self.attacker_models = OrderedDict()
+
+        self.offset = None
+        self.rows_offset = None
+        self.digest = None
+
+        self.headings = []
+        self.summaries = OrderedDict()
+        self.undescribable = set()
+        self.seeds = {}
+
+        self.describe_of = {}
+
+        self.opts = None
+        self.headers_to_skip = None
+        self.configuration = None
+
+        self.number_of_repeats = 0
+
+        self.dropped_hit_upper_bound = 0
+        self.dropped_no_sink_delivery = 0
+        self.dropped_duplicates = 0
+
+    def _digest(self, path, offset):
+        import hashlib
+
+        h = hashlib.sha1()
+
+        with open(path, 'rb') as infile:
+            h.update(infile.read(self.rows_offset))
+
+            start = max(self.rows_offset, offset - self.check_length)
+            infile.seek(start)
+            h.update(infile.read(offset - start))
+
+        return h.hexdigest()
+
+    def is_prefix_of(self, path):
+        """Checks that the rows that have been analysed are still at the start of the file."""
+        if self.offset is None or os.path.getsize(path) < self.offset:
+            return False
+
+        return self._digest(path, self.offset) == self.digest
+
+    def _merge_seeds(self, df):
+        """Records the seeds of the new rows, returning the index of
+        rows whose seed had already been seen."""
+        columns_to_check = _seed_check_columns(df)
+        seed_key_length = 2 if "AttackerModel" in df.columns else 1
+
+        duplicates = []
+        differing = []
+
+        for (index, row) in zip(df.index, df[columns_to_check].itertuples(index=False, name=None)):
+            key = row[:seed_key_length]
+
+            existing = self.seeds.setdefault(key, row)
+            if existing is not row:
+                duplicates.append(index)
+
+                if existing != row:
+                    differing.append(key)
+
+        if len(differing) > 0:
+            raise RuntimeError(f"For seeds {differing} different values were obtained")
+
+        return pd.Index(duplicates)
+
+    def update(self, analysis, path, offset):
+        """Merges in the analysis of the rows up to offset bytes into path."""
+        if self.opts is None:
+            self.opts = analysis.opts
+            self.headers_to_skip = analysis.headers_to_skip
+            self.configuration = analysis._get_configuration()
+            self.rows_offset = analysis.rows_offset
+
+        if "AttackerModel" in analysis.columns:
+            # Each attacker model is summarised on its own
+            for attacker_model_analysis in analysis.by_attacker_model():
+                attacker_model = attacker_model_analysis.opts["attacker_model"]
+
+                summary = self.attacker_models.get(attacker_model)
+                if summary is None:
+                    summary = self.attacker_models[attacker_model] = AnalysisSummary(self.kwargs, self.safety_factors)
+
+                summary.update(attacker_model_analysis, path, None)
+
+            self.number_of_repeats = sum(summary.number_of_repeats for summary in self.attacker_models.values())
+        else:
+            self._merge(analysis, path)
+
+        self.offset = offset
+        self.digest = self._digest(path, offset) if offset is not None else None
+
+    def _merge(self, analysis, path):
+        df = analysis.columns
+
+        if self.kwargs.get("verify_seeds", True):
+            duplicates = self._merge_seeds(df)
+        else:
+            duplicates = pd.Index([])
+
+        self.number_of_repeats += df.shape[0] - len(duplicates)
+
+        self.dropped_hit_upper_bound += analysis.removed_rows_due_to_upper_bound
+        self.dropped_no_sink_delivery += analysis.removed_rows_due_to_no_sink_delivery_count
+        self.dropped_duplicates += analysis.removed_rows_due_to_duplicates + len(duplicates)
+
+        self.headings = analysis.headings
+
+        for heading in self.headings:
+            if heading in AnalysisResults.skip or heading in self.undescribable:
+                continue
+
+            values = analysis.find_column(heading)
+
+            if len(duplicates) > 0:
+                values = values[~values.index.isin(duplicates)]
+
+            try:
+                summary = self.summaries.get(heading)
+
+                if summary is None:
+                    if len(values) == 0:
+                        continue
+
+                    first = next(iter(values))
+
+                    if isinstance(first, dict):
+                        summary = DictColumnSummary()
+                    elif isinstance(first, str):
+                        raise TypeError(f"Cannot describe a string for {heading}. e.g. '{first}'")
+                    else:
+                        summary = ColumnSummary()
+
+                summary.push(values)
+
+                self.summaries[heading] = summary
+
+            except (TypeError, ValueError) as ex:
+                self.undescribable.add(heading)
+                self.summaries.pop(heading, None)
+
+                if heading not in AnalysisResults.expected_fail:
+                    print("Failed to describe {}: {}".format(heading, ex), file=sys.stderr)
+
+        self.describe_of = self._describe()
+
+        for safety_factor in analysis.derivable_safety_factors(self.safety_factors):
+            derived = self.derived.get(safety_factor)
+            if derived is None:
+                derived = self.derived[safety_factor] = AnalysisSummary(self.kwargs)
+
+            derived.update(analysis.with_safety_factor(safety_factor), path, None)
+
+    def all_results(self):
+        """This summary followed by the summaries derived from it.
+        When several attacker models were evaluated in the same run, the summaries of each of them."""
+        if self.attacker_models:
+            return [result for summary in self.attacker_models.values() for result in summary.all_results()]
+
+        return [self] + list(self.derived.values())
+
+    def _describe(self):
+        describe_of = {}
+
+        for heading in self.headings:
+            if heading in AnalysisResults.skip or heading in self.undescribable:
+                continue
+
+            summary = self.summaries.get(heading)
+
+            if summary is None or summary.nobs == 0:
+                # Filtered values may legitimately have no values
+                if heading.startswith("filtered"):
+                    describe_of[heading] = None
+                elif heading not in AnalysisResults.expected_fail:
+                    print(f"Failed to describe {heading}: There are no values for {heading} to be able to describe", file=sys.stderr)
+                continue
+
+            describe_of[heading] = summary.describe()
+
+        return describe_of
+
 class AnalyzerCommon(object):
     def __init__(self, sim_name, results_directory, testbed=None):
         self.sim_name = sim_name
@@ -1050,36 +1579,97 @@ class AnalyzerCommon(object):
     def analyse_path(self, path, **kwargs):
         return Analyse(path, self.normalised_values, self.filtered_values, **kwargs)
 
-    def analyse_and_summarise_path(self, path, flush, **kwargs):
+    def analyse_and_summarise_path(self, path, flush, safety_factors=None, **kwargs):
+        """Analyses the result file at path, reusing the summary pickled by the last analysis.
+        If rows have been appended to the result file since then, only those rows are parsed.
+        Results are also derived for any of the :safety_factors: smaller than the one simulated,
+        when the result file was gathered with an extended horizon."""
         pickle_path = path.rsplit(".", 1)[0] + ".pickle"
 
-        result_file_create_time = os.path.getmtime(path)
+        summary = None
 
-        try:
-            pickle_file_create_time = os.path.getmtime(pickle_path)
-        except OSError:
-            pickle_file_create_time = 0
+        if not flush:
+            summary = self._load_summary(pickle_path, kwargs, safety_factors)
+
+        # Columnar results are rewritten rather than appended to
+        if columnar.is_columnar(path):
+            if summary is not None and os.path.getmtime(path) < os.path.getmtime(pickle_path):
+                print(f"Loaded result from pickle {pickle_path}")
+                return summary
+
+            summary = AnalysisSummary(kwargs, safety_factors)
+            summary.update(self.analyse_path(path, **kwargs), path, None)
+
+            self._save_summary(pickle_path, summary)
+
+            return summary
+
+        # Ignore any partially written last line
+        end = _complete_lines_length(path)
 
-        result = None
+        if summary is not None and not summary.is_prefix_of(path):
+            print(f"Skipping loading from pickle {pickle_path} as the analysed rows have changed")
+            summary = None
 
-        if result_file_create_time < pickle_file_create_time and not flush:
+        if summary is not None:
+            if summary.offset == end:
+                print(f"Loaded result from pickle {pickle_path}")
+                return summary
+
+            try:
+                analysis = self.analyse_path(path, byte_range=(summary.offset, end), **kwargs)
+
+                summary.update(analysis, path, end)
+
+                print(f"Merged {analysis.columns.shape[0]} appended results into the result from pickle {pickle_path}")
+
+            except Exception as ex:
+                # The appended rows may be unusable on their own (e.g., all of them were removed)
+                print(f"Unable to analyse only the appended results ({ex}), analysing all results instead")
+                summary = None
+
+        if summary is None:
+            summary = AnalysisSummary(kwargs, safety_factors)
+            summary.update(self.analyse_path(path, byte_range=(0, end), **kwargs), path, end)
+
+        self._save_summary(pickle_path, summary)
+
+        return summary
+
+    @staticmethod
+    def _load_summary(pickle_path, kwargs, safety_factors):
+        try:
             with open(pickle_path, 'rb') as pickle_file:
-                saved_kwargs = pickle.load(pickle_file)
+                summary = pickle.load(pickle_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
 
-                if saved_kwargs == kwargs:
-                    result = pickle.load(pickle_file)
-                    print(f"Loaded result from pickle {pickle_path}")
-                else:
-                    print(f"Skipping loading from pickle as args differ given:{kwargs} loaded:{saved_kwargs}")
+        # Pickles written before results were summarised incrementally
+        if not isinstance(summary, AnalysisSummary):
+            print(f"Skipping loading from pickle {pickle_path} as it is in an old format")
+            return None
 
-        if result is None:
-            result = AnalysisResults(self.analyse_path(path, **kwargs))
+        if summary.kwargs != kwargs:
+            print(f"Skipping loading from pickle as args differ given:{kwargs} loaded:{summary.kwargs}")
+            return None
 
-            with open(pickle_path, 'wb') as pickle_file:
-                pickle.dump(kwargs, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
-                pickle.dump(result, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+        if summary.safety_factors != safety_factors:
+            print(f"Skipping loading from pickle as safety factors differ given:{safety_factors} loaded:{summary.safety_factors}")
+            return None
 
-        return result
+        return summary
+
+    @staticmethod
+    def _save_summary(pickle_path, summary):
+        with open(pickle_path, 'wb') as pickle_file:
+            pickle.dump(summary, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _result_lines(self, result):
+        """The summary file lines for a result and any results derived from it."""
+        return "\n".join(
+            "|".join(fn(summary) for fn in self.values.values())
+            for summary in result.all_results()
+        )
 
     def analyse_and_summarise_path_wrapped(self, path, flush, **kwargs):
         """Calls analyse_and_summarise_path, but wrapped inside a Process.
@@ -1097,9 +1687,11 @@ class AnalyzerCommon(object):
 
         return result
 
-    def run(self, summary_file, result_finder, nprocs=None, testbed=False, flush=False, **kwargs):
+    def run(self, summary_file, result_finder, nprocs=None, testbed=False, flush=False, memory_limit=None, safety_factors=None, **kwargs):
         """Perform the analysis and write the output to the :summary_file:.
         If :nprocs: is not specified then the number of CPU cores will be used.
+        If :memory_limit: (in bytes) is not specified then the memory available will be used.
+        Extended horizon results also get a line for each of the smaller :safety_factors:.
         """
 
         if testbed:
@@ -1114,63 +1706,37 @@ class AnalyzerCommon(object):
         # Skip the overhead of the queue with 1 process.
         # This also allows easy profiling
         if nprocs is not None and nprocs == 1:
-            return self.run_single(summary_file, result_finder, flush, **kwargs)
-
-        def worker(inqueue, outqueue):
-            while True:
-                item = inqueue.get()
+            return self.run_single(summary_file, result_finder, flush, safety_factors=safety_factors, **kwargs)
 
-                if item is None:
-                    return
+        def worker(path):
+            result = self.analyse_and_summarise_path(path, flush, safety_factors=safety_factors, **kwargs)
 
-                path = item
-
-                try:
-                    result = self.analyse_and_summarise_path(path, flush, **kwargs)
-
-                    # Skip 0 length results
-                    if result.number_of_repeats == 0:
-                        outqueue.put((path, None, "There are 0 repeats"))
-                        continue
-
-                    line = "|".join(fn(result) for fn in self.values.values())
+            # Skip 0 length results
+            if result.number_of_repeats == 0:
+                raise RuntimeError("There are 0 repeats")
 
-                    # Try to force a cleanup of the memory
-                    result = None
+            line = self._result_lines(result)
 
-                    outqueue.put((path, line, None))
+            # Try to force a cleanup of the memory
+            result = None
 
-                    # Try to recover some memory
-                    try_to_free_memory()
+            # Try to recover some memory
+            try_to_free_memory()
 
-                except Exception as ex:
-                    outqueue.put((path, None, (ex, traceback.format_exc())))
+            return line
 
         if nprocs is None:
             nprocs = multiprocessing.cpu_count()
 
             print(f"Using {nprocs} threads")
 
-        inqueue = multiprocessing.Queue()
-        outqueue = multiprocessing.Queue()
-
-        pool = multiprocessing.Pool(nprocs, worker, (inqueue, outqueue))
-
         summary_file_path = os.path.join(self.results_directory, summary_file)
 
         # The output files we need to process.
-        # These are sorted to give anyone watching the output a sense of progress.
-        files = sorted(result_finder(self.results_directory))
-
-        total = len(files)
+        # The scheduler starts the largest first and limits how many run at once by their memory usage.
+        files = [os.path.join(self.results_directory, infile) for infile in result_finder(self.results_directory)]
 
-        for infile in files:
-            path = os.path.join(self.results_directory, infile)
-            inqueue.put(path)
-
-        # Push the queue sentinel
-        for i in range(nprocs):
-            inqueue.put(None)
+        scheduler = MemoryAwareScheduler(worker, nprocs, memory_limit=memory_limit)
 
         with open(summary_file_path, 'w') as out:
 
@@ -1179,8 +1745,7 @@ class AnalyzerCommon(object):
             progress = Progress("analysing file")
             progress.start(len(files))
 
-            for num in range(total):
-                (path, line, error) = outqueue.get()
+            for (num, (path, line, error)) in enumerate(scheduler.run(files)):
 
                 print(f'Analysing {path}')
 
@@ -1195,26 +1760,19 @@ class AnalyzerCommon(object):
 
             print(f'Finished writing {summary_file_path}')
 
-        inqueue.close()
-        inqueue.join_thread()
-
-        outqueue.close()
-        outqueue.join_thread()
-
-        pool.close()
-        pool.join()
+        scheduler.report()
 
-    def run_single(self, summary_file, result_finder, flush=False, **kwargs):
+    def run_single(self, summary_file, result_finder, flush=False, safety_factors=None, **kwargs):
         """Perform the analysis and write the output to the :summary_file:"""
         
         def worker(ipath):
-            result = self.analyse_and_summarise_path_wrapped(path, flush, **kwargs)
+            result = self.analyse_and_summarise_path_wrapped(path, flush, safety_factors=safety_factors, **kwargs)
 
             # Skip 0 length results
             if result.number_of_repeats == 0:
                 raise RuntimeError("There are 0 repeats.")
 
-            line = "|".join(fn(result) for fn in self.values.values())
+            line = self._result_lines(result)
 
             # Try to force a cleanup of the memory
             result = None
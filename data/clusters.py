@@ -28,9 +28,9 @@ class ClusterCommon(object):
     def name(self):
         return type(self).__name__
 
-    def builder(self, sim_name):
+    def builder(self, sim_name, build_workers=1):
         from data.run.driver.cluster_builder import Runner as Builder
-        return Builder(sim_name)
+        return Builder(sim_name, build_workers=build_workers)
 
     def copy_to(self, dirname, user=None):
         username = self._get_username(user)
@@ -100,7 +100,7 @@ class ClusterCommon(object):
         app_ram = total_ram - ram_for_os_mb
         return int(app_ram // self.ppn) * self.ppn
 
-    def _pbs_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, *args, **kwargs):
+    def _pbs_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, pack_walltime=None, pack_lanes=1, *args, **kwargs):
         from data.run.driver.cluster_submitter import Runner as Submitter
 
         ram_to_ask_for_mb = self._ram_to_ask_for()
@@ -116,7 +116,8 @@ class ClusterCommon(object):
 
         prepare_command = self._get_prepare_command(sim_name, "cd $PBS_O_WORKDIR")
 
-        return Submitter(cluster_command, prepare_command, self.ppn, job_repeats=1, dry_run=dry_run, max_walltime=self.max_walltime)
+        return Submitter(cluster_command, prepare_command, self.ppn, job_repeats=1, dry_run=dry_run, max_walltime=self.max_walltime,
+                         pack_walltime=pack_walltime, pack_lanes=pack_lanes)
 
     def _pbs_array_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, *args, **kwargs):
         from data.run.driver.cluster_submitter import Runner as Submitter
@@ -145,7 +146,7 @@ class ClusterCommon(object):
         return Submitter(cluster_command, prepare_command, num_jobs,
                          job_repeats=num_array_jobs, array_job_variable="$PBS_ARRAYID", dry_run=dry_run, max_walltime=self.max_walltime)
 
-    def _sge_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, *args, **kwargs):
+    def _sge_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, pack_walltime=None, pack_lanes=1, *args, **kwargs):
         from data.run.driver.cluster_submitter import Runner as Submitter
 
         # There is only 24GB available and there are 48 threads that can be used for execution.
@@ -172,9 +173,10 @@ class ClusterCommon(object):
 
         prepare_command = self._get_prepare_command(sim_name, "")
 
-        return Submitter(cluster_command, prepare_command, jobs, job_repeats=1, dry_run=dry_run, max_walltime=self.max_walltime)
+        return Submitter(cluster_command, prepare_command, jobs, job_repeats=1, dry_run=dry_run, max_walltime=self.max_walltime,
+                         pack_walltime=pack_walltime, pack_lanes=pack_lanes)
 
-    def _moab_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, *args, **kwargs):
+    def _moab_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, pack_walltime=None, pack_lanes=1, *args, **kwargs):
         from data.run.driver.cluster_submitter import Runner as Submitter
 
         ram_to_ask_for_mb = self._ram_to_ask_for()
@@ -193,9 +195,10 @@ class ClusterCommon(object):
         else:
             prepare_command = self._get_prepare_command(sim_name, "cd $PBS_O_WORKDIR")
 
-        return Submitter(cluster_command, prepare_command, self.ppn, job_repeats=1, dry_run=dry_run, max_walltime=self.max_walltime)
+        return Submitter(cluster_command, prepare_command, self.ppn, job_repeats=1, dry_run=dry_run, max_walltime=self.max_walltime,
+                         pack_walltime=pack_walltime, pack_lanes=pack_lanes)
 
-    def _slurm_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, *args, **kwargs):
+    def _slurm_submitter(self, sim_name, notify_emails=None, dry_run=False, unhold=False, pack_walltime=None, pack_lanes=1, *args, **kwargs):
         from data.run.driver.cluster_submitter import Runner as Submitter
 
         ram_to_ask_for_mb = self._ram_to_ask_for(ram_for_os_mb=6 * 1024)
@@ -224,7 +227,9 @@ class ClusterCommon(object):
         return Submitter(cluster_command, prepare_command, self.ppn,
                          job_repeats=1,
                          dry_run=dry_run,
-                         max_walltime=self.max_walltime)
+                         max_walltime=self.max_walltime,
+                         pack_walltime=pack_walltime,
+                         pack_lanes=pack_lanes)
 
 
 class dummy(ClusterCommon):
@@ -265,7 +270,8 @@ class dummy(ClusterCommon):
 
         prepare_command = " <prepare> "
 
-        return DummySubmitter(cluster_command, prepare_command, self.ppn)
+        return DummySubmitter(cluster_command, prepare_command, self.ppn,
+                              pack_walltime=kwargs.get("pack_walltime", None), pack_lanes=kwargs.get("pack_lanes", 1))
 
     def array_submitter(self, sim_name, unhold=False, *args, **kwargs):
         from data.run.driver.cluster_submitter import Runner as Submitter
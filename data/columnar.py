@@ -0,0 +1,379 @@
+"""A columnar binary format for result files.
+
+Result files are text: a preamble of @ lines and options, a '#' header line and
+one '|' separated row per run. Loading them means parsing every cell with regexes
+and decompressing the per-node dicts. This module stores the same results in a
+NumPy .npz file with one set of arrays per column:
+ - int, bool and float columns are stored as arrays (None becomes NaN plus a mask)
+ - per-node dicts (optionally zlib+base64 compressed) are stored as dense
+   (rows, nodes) arrays of the values and of the position of each key in the dict
+ - anything else is stored as the utf-8 text of the cells
+
+Conversion is lossless. Every column is checked to re-encode to exactly the text
+it was created from, falling back to storing the text when it does not.
+"""
+
+import base64
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+from simulator.MetricsCommon import MetricsCommon
+
+EXTENSION = ".npz"
+
+FORMAT_VERSION = 1
+
+INT_RE = re.compile(r'-?(?:0|[1-9]\d*)$')
+
+def is_columnar(path):
+    return path.endswith(EXTENSION)
+
+def _is_float_cell(cell):
+    if cell == "None":
+        return True
+    try:
+        return repr(float(cell)) == cell
+    except ValueError:
+        return False
+
+def _decompress(cell):
+    return zlib.decompress(base64.b64decode(cell, validate=True)).decode("utf-8")
+
+def _compress(text):
+    return base64.b64encode(zlib.compress(text.encode("utf-8"), 9)).decode("utf-8")
+
+def _parse_node_dict(text):
+    """Parses a dict created by MetricsCommon.smaller_dict_str with integer keys.
+    Returns a list of (key, value text) pairs in the order they appear."""
+    if len(text) < 2 or text[0] != '{' or text[-1] != '}':
+        raise ValueError(text)
+
+    if text == "{}":
+        return []
+
+    items = []
+    for item in text[1:-1].split(','):
+        (key, value) = item.split(':')
+        if not INT_RE.match(key):
+            raise ValueError(text)
+        float(value)
+        items.append((int(key), value))
+    return items
+
+def _encode_node_dict(keys, values, value_type, compressed):
+    text = MetricsCommon.smaller_dict_str({key: value_type(value) for (key, value) in zip(keys, values)})
+    return _compress(text) if compressed else text
+
+def _encode_int(cells):
+    if not all(INT_RE.match(cell) for cell in cells):
+        return None
+    try:
+        return {"values": np.array([int(cell) for cell in cells], dtype=np.int64)}
+    except OverflowError:
+        return None
+
+def _encode_bool(cells):
+    if not all(cell in ("True", "False") for cell in cells):
+        return None
+    return {"values": np.array([cell == "True" for cell in cells], dtype=np.bool_)}
+
+def _encode_float(cells):
+    if not all(_is_float_cell(cell) for cell in cells):
+        return None
+
+    none = np.array([cell == "None" for cell in cells], dtype=np.bool_)
+    values = np.array([float('NaN') if cell == "None" else float(cell) for cell in cells], dtype=np.float64)
+
+    arrays = {"values": values}
+    if none.any():
+        arrays["none"] = none
+    return arrays
+
+def _encode_node_dicts(cells, compressed):
+    try:
+        rows = [_parse_node_dict(_decompress(cell) if compressed else cell) for cell in cells]
+    except (ValueError, zlib.error, UnicodeDecodeError):
+        return None
+
+    node_count = max((key for row in rows for (key, value) in row), default=-1) + 1
+
+    values = np.full((len(rows), node_count), float('NaN'), dtype=np.float64)
+    order = np.full((len(rows), node_count), -1, dtype=np.int16 if node_count < np.iinfo(np.int16).max else np.int32)
+
+    for (i, row) in enumerate(rows):
+        for (position, (key, value)) in enumerate(row):
+            values[i, key] = float(value)
+            order[i, key] = position
+
+    # Counters hold ints, everything else holds floats
+    if all(INT_RE.match(value) for row in rows for (key, value) in row):
+        value_types = (int, float)
+    else:
+        value_types = (float,)
+
+    for value_type in value_types:
+        if all(_encode_node_dict(keys, row_values, value_type, compressed) == cell
+               for (cell, (keys, row_values)) in zip(cells, _dense_rows(values, order))):
+            return {"values": values, "order": order, "int": np.array(value_type is int)}
+
+    return None
+
+def _encode_text(cells):
+    encoded = [cell.encode("utf-8") for cell in cells]
+
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(cell) for cell in encoded])
+
+    return {"blob": np.frombuffer(b"".join(encoded), dtype=np.uint8), "offsets": offsets}
+
+def _dense_rows(values, order):
+    """Yields the keys (in their original order) and values of each row of a dense node dict column."""
+    for (row_values, row_order) in zip(values, order):
+        keys = np.flatnonzero(row_order >= 0)
+        keys = keys[np.argsort(row_order[keys], kind="stable")]
+        yield (keys.tolist(), row_values[keys].tolist())
+
+# The order in which column encodings are attempted
+ENCODERS = (
+    ("int", _encode_int),
+    ("bool", _encode_bool),
+    ("float", _encode_float),
+    ("node_dict", lambda cells: _encode_node_dicts(cells, compressed=False)),
+    ("compressed_node_dict", lambda cells: _encode_node_dicts(cells, compressed=True)),
+    ("text", _encode_text),
+)
+
+def encode_column(cells):
+    """Returns the kind of the column and the arrays that store it."""
+    for (kind, encoder) in ENCODERS:
+        arrays = encoder(cells)
+        if arrays is not None:
+            return (kind, arrays)
+
+    raise RuntimeError("Unable to encode column")
+
+def split_text(lines, headings=None):
+    """Splits the lines of a result file into its preamble, headings,
+    rows and any other lines (with the number of rows that came before them).
+    headings only needs to be provided if the lines may not contain the '#' header."""
+    preamble = []
+    rows = []
+    extra = []
+
+    lines = iter(lines)
+
+    if headings is None:
+        for line in lines:
+            line = line.rstrip("\n")
+            preamble.append(line)
+
+            if line.startswith('#'):
+                headings = line[1:].split('|')
+                break
+        else:
+            raise RuntimeError("Unable to find the '#' header line in the results")
+
+    for line in lines:
+        line = line.rstrip("\n")
+        cells = line.split('|')
+
+        if len(cells) == len(headings) and not line.startswith('@') and not line.startswith('#'):
+            rows.append(cells)
+        else:
+            extra.append((len(rows), line))
+
+    return (preamble, headings, rows, extra)
+
+def write_columnar(path, lines, headings=None):
+    """Writes the result file lines to path in the columnar format."""
+    (preamble, headings, rows, extra) = split_text(lines, headings=headings)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "headings": headings,
+        "kinds": [],
+        "preamble": preamble,
+        "extra": extra,
+        "row_count": len(rows),
+    }
+
+    arrays = {}
+
+    for (i, heading) in enumerate(headings):
+        (kind, column_arrays) = encode_column([row[i] for row in rows])
+
+        meta["kinds"].append(kind)
+        arrays.update({f"{i}.{name}": array for (name, array) in column_arrays.items()})
+
+    arrays["meta"] = np.array(json.dumps(meta))
+
+    with open(path, "wb") as out:
+        np.savez(out, **arrays)
+
+class ColumnarResults(object):
+    def __init__(self, path):
+        self.path = path
+
+        self._arrays = np.load(path, allow_pickle=False)
+
+        meta = json.loads(str(self._arrays["meta"]))
+
+        if meta["version"] != FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported columnar results version {meta['version']} in {path}")
+
+        self.headings = meta["headings"]
+        self.kinds = dict(zip(self.headings, meta["kinds"]))
+        self.preamble = meta["preamble"]
+        self.extra = meta["extra"]
+        self.row_count = meta["row_count"]
+
+        self._index = {heading: i for (i, heading) in enumerate(self.headings)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._arrays.close()
+
+    def _array(self, heading, name):
+        key = f"{self._index[heading]}.{name}"
+        return self._arrays[key] if key in self._arrays else None
+
+    def values(self, heading):
+        """The values of a int, bool or float column. None is returned as NaN."""
+        kind = self.kinds[heading]
+        if kind not in ("int", "bool", "float"):
+            raise RuntimeError(f"The column {heading} of kind {kind} does not have scalar values")
+
+        return self._array(heading, "values")
+
+    def node_dicts(self, heading):
+        """The per-node dicts of a (compressed) node dict column with float values."""
+        kind = self.kinds[heading]
+        if kind not in ("node_dict", "compressed_node_dict"):
+            raise RuntimeError(f"The column {heading} of kind {kind} does not contain node dicts")
+
+        return [
+            dict(zip(keys, values))
+            for (keys, values) in _dense_rows(self._array(heading, "values"), self._array(heading, "order"))
+        ]
+
+    def cells(self, heading):
+        """The text of each cell in the column, exactly as it was in the text file."""
+        kind = self.kinds[heading]
+
+        if kind == "text":
+            blob = self._array(heading, "blob").tobytes()
+            offsets = self._array(heading, "offsets").tolist()
+            return [blob[start:end].decode("utf-8") for (start, end) in zip(offsets, offsets[1:])]
+
+        if kind in ("node_dict", "compressed_node_dict"):
+            value_type = int if self._array(heading, "int") else float
+            compressed = kind == "compressed_node_dict"
+
+            return [
+                _encode_node_dict(keys, values, value_type, compressed)
+                for (keys, values) in _dense_rows(self._array(heading, "values"), self._array(heading, "order"))
+            ]
+
+        values = self.values(heading)
+
+        if kind == "float":
+            none = self._array(heading, "none")
+            cells = [repr(value) for value in values.tolist()]
+            if none is not None:
+                cells = ["None" if is_none else cell for (cell, is_none) in zip(cells, none)]
+            return cells
+
+        return [str(value) for value in values.tolist()]
+
+    def lines(self):
+        """The lines of the equivalent text result file (without new lines)."""
+        yield from self.preamble
+
+        columns = [self.cells(heading) for heading in self.headings]
+
+        extra = iter(self.extra)
+        (extra_row, extra_line) = next(extra, (None, None))
+
+        for row in range(self.row_count + 1):
+            while extra_row == row:
+                yield extra_line
+                (extra_row, extra_line) = next(extra, (None, None))
+
+            if row < self.row_count:
+                yield "|".join(column[row] for column in columns)
+
+def columnar_path(text_path):
+    return text_path.rsplit(".", 1)[0] + EXTENSION
+
+def prefer_columnar(results_directory, filenames):
+    """Replaces text result files with their columnar version,
+    when one exists that is at least as new as the text file."""
+    result = []
+
+    for filename in filenames:
+        path = os.path.join(results_directory, filename)
+        other_path = columnar_path(path)
+
+        try:
+            if os.path.getmtime(other_path) >= os.path.getmtime(path):
+                filename = os.path.basename(other_path)
+        except OSError:
+            pass
+
+        result.append(filename)
+
+    return result
+
+def text_to_columnar(text_path, columnar_path):
+    with open(text_path, "r") as infile:
+        write_columnar(columnar_path, infile)
+
+def columnar_to_text(columnar_path, text_path):
+    with ColumnarResults(columnar_path) as results, open(text_path, "w") as out:
+        for line in results.lines():
+            print(line, file=out)
+
+def dataframe(results, usecols, dtype=None, converters=None, node_dict_converters=()):
+    """Creates the same DataFrame as reading the text results with pandas.read_csv.
+    Columns whose converter is one of node_dict_converters are created from
+    the dense arrays directly, rather than by parsing the text of every cell."""
+    import pandas as pd
+
+    dtype = dtype or {}
+    converters = converters or {}
+
+    columns = {}
+
+    for heading in usecols:
+        kind = results.kinds[heading]
+        converter = converters.get(heading)
+
+        if converter is not None:
+            if kind in ("node_dict", "compressed_node_dict") and getattr(converter, "func", converter) in node_dict_converters:
+                column = results.node_dicts(heading)
+            else:
+                column = [converter(cell) for cell in results.cells(heading)]
+
+            column = pd.Series(column)
+
+        elif kind in ("int", "bool", "float"):
+            column = pd.Series(results.values(heading))
+
+        else:
+            column = pd.Series(results.cells(heading), dtype=object)
+
+        if converter is None and heading in dtype:
+            column = column.astype(dtype[heading])
+
+        columns[heading] = column
+
+    return pd.DataFrame(columns, columns=list(usecols))
@@ -2,7 +2,7 @@
 from __future__ import print_function, division
 
 import ast
-import csv
+import copy
 import math
 import os.path
 import sys
@@ -10,8 +10,10 @@ import sys
 import numpy as np
 
 import data.submodule_loader as submodule_loader
+import data.summary_store as summary_store
+from data.summary_store import SummaryStore
 
-from simulator import Configuration, SourcePeriodModel
+from simulator import Configuration
 import simulator.sim
 
 def literal_eval_with_nan(value):
@@ -115,61 +117,69 @@ class Results(object):
 
         print(f"Reading results from {result_path}", file=sys.stderr)
 
-        with open(result_path, 'r') as result_file:
+        # The cells are decoded once and shared by every Results created from this file
+        store = SummaryStore.open(result_path)
 
-            reader = csv.reader(result_file, delimiter='|', quoting=csv.QUOTE_NONE)
-            
-            reader_iter = iter(reader)
+        param_columns = [store.column(name) if name in store.headers else None for name in self.parameter_names]
+        result_columns = [store.column(name) if name in store.headers else None for name in self.result_names]
 
-            # First line contains the headers
-            headers = next(reader_iter)
-            
-            # Remaining lines contain the results
-            for values in reader_iter:
-                dvalues = dict(zip(headers, values))
-                dvalues['source period'] = SourcePeriodModel.eval_input(dvalues['source period']).simple_str()
+        # The key each row was stored under in self.data, or None if it was filtered
+        self._store = store
+        self._row_keys = [None] * len(store.rows)
 
-                source_period = self._normalise_source_period(source_period_normalisation, dvalues)
+        for (row_id, stored_values) in enumerate(store.rows):
+            dvalues = dict(stored_values)
 
-                if 'network size' in dvalues:
-                    dvalues['network size'] = self._normalise_network_size(network_size_normalisation, dvalues)
+            source_period = self._normalise_source_period(source_period_normalisation, dvalues)
 
-                table_key = tuple(dvalues[name] for name in self.global_parameter_names)
+            if 'network size' in dvalues:
+                dvalues['network size'] = self._normalise_network_size(network_size_normalisation, dvalues)
 
-                params = tuple([self._process(name, dvalues) for name in self.parameter_names])
-                results = tuple([self._process(name, dvalues) for name in self.result_names])
+            table_key = tuple(dvalues[name] for name in self.global_parameter_names)
 
-                # Check if we should not process this result
-                if results_filter is not None:
-                    all_params = dict(zip(self.parameter_names, params))
-                    all_params.update(dvalues)
+            params = tuple([self._process(name, dvalues, column, row_id) for (name, column) in zip(self.parameter_names, param_columns)])
+            results = tuple([self._process(name, dvalues, column, row_id) for (name, column) in zip(self.result_names, result_columns)])
 
-                    if results_filter(all_params):
-                        #print("Filtering from ", result_path , ": ", all_params)
-                        continue
+            # Check if we should not process this result
+            if results_filter is not None:
+                all_params = dict(zip(self.parameter_names, params))
+                all_params.update(dvalues)
 
-                for param in self.global_parameter_names:
-                    getattr(self, self.name_to_attr(param)).add(dvalues[param])
+                if results_filter(all_params):
+                    #print("Filtering from ", result_path , ": ", all_params)
+                    continue
 
-                self.data.setdefault(table_key, {}).setdefault(source_period, {})[params] = results
+            for param in self.global_parameter_names:
+                getattr(self, self.name_to_attr(param)).add(dvalues[param])
 
-    def _process(self, name, dvalues):
+            self.data.setdefault(table_key, {}).setdefault(source_period, {})[params] = results
+
+            self._row_keys[row_id] = (table_key, source_period, params)
+
+    def _process(self, name, dvalues, column=None, row_id=None):
         try:
             value = dvalues[name]
         except KeyError as ex:
             raise RuntimeError(f"Unable to read '{name}' from the result file '{self.result_file_name}'. Available keys: {dvalues.keys()}")
 
+        (kind, decoded) = column[row_id] if column is not None else (summary_store.KIND_RAW, None)
+
         if name == 'captured':
-            return extract_scaled(value, scale=100.0)
+            return self._scaled(value, kind, decoded, scale=100.0)
         elif name in {'received ratio', 'paths reached end', 'source dropped', 'average duty cycle'}:
             # Convert from percentage in [0, 1] to [0, 100]
-            return extract_scaled(value, scale=100.0)
+            return self._scaled(value, kind, decoded, scale=100.0)
         elif name == 'normal latency':
             # Convert from seconds to milliseconds
-            return extract_scaled(value, scale=1000.0)
+            return self._scaled(value, kind, decoded, scale=1000.0)
         elif 'mean' in value:
-            return extract_scaled(value)
+            return self._scaled(value, kind, decoded)
         else:
+            # Dicts without a nan are decoded the same way by ast.literal_eval
+            # The decoded values are cached for the process, so must not be changed by users of these results
+            if kind == summary_store.KIND_LITERAL or (kind == summary_store.KIND_DICT and 'nan' not in value):
+                return copy.deepcopy(decoded) if isinstance(decoded, (dict, list)) else decoded
+
             try:
                 return ast.literal_eval(value)
             except (ValueError, SyntaxError):
@@ -180,6 +190,23 @@ class Results(object):
                 else:
                     RuntimeError(f"Unable to parse the string '{value}' for {name}")
 
+    @staticmethod
+    def _scaled(value, kind, decoded, scale=1):
+        if kind != summary_store.KIND_DICT:
+            return extract_scaled(value, scale=scale)
+
+        return {k: (v * scale if k in to_scale else v) for (k, v) in decoded.items()}
+
+    def select(self, **criteria):
+        """Finds the results whose summary columns equal :criteria: using the index of the summary store.
+        For example select(network_size="11", source_period="1.0").
+        Returns a list of ((table key, source period, params), results)."""
+        return [
+            (key, self.data[key[0]][key[1]][key[2]])
+            for key in (self._row_keys[row_id] for row_id in self._store.select(**criteria))
+            if key is not None
+        ]
+
     def parameter_set(self):
         if 'repeats' not in self.result_names:
             raise RuntimeError(f"The repeats result must be present in the results ({self.result_names}).")
@@ -1,5 +1,6 @@
 
 from collections import OrderedDict
+import glob
 import itertools
 import math
 import os.path
@@ -9,9 +10,9 @@ from more_itertools import unique_everseen
 
 import numpy as np
 
-from data import results, submodule_loader
+from data import columnar, results, submodule_loader
 
-from simulator import AttackerConfiguration, CoojaRadioModel
+from simulator import AttackerConfiguration, CoojaRadioModel, RunLedger
 import simulator.sim
 
 class MissingSafetyPeriodError(RuntimeError):
@@ -47,12 +48,17 @@ class RunSimulationsCommon(object):
 
         self._existing_results = {}
 
-    def run(self, repeats, argument_names, argument_product, time_estimator=None, verbose=False, debug=False, min_repeats=1):
+    def run(self, repeats, argument_names, argument_product, time_estimator=None, verbose=False, debug=False, min_repeats=1,
+            extended_horizon=False, determinism_check=None, determinism_check_rate=None, columnar_output=False,
+            resume=False):
 
         if len(argument_names) != len(argument_product[0]):
             raise RuntimeError("Number of argument names ({}) does not equal number of arguments ({})".format(
                 len(argument_names), len(argument_product[0])))
 
+        if extended_horizon:
+            argument_product = self._extended_horizon_product(argument_names, argument_product)
+
         if self._skip_completed_simulations:
             self._load_existing_results(argument_names)
         
@@ -60,14 +66,41 @@ class RunSimulationsCommon(object):
 
         # Check if this simulator actually supports thread count as an option
         sim_parsers_thread_count = any("thread count" in (parsers or []) for (name, inherits, parsers) in self._sim.parsers())
+        sim_parsers_determinism_check = any("determinism check" in (parsers or []) for (name, inherits, parsers) in self._sim.parsers())
+        sim_parsers_columnar_output = any("columnar output" in (parsers or []) for (name, inherits, parsers) in self._sim.parsers())
+        sim_parsers_execution_mode = any("execution mode" in (parsers or []) for (name, inherits, parsers) in self._sim.parsers())
+        sim_parsers_ledger = any("ledger" in (parsers or []) for (name, inherits, parsers) in self._sim.parsers())
 
         for arguments in argument_product:
             darguments = OrderedDict(zip(argument_names, arguments))
 
+            filename = os.path.join(
+                self._result_path,
+                '-'.join(map(self._sanitize_job_name, darguments.items())) + f"-{self.sim_name}.txt"
+            )
+
+            ledger = RunLedger.RunLedger(RunLedger.ledger_path(filename)) if sim_parsers_ledger else None
+
+            # A ledger only describes the runs in its results file
+            if ledger is not None and os.path.exists(ledger.path) and not os.path.exists(filename):
+                os.remove(ledger.path)
+
+            resuming = resume and ledger is not None and os.path.exists(ledger.path)
+
             repeats_to_run = repeats
 
-            if repeats is not None:
-                repeats_performed = self._get_repeats_performed(darguments)
+            if resuming:
+                repeats_to_run = len(ledger.remaining())
+
+                if repeats_to_run == 0:
+                    print(f"All the runs in the ledger for {darguments} completed, so skipping it.", file=sys.stderr)
+                    self.driver.total_job_size -= 1
+                    continue
+                else:
+                    print(f"Resuming {darguments} with the {repeats_to_run} runs in its ledger that did not complete", file=sys.stderr)
+
+            elif repeats is not None:
+                repeats_performed = self._get_repeats_performed(darguments, ledger)
 
                 if repeats_performed >= repeats:
                     print(f"Already gathered results for {darguments} with {repeats} repeats, so skipping it.", file=sys.stderr)
@@ -95,6 +128,21 @@ class RunSimulationsCommon(object):
             if sim_parsers_thread_count and getattr(self.driver, 'job_thread_count', None) is not None:
                 opts["--thread-count"] = self.driver.job_thread_count
 
+            if sim_parsers_execution_mode and getattr(self.driver, 'execution_mode', None) is not None:
+                opts["--execution-mode"] = self.driver.execution_mode
+
+            if ledger is not None:
+                opts["--ledger"] = ledger.path
+
+                if resuming:
+                    opts["--ledger-mode"] = "resume"
+
+            if sim_parsers_determinism_check and determinism_check is not None:
+                opts["--determinism-check"] = determinism_check
+
+                if determinism_check_rate is not None:
+                    opts["--determinism-check-rate"] = determinism_check_rate
+
             for (name, value) in darguments.items():
                 flag = _argument_name_to_parameter(name)
                 opts[flag] = value
@@ -103,7 +151,23 @@ class RunSimulationsCommon(object):
                 safety_period = self._get_safety_period(darguments)
                 opts["--safety-period"] = safety_period
 
-            opt_items = [f"{k} \"{v}\"" for (k, v) in opts.items()]
+            if extended_horizon:
+                extra_metrics = opts.get("--extra-metrics") or []
+                if isinstance(extra_metrics, str):
+                    extra_metrics = extra_metrics.split()
+
+                if "ExtendedHorizonMetrics" not in extra_metrics:
+                    extra_metrics = list(extra_metrics) + ["ExtendedHorizonMetrics"]
+
+                opts["--extra-metrics"] = extra_metrics
+
+            if columnar_output and sim_parsers_columnar_output:
+                opts["--columnar-output"] = columnar.columnar_path(filename)
+
+            opt_items = [
+                f"{k} " + (" ".join(f"\"{x}\"" for x in v) if isinstance(v, list) else f"\"{v}\"")
+                for (k, v) in opts.items()
+            ]
 
             if verbose:
                 opt_items.append("--verbose")
@@ -113,11 +177,6 @@ class RunSimulationsCommon(object):
 
             options = f'algorithm.{self.algorithm_module.name} {self.sim_name} {self._mode()} {" ".join(opt_items)}'
 
-            filename = os.path.join(
-                self._result_path,
-                '-'.join(map(self._sanitize_job_name, darguments.items())) + f"-{self.sim_name}.txt"
-            )
-
             estimated_time = None
             if time_estimator is not None:
                 estimated_time = time_estimator(
@@ -129,6 +188,32 @@ class RunSimulationsCommon(object):
 
             self.driver.add_job(options, filename, estimated_time)
 
+        # Drivers that pool the jobs only start running them once they have all been added
+        if hasattr(self.driver, 'finish'):
+            self.driver.finish()
+
+    @staticmethod
+    def _extended_horizon_product(argument_names, argument_product):
+        """Only run the largest safety factor of each parameter combination.
+        The results for the smaller safety factors are derived during analysis
+        from the capture and message times that are recorded."""
+        if "safety factor" not in argument_names:
+            raise RuntimeError("An extended horizon can only be used when a safety factor is a parameter")
+
+        index = argument_names.index("safety factor")
+
+        largest = OrderedDict()
+
+        for arguments in argument_product:
+            key = arguments[:index] + arguments[index+1:]
+
+            if key not in largest or arguments[index] > largest[key][index]:
+                largest[key] = arguments
+
+        print(f"Running {len(largest)} extended horizon parameter combinations instead of {len(argument_product)}", file=sys.stderr)
+
+        return list(largest.values())
+
     def _mode(self):
         mode = self.driver.mode()
 
@@ -220,23 +305,32 @@ class RunSimulationsCommon(object):
             self._existing_results = {tuple(map(str, k)): v for (k, v) in results_summary.parameter_set().items()}
         except IOError as e:
             message = str(e)
-            if 'No such file or directory' in message:
+            if 'No such file or directory' in message and glob.glob(os.path.join(self._result_path, "*.ledger")):
+                print(f"The results file {results_file_path} is not present, so only the run ledgers will be used to find the completed runs.", file=sys.stderr)
+            elif 'No such file or directory' in message:
                 raise RuntimeError(f"The results file {results_file_path} is not present. Perhaps rerun the command with '--no-skip-complete'?")
             else:
                 raise
 
-    def _get_repeats_performed(self, darguments):
+    def _get_repeats_performed(self, darguments, ledger=None):
         if not self._skip_completed_simulations:
             return 0
 
+        # Runs recorded in the ledger may not have been analysed yet.
+        # Once they have, they are also counted in the existing results.
+        ledger_repeats = ledger.completed() if ledger is not None else 0
+
         key = tuple(self._prepare_argument_name(k, v) for (k, v) in darguments.items())
 
         if key not in self._existing_results:
+            if ledger_repeats > 0:
+                return ledger_repeats
+
             print(f"Unable to find the key {key} in the existing results. Will now run the simulations for these parameters.", file=sys.stderr)
             return 0
 
         # Check that more than enough jobs were done
-        return self._existing_results[key]
+        return max(self._existing_results[key], ledger_repeats)
 
     def _sanitize_job_name(self, kv):
         value = self._prepare_argument_name(*kv, short=True)
@@ -9,13 +9,9 @@ class Runner(testbed_builder.Runner):
 
         self.max_buffer_size = max_buffer_size
 
-    def add_job(self, options, name, estimated_time=None):
-        a, module, module_path, target_directory = super(Runner, self).add_job(options, name, estimated_time)
-
+    def _post_build(self, target_directory, a):
         self.testbed.post_build_actions(target_directory, a)
 
-        return a, module, module_path, target_directory
-
     def mode(self):
         return "CYCLEACCURATE"
 
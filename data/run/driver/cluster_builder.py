@@ -1,10 +1,14 @@
+import inspect
 import os
 import shlex
 import shutil
+import sys
+import threading
 
 import data.util
 from data import submodule_loader
 from data.progress import Progress
+from data.run.driver.parallel_build import ParallelBuilds, build_directory
 
 import algorithm
 
@@ -15,18 +19,39 @@ from simulator import Configuration
 class Runner(object):
     required_safety_periods = True
 
-    def __init__(self, sim_name):
+    def __init__(self, sim_name, build_workers=1):
         self.sim_name = sim_name
         self._sim = submodule_loader.load(simulator.sim, self.sim_name)
         self._progress = Progress("building file")
         self.total_job_size = None
         self._jobs_executed = 0
+        self._lock = threading.Lock()
+
+        # Building in a scratch directory needs the simulator to be able to build outside of the module
+        if build_workers > 1 and "build_directory" not in inspect.signature(self._sim.build).parameters:
+            print(f"Building for {self.sim_name} in parallel is not supported, building one job at a time", file=sys.stderr)
+            build_workers = 1
+
+        # With more than one worker, parameter combinations are built at the same time in scratch directories
+        self._builds = ParallelBuilds(build_workers) if build_workers > 1 else None
 
     def add_job(self, options, name, estimated_time):
-        print(name)
+        if self._builds is None:
+            return self._build_job(options, name, scratch=False)
+
+        self._builds.submit(name, self._build_job, options, name, True)
 
-        if not self._progress.has_started():
-            self._progress.start(self.total_job_size)
+    def finish(self):
+        """Waits for the parallel builds, raising an error if any of them failed."""
+        if self._builds is not None:
+            self._builds.finish()
+
+    def _build_job(self, options, name, scratch):
+        with self._lock:
+            print(name)
+
+            if not self._progress.has_started():
+                self._progress.start(self.total_job_size)
 
         # Create the target directory
         target_directory = name[:-len(".txt")]
@@ -43,46 +68,50 @@ class Runner(object):
         # Build the binary
         print(f"Building for {self.sim_name}")
 
-        build_result = self._sim.build(module, a)
+        with build_directory(module_path, scratch) as build_path:
+            build_kwargs = {"build_directory": build_path} if scratch else {}
+
+            build_result = self._sim.build(module, a, **build_kwargs)
 
-        print(f"Build finished with result {build_result}...")
+            print(f"Build finished with result {build_result}...")
 
-        # Previously there have been problems with the built files not
-        # properly having been flushed to the disk before attempting to move them.
+            # Previously there have been problems with the built files not
+            # properly having been flushed to the disk before attempting to move them.
 
-        print(f"Copying files from {module_path} to {target_directory}...")
+            print(f"Copying files from {build_path} to {target_directory}...")
 
-        files_to_copy = (
-            "Analysis.py",
-            "Arguments.py",
-            "CommandLine.py",
-            "Metrics.py",
-            "__init__.py",
-        )
-        for name in files_to_copy:
-            shutil.copy(os.path.join(module_path, name), target_directory)
+            files_to_copy = (
+                "Analysis.py",
+                "Arguments.py",
+                "CommandLine.py",
+                "Metrics.py",
+                "__init__.py",
+            )
+            for name in files_to_copy:
+                shutil.copy(os.path.join(module_path, name), target_directory)
 
-        files_to_move = {
-            "tossim": (
-                "app.xml",
-                "_TOSSIM.so",
-                "TOSSIM.py",
-            ),
+            files_to_move = {
+                "tossim": (
+                    "app.xml",
+                    "_TOSSIM.so",
+                    "TOSSIM.py",
+                ),
 
-            "cooja": (
-                "main.exe",
-                "main.ihex",
-            ),
-        }
-        for name in files_to_move.get(self.sim_name, []):
-            shutil.move(os.path.join(module_path, name), target_directory)
+                "cooja": (
+                    "main.exe",
+                    "main.ihex",
+                ),
+            }
+            for name in files_to_move.get(self.sim_name, []):
+                shutil.move(os.path.join(build_path, name), target_directory)
 
 
-        print("All Done!")
+        with self._lock:
+            print("All Done!")
 
-        self._progress.print_progress(self._jobs_executed)
+            self._progress.print_progress(self._jobs_executed)
 
-        self._jobs_executed += 1
+            self._jobs_executed += 1
 
     def mode(self):
         return "CLUSTER"
@@ -3,14 +3,38 @@ from datetime import timedelta
 import os
 import subprocess
 
+def pack(jobs, capacity, lanes=1):
+    """Packs the (estimated_time, job) pairs into submissions using first fit decreasing.
+    Each submission has :lanes: lanes that run at the same time, each running its jobs one after another.
+    No lane of a submission takes longer than :capacity:, unless it holds a single job that is longer.
+    Returns a list of submissions, each a list of lanes, each a list of (estimated_time, job)."""
+    submissions = []
+
+    for (estimated_time, job) in sorted(jobs, key=lambda x: x[0], reverse=True):
+        for submission in submissions:
+            lane = min(submission, key=_lane_time)
+            if _lane_time(lane) + estimated_time <= capacity:
+                lane.append((estimated_time, job))
+                break
+        else:
+            submission = [[] for _ in range(lanes)]
+            submission[0].append((estimated_time, job))
+            submissions.append(submission)
+
+    return [[lane for lane in submission if lane] for submission in submissions]
+
+def _lane_time(lane):
+    return sum((estimated_time for (estimated_time, job) in lane), timedelta(0))
+
 class Runner:
     required_safety_periods = True
-    
+
     executable = 'python -OO -X faulthandler run.py'
 
     def __init__(self, cluster_command, prepare_command,
                  job_thread_count, job_repeats=1,
-                 array_job_variable=None, dry_run=False, max_walltime=None):
+                 array_job_variable=None, dry_run=False, max_walltime=None,
+                 pack_walltime=None, pack_lanes=1):
         self.cluster_command = cluster_command
         self.prepare_command = prepare_command
         self.job_thread_count = job_thread_count
@@ -19,6 +43,22 @@ class Runner:
         self.dry_run = dry_run
         self.max_walltime = max_walltime
 
+        # When packing, jobs are collected and submitted together in finish
+        self.pack_walltime = pack_walltime
+        self.pack_lanes = pack_lanes
+        self._packed_jobs = []
+
+        if pack_walltime is not None:
+            if max_walltime is not None and pack_walltime > max_walltime:
+                raise RuntimeError(f"The packing wall time {pack_walltime} is longer than the maximum cluster time of {max_walltime}")
+
+            if pack_lanes < 1:
+                raise RuntimeError(f"At least one lane is needed to pack jobs, not {pack_lanes}")
+
+            # The lanes share the allocation's threads
+            if job_thread_count is not None:
+                self.job_thread_count = max(1, job_thread_count // pack_lanes)
+
     def add_job(self, options, name, estimated_time):
         target_directory = name[:-len(".txt")]
 
@@ -29,6 +69,43 @@ class Runner:
 
         module = target_directory.replace("/", ".")
 
+        script_command = f'{self.executable} {module} {options} >> "{name}"'
+
+        # Jobs without an estimate may take as long as the maximum time, so are not packed
+        if self.pack_walltime is not None and estimated_time is not None:
+            self._packed_jobs.append((estimated_time, (module, script_command)))
+        else:
+            self._submit(module, estimated_time, script_command)
+
+    def finish(self):
+        """Submits the packed jobs."""
+        if not self._packed_jobs:
+            return
+
+        submissions = pack(self._packed_jobs, self.pack_walltime, self.pack_lanes)
+
+        print(f"Packed {len(self._packed_jobs)} jobs into {len(submissions)} submissions of at most {self.pack_walltime} with {self.pack_lanes} lanes")
+
+        for submission in submissions:
+            jobs = [job for lane in submission for (estimated_time, job) in lane]
+
+            (module, script_command) = jobs[0]
+            job_name = module if len(jobs) == 1 else f"{module}+{len(jobs) - 1}"
+
+            lane_commands = [" ; ".join(script_command for (estimated_time, (module, script_command)) in lane) for lane in submission]
+
+            if len(lane_commands) == 1:
+                command = lane_commands[0]
+            else:
+                command = " & ".join(f"( {lane_command} )" for lane_command in lane_commands) + " & wait"
+
+            estimated_time = max(_lane_time(lane) for lane in submission)
+
+            self._submit(job_name, estimated_time, command)
+
+        self._packed_jobs = []
+
+    def _submit(self, job_name, estimated_time, script_command):
         preamble = "#!/bin/bash\n"
 
         if estimated_time is None:
@@ -47,9 +124,7 @@ class Runner:
         minutes, seconds = divmod(remainder, 60)
         estimated_time_str = "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
 
-        cluster_command = self.cluster_command.format(estimated_time_str, module)
-
-        script_command = f'{self.executable} {module} {options} >> "{name}"'
+        cluster_command = self.cluster_command.format(estimated_time_str, job_name)
 
         # Print out any useful information that could aid in debugging
         debug_commands = [
@@ -65,7 +140,7 @@ class Runner:
             'lscpu'
         ]
         debug_command = " ; ".join(debug_commands)
-        
+
         # Need to remove empty strings as bash doesn't allow `;;`
         precommand = " ; ".join(filter(None, (self.prepare_command, debug_command, script_command, 'date')))
 
@@ -1,6 +1,10 @@
 
+import datetime
 import os
+import shlex
 import subprocess
+import sys
+import timeit
 
 from data.progress import Progress
 
@@ -16,19 +20,34 @@ class Runner(object):
         self.total_job_size = None
         self._jobs_executed = 0
 
+    @staticmethod
+    def _resumes(options):
+        """Whether the job resumes the runs in its ledger, so appends to its existing results."""
+        args = shlex.split(options)
+        try:
+            return args[args.index("--ledger-mode") + 1] == "resume"
+        except (ValueError, IndexError):
+            return False
+
+    def _check_results_file(self, options, name):
+        # Check for overwriting results files
+        if not self._resumes(options) and os.path.exists(name):
+            raise RuntimeError(f"Would overwriting {name}, terminating to avoid doing so.")
+
+    def _results_file_mode(self, options):
+        return 'a' if self._resumes(options) else 'w'
+
     def add_job(self, options, name, estimated_time):
 
         if not self._progress.has_started():
             self._progress.start(self.total_job_size)
 
-        # Check for overwriting results files
-        if os.path.exists(name):
-            raise RuntimeError(f"Would overwriting {name}, terminating to avoid doing so.")
+        self._check_results_file(options, name)
 
         print(f'{self.executable} {options} > {name} (overwriting={os.path.exists(name)})')
 
         with open(self.local_log, 'w') as log_file, \
-             open(name,'w') as out_file:
+             open(name, self._results_file_mode(options)) as out_file:
             subprocess.call(f"{self.executable} {options}", stdout=out_file, stderr=log_file, shell=True)
 
         self._progress.print_progress(self._jobs_executed)
@@ -37,3 +56,134 @@ class Runner(object):
 
     def mode(self):
         return "PARALLEL"
+
+class PooledRunner(Runner):
+    """Runs the jobs of every parameter combination at the same time, sharing a fixed number
+    of simulation slots across the machine (see simulator.JobServer). This means that the runs
+    of the next parameter combinations start while the last runs of a combination finish.
+
+    The fork server is used, as each job only needs the files it built until it has loaded them.
+    Builds are serialised, so at most :max_active_jobs: jobs are started at once to limit how
+    many are waiting to build or are holding memory."""
+
+    execution_mode = "fork-server"
+
+    report_interval = 30
+
+    def __init__(self, worker_count=None, max_active_jobs=3):
+        super().__init__()
+
+        if worker_count is None:
+            import psutil
+            worker_count = len(psutil.Process().cpu_affinity())
+
+        self.worker_count = worker_count
+        self.job_thread_count = worker_count
+        self.max_active_jobs = max_active_jobs
+
+        self._jobs = []
+
+        # The time the runs of each job are expected to take from the time model, if there is one
+        self._estimated_times = []
+
+    def add_job(self, options, name, estimated_time):
+        self._check_results_file(options, name)
+
+        self._jobs.append((options, name, self._job_size(options)))
+        self._estimated_times.append(estimated_time)
+
+    @staticmethod
+    def _job_size(options):
+        args = shlex.split(options)
+        try:
+            return int(args[args.index("--job-size") + 1])
+        except (ValueError, IndexError):
+            return 1
+
+    def finish(self):
+        from simulator.JobServer import JobServer
+
+        if not self._jobs:
+            return
+
+        job_server = JobServer(self.worker_count, os.path.abspath(self.local_log + ".build-lock"))
+
+        total_units = sum(job_size for (options, name, job_size) in self._jobs)
+
+        print(f"Running {len(self._jobs)} jobs with {total_units} runs using {self.worker_count} workers", file=sys.stderr)
+
+        pending = list(self._jobs)
+        active = []
+        failed = []
+
+        start_time = timeit.default_timer()
+        last_report = start_time
+
+        with open(self.local_log, 'w') as log_file:
+            try:
+                while pending or active:
+                    while pending and len(active) < self.max_active_jobs:
+                        (options, name, job_size) = pending.pop(0)
+
+                        print(f'{self.executable} {options} > {name}')
+
+                        out_file = open(name, self._results_file_mode(options))
+                        process = subprocess.Popen(f"{self.executable} {options}", stdout=out_file, stderr=log_file, shell=True,
+                                                   env=job_server.environment(), pass_fds=job_server.pass_fds())
+
+                        active.append((process, out_file, name))
+
+                    job_server.process_records(timeout=1)
+
+                    for (process, out_file, name) in [job for job in active if job[0].poll() is not None]:
+                        active.remove((process, out_file, name))
+                        out_file.close()
+
+                        if process.returncode != 0:
+                            print(f"The job for {name} failed with return code {process.returncode}, see {self.local_log}", file=sys.stderr)
+                            failed.append(name)
+
+                        self._jobs_executed += 1
+
+                        # The job may have died while holding slots
+                        job_server.process_records(timeout=0)
+                        job_server.reclaim()
+
+                        self._report(job_server, total_units, start_time)
+                        last_report = timeit.default_timer()
+
+                    if timeit.default_timer() - last_report >= self.report_interval:
+                        self._report(job_server, total_units, start_time)
+                        last_report = timeit.default_timer()
+
+            finally:
+                for (process, out_file, name) in active:
+                    process.kill()
+                    process.wait()
+                    out_file.close()
+
+                job_server.close()
+
+        if failed:
+            raise RuntimeError(f"{len(failed)} jobs failed: {failed}")
+
+    def _report(self, job_server, total_units, start_time):
+        time_taken = timeit.default_timer() - start_time
+        done = job_server.units_completed
+
+        throughput = done / time_taken if time_taken > 0 else 0
+
+        if throughput > 0:
+            remaining = datetime.timedelta(seconds=max(0, total_units - done) / throughput)
+        else:
+            remaining = "unknown"
+
+        # Until runs have finished, the throughput cannot be measured, but the time model can be used
+        if self._estimated_times and None not in self._estimated_times:
+            estimated_work = sum(self._estimated_times, datetime.timedelta(0))
+            model_remaining = estimated_work * (max(0, total_units - done) / total_units) / self.worker_count
+            remaining = f"{remaining} (time model {model_remaining})"
+
+        print("Finished {} out of {} jobs and {} out of {} runs. Throughput {:.2f} runs/s, time taken {}, estimated remaining {}\n".format(
+            self._jobs_executed, len(self._jobs), done, total_units, throughput,
+            datetime.timedelta(seconds=time_taken), remaining))
@@ -0,0 +1,100 @@
+"""Builds parameter combinations at the same time in private scratch directories.
+
+Building in the algorithm's own directory means only one build can happen at a
+time. Instead each job copies the algorithm's directory into a scratch directory
+and builds there. The directories the algorithm includes from its parent (such as
+../common) are only read by the build, so they are linked rather than copied.
+"""
+
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import traceback
+from multiprocessing.pool import ThreadPool
+
+from simulator.BuildCache import BUILD_DIRECTORIES, source_directories
+
+def scratch_root():
+    return os.environ.get("SLP_BUILD_SCRATCH_DIR") or None
+
+class ScratchDirectory(object):
+    """A private copy of the algorithm at :module_path: that can be built in instead of module_path.
+    The copy has the same parent directory name, so the build cache sees the same sources."""
+    def __init__(self, module_path):
+        self.original_module_path = module_path
+        self.root = None
+        self.module_path = None
+
+    def __enter__(self):
+        self.root = tempfile.mkdtemp(prefix="slp-build-", dir=scratch_root())
+
+        (parent_name, name) = os.path.split(os.path.normpath(os.path.abspath(self.original_module_path)))
+
+        parent = os.path.join(self.root, os.path.basename(parent_name))
+        self.module_path = os.path.join(parent, name)
+
+        os.makedirs(parent)
+
+        shutil.copytree(self.original_module_path, self.module_path,
+                        ignore=shutil.ignore_patterns(*BUILD_DIRECTORIES, "*.pyc"))
+
+        for directory in source_directories(self.original_module_path)[1:]:
+            os.symlink(directory, os.path.join(parent, os.path.basename(directory)))
+
+        return self
+
+    def __exit__(self, *args):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+@contextlib.contextmanager
+def build_directory(module_path, scratch):
+    """The directory to build :module_path: in, which is a scratch copy when :scratch: is True."""
+    if not scratch:
+        yield module_path
+    else:
+        with ScratchDirectory(module_path) as directory:
+            yield directory.module_path
+
+class ParallelBuilds(object):
+    """Runs build jobs on :workers: threads (the builds themselves are separate processes).
+    A failing job does not stop the others, instead the failures are reported once all jobs have finished."""
+    def __init__(self, workers):
+        if workers < 1:
+            raise RuntimeError(f"At least one build worker is needed, not {workers}")
+
+        self.workers = workers
+        self.pool = ThreadPool(workers)
+        self.lock = threading.Lock()
+
+        self.results = []
+        self.failures = []
+
+    def submit(self, name, function, *args):
+        self.results.append(self.pool.apply_async(self._run, (name, function, args)))
+
+    def _run(self, name, function, args):
+        try:
+            function(*args)
+        except Exception as ex:
+            with self.lock:
+                self.failures.append((name, ex, traceback.format_exc()))
+
+                print(f"Failed to build {name}: {ex}", file=sys.stderr)
+
+    def finish(self):
+        self.pool.close()
+        self.pool.join()
+
+        succeeded = len(self.results) - len(self.failures)
+
+        print(f"Built {succeeded} out of {len(self.results)} jobs using {self.workers} workers")
+
+        if self.failures:
+            for (name, ex, tb) in self.failures:
+                print(f"Failed to build {name}: {ex}", file=sys.stderr)
+                print(tb, file=sys.stderr)
+
+            raise RuntimeError(f"{len(self.failures)} builds failed: {[name for (name, ex, tb) in self.failures]}")
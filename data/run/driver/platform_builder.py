@@ -4,10 +4,12 @@ import os
 import shlex
 import shutil
 import subprocess
+import threading
 import time
 
 import data.util
 from data.progress import Progress
+from data.run.driver.parallel_build import ParallelBuilds, build_directory
 
 import algorithm
 
@@ -36,7 +38,7 @@ LOG_MODES = {
 class Runner:
     required_safety_periods = False
 
-    def __init__(self, platform, log_mode, generate_per_node_id_binary=False, quiet=False):
+    def __init__(self, platform, log_mode, generate_per_node_id_binary=False, quiet=False, build_workers=1):
         
         self.total_job_size = None
 
@@ -55,6 +57,10 @@ class Runner:
         else:
             self.pool = None
 
+        # With more than one worker, parameter combinations are built at the same time in scratch directories
+        self._builds = ParallelBuilds(build_workers) if build_workers > 1 else None
+        self._lock = threading.Lock()
+
     def _detect_os_of_build(self, module_path):
 
         if os.path.exists(os.path.join(module_path, "build")):
@@ -67,12 +73,24 @@ class Runner:
         raise RuntimeError("Failed to detect OS")
 
     def add_job(self, options, name, estimated_time=None):
+        if self._builds is None:
+            return self._build_job(options, name, scratch=False)
+
+        self._builds.submit(name, self._build_job, options, name, True)
+
+    def finish(self):
+        """Waits for the parallel builds, raising an error if any of them failed."""
+        if self._builds is not None:
+            self._builds.finish()
+
+    def _build_job(self, options, name, scratch):
 
         if not self.quiet:
-            print(name)
+            with self._lock:
+                print(name)
 
-            if not self._progress.has_started():
-                self._progress.start(self.total_job_size)
+                if not self._progress.has_started():
+                    self._progress.start(self.total_job_size)
 
         # Create the target directory
         target_directory = name[:-len(".txt")]
@@ -112,62 +130,63 @@ class Runner:
         if not self.quiet:
             print(f"Building for {build_args}")
 
-        build_result = Builder.build_actual(module_path, self.platform,
-                                            enable_fast_serial=False,
-                                            **build_args)
+        with build_directory(module_path, scratch) as build_path:
+            build_result = Builder.build_actual(build_path, self.platform,
+                                                enable_fast_serial=False,
+                                                **build_args)
 
-        if not self.quiet:
-            print(f"Build finished with result {build_result}, waiting for a bit...")
+            if not self.quiet:
+                print(f"Build finished with result {build_result}, waiting for a bit...")
 
-        # For some reason, we seemed to be copying files before
-        # they had finished being written. So wait a  bit here.
-        time.sleep(1)
+            # For some reason, we seemed to be copying files before
+            # they had finished being written. So wait a  bit here.
+            time.sleep(1)
 
-        if not self.quiet:
-            print(f"Copying files to '{target_directory}'")
-
-        # Detect the OS from the presence of one of these files:
-        os_of_build = self._detect_os_of_build(module_path)
-
-        files_to_copy = {
-            "tinyos": (
-                "app.c",
-                "ident_flags.txt",
-                "main.exe",
-                "main.ihex",
-                "main.srec",
-                "tos_image.xml",
-                "wiring-check.xml",
-            ),
-
-            "contiki": (
-                "main.exe",
-                "symbols.h",
-                "symbols.c",
-            ),
-        }
-        for name in files_to_copy[os_of_build]:
-            try:
-                src = os.path.join(module_path, "build", self.platform, name)
-                dest = target_directory
+            if not self.quiet:
+                print(f"Copying files to '{target_directory}'")
+
+            # Detect the OS from the presence of one of these files:
+            os_of_build = self._detect_os_of_build(build_path)
+
+            files_to_copy = {
+                "tinyos": (
+                    "app.c",
+                    "ident_flags.txt",
+                    "main.exe",
+                    "main.ihex",
+                    "main.srec",
+                    "tos_image.xml",
+                    "wiring-check.xml",
+                ),
+
+                "contiki": (
+                    "main.exe",
+                    "symbols.h",
+                    "symbols.c",
+                ),
+            }
+            for name in files_to_copy[os_of_build]:
+                try:
+                    src = os.path.join(build_path, "build", self.platform, name)
+                    dest = target_directory
                 
-                shutil.copy(src, dest)
-
-                #print("Copying {} -> {}".format(src, dest))
-            except IOError as ex:
-                # Ignore expected fails
-                if name not in {"main.srec", "wiring-check.xml"}:
-                    print(f"Not copying {name} due to {ex}")
-
-        # Copy any generated class files
-        for class_file in glob.glob(os.path.join(module_path, "*.class")):
-            try:
-                shutil.copy(class_file, target_directory)
-            except shutil.Error as ex:
-                if str(ex).endswith("are the same file"):
-                    continue
-                else:
-                    raise
+                    shutil.copy(src, dest)
+
+                    #print("Copying {} -> {}".format(src, dest))
+                except IOError as ex:
+                    # Ignore expected fails
+                    if name not in {"main.srec", "wiring-check.xml"}:
+                        print(f"Not copying {name} due to {ex}")
+
+            # Copy any generated class files
+            for class_file in glob.glob(os.path.join(build_path, "*.class")):
+                try:
+                    shutil.copy(class_file, target_directory)
+                except shutil.Error as ex:
+                    if str(ex).endswith("are the same file"):
+                        continue
+                    else:
+                        raise
 
         if self.pool is not None:
             target_ihex = os.path.join(target_directory, "main.ihex")
@@ -182,11 +201,12 @@ class Runner:
             self.pool.map(fn, configuration.topology.nodes)
 
         if not self.quiet:
-            print("All Done!")
+            with self._lock:
+                print("All Done!")
 
-            self._progress.print_progress(self._jobs_executed)
+                self._progress.print_progress(self._jobs_executed)
 
-            self._jobs_executed += 1
+                self._jobs_executed += 1
 
         return a, module, module_path, target_directory
 
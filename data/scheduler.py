@@ -0,0 +1,255 @@
+"""Schedules the analysis of result files over a set of worker processes.
+
+Files are analysed largest first, so the longest jobs start early and small files
+fill in the gaps at the end. A file is only started when its estimated peak memory
+fits in the memory that is left. The estimate is a fixed overhead plus a multiple of
+the file size. The multiple is learnt from the RSS growth of the workers, which is
+sampled with psutil while each file is being analysed.
+
+Workers are reused between files, unless analysing a file left the worker holding
+on to a lot of memory. In that case the worker is replaced with a fresh process,
+so the memory is returned to the OS.
+"""
+
+import datetime
+import multiprocessing
+import os
+import queue
+import sys
+import timeit
+import traceback
+
+import psutil
+
+MiB = 1024 * 1024
+
+class FileJob(object):
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+
+        self.estimate = None
+        self.worker = None
+
+        self.start_time = None
+        self.duration = None
+
+        self.start_rss = 0
+        self.peak_rss = 0
+
+    @property
+    def growth(self):
+        """How much the worker's RSS has grown while analysing this file."""
+        return max(0, self.peak_rss - self.start_rss)
+
+def _worker_main(function, inqueue, outqueue):
+    while True:
+        path = inqueue.get()
+
+        if path is None:
+            return
+
+        try:
+            outqueue.put((path, function(path), None))
+        except Exception as ex:
+            outqueue.put((path, None, (ex, traceback.format_exc())))
+
+class Worker(object):
+    def __init__(self, function, outqueue):
+        self.inqueue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_worker_main, args=(function, self.inqueue, outqueue))
+        self.process.start()
+
+        self.ps = psutil.Process(self.process.pid)
+        self.fresh_rss = self.rss()
+
+        self.job = None
+
+    def rss(self):
+        try:
+            return self.ps.memory_info().rss
+        except psutil.Error:
+            return 0
+
+    def start(self, job):
+        self.job = job
+        job.worker = self
+
+        job.start_rss = job.peak_rss = self.rss()
+        job.start_time = timeit.default_timer()
+
+        self.inqueue.put(job.path)
+
+    def finish(self):
+        job = self.job
+        job.duration = timeit.default_timer() - job.start_time
+
+        self.job = None
+
+        return job
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.terminate()
+        else:
+            self.inqueue.put(None)
+
+        self.process.join()
+
+        self.inqueue.close()
+        self.inqueue.join_thread()
+
+def _running_job(running, path):
+    for job in running:
+        if job.path == path:
+            return job
+
+    raise RuntimeError(f"Received a result for {path} which is not being analysed")
+
+class MemoryAwareScheduler(object):
+    def __init__(self, function, nprocs, memory_limit=None, reserve_fraction=0.1,
+                 initial_ratio=10.0, overhead=64 * MiB, recycle_growth=512 * MiB,
+                 poll_interval=0.2):
+        """:function: is called with the path of each file in a worker process and its result is returned.
+        :memory_limit: is the number of bytes the workers may use in total, if it is None
+        then the memory available when a file is started (less :reserve_fraction: of the total) is used."""
+        self.function = function
+        self.nprocs = nprocs
+        self.memory_limit = memory_limit
+        self.reserve = psutil.virtual_memory().total * reserve_fraction
+        self.overhead = overhead
+        self.recycle_growth = recycle_growth
+        self.poll_interval = poll_interval
+
+        # The largest ratio seen of memory used (beyond the overhead) to file size
+        self.ratio = initial_ratio
+        self.ratio_observed = False
+
+        self.completed = []
+
+    def estimate(self, job):
+        return self.overhead + int(self.ratio * job.size)
+
+    def _learn(self, job):
+        if job.size == 0 or job.growth <= self.overhead:
+            return
+
+        ratio = (job.growth - self.overhead) / job.size
+
+        # Be conservative and use the worst ratio seen, but replace the initial guess
+        if self.ratio_observed:
+            self.ratio = max(self.ratio, ratio)
+        else:
+            self.ratio = ratio
+            self.ratio_observed = True
+
+    def _headroom(self, running):
+        if self.memory_limit is None:
+            # Memory already used by running jobs is not available, so only count what they may still need
+            outstanding = sum(max(0, job.estimate - job.growth) for job in running)
+            return psutil.virtual_memory().available - self.reserve - outstanding
+        else:
+            return self.memory_limit - sum(max(job.estimate, job.growth) for job in running)
+
+    def _next_job(self, pending, running):
+        """The largest pending job that fits in the memory left.
+        If nothing is running the largest job is always started, even if it does not fit."""
+        if not running:
+            return pending[0]
+
+        headroom = self._headroom(running)
+
+        for job in pending:
+            if job.estimate <= headroom:
+                return job
+
+        return None
+
+    def _sample(self, running):
+        for job in running:
+            job.peak_rss = max(job.peak_rss, job.worker.rss())
+
+    def run(self, paths):
+        """Yields (path, result, error) for each path as it completes.
+        error is None or a tuple of the exception and the traceback."""
+        pending = sorted((FileJob(path) for path in paths), key=lambda job: job.size, reverse=True)
+
+        outqueue = multiprocessing.Queue()
+
+        idle = [Worker(self.function, outqueue) for _ in range(min(self.nprocs, len(pending)))]
+        running = []
+
+        finished = False
+
+        try:
+            while pending or running:
+                while pending and idle:
+                    for job in pending:
+                        job.estimate = self.estimate(job)
+
+                    job = self._next_job(pending, running)
+                    if job is None:
+                        break
+
+                    pending.remove(job)
+                    idle.pop().start(job)
+                    running.append(job)
+
+                try:
+                    (path, result, error) = outqueue.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    self._sample(running)
+
+                    # A worker that died (for example it was killed for running out of memory) will never reply
+                    for job in [job for job in running if not job.worker.process.is_alive()]:
+                        worker = job.worker
+                        running.remove(job)
+                        self.completed.append(worker.finish())
+
+                        worker.stop(kill=True)
+                        idle.append(Worker(self.function, outqueue))
+
+                        yield (job.path, None, (RuntimeError(f"Worker exited with code {worker.process.exitcode}"), ""))
+
+                    continue
+
+                job = _running_job(running, path)
+                worker = job.worker
+
+                self._sample(running)
+                running.remove(job)
+                self.completed.append(worker.finish())
+                self._learn(job)
+
+                if worker.rss() - worker.fresh_rss > self.recycle_growth:
+                    worker.stop(kill=True)
+                    worker = Worker(self.function, outqueue)
+
+                idle.append(worker)
+
+                yield (path, result, error)
+
+            finished = True
+
+        finally:
+            for job in running:
+                job.worker.stop(kill=True)
+
+            for worker in idle:
+                worker.stop(kill=not finished)
+
+            outqueue.close()
+            outqueue.join_thread()
+
+    def report(self, stream=sys.stdout, limit=None):
+        """Prints how long each file took to analyse and its peak memory usage, slowest first."""
+        jobs = sorted(self.completed, key=lambda job: job.duration, reverse=True)
+
+        print("Analysis time per file:", file=stream)
+        for job in jobs[:limit]:
+            print("{:>16} {:>10.1f}MiB size {:>10.1f}MiB peak growth {}".format(
+                str(datetime.timedelta(seconds=job.duration)), job.size / MiB, job.growth / MiB, job.path), file=stream)
+
+        total = sum(job.duration for job in jobs)
+        print(f"Total analysis time {datetime.timedelta(seconds=total)} over {len(jobs)} files, "
+              f"learnt memory ratio {self.ratio:.2f}", file=stream)
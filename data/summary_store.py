@@ -0,0 +1,229 @@
+"""An indexed SQLite store of the summary CSV created by the analysis.
+
+Reading a summary CSV involves evaluating the source period model of every row
+and calling ast.literal_eval on every cell. The store does this once per version
+of the CSV and saves the decoded cells next to it (x-results.csv is stored in
+x-results.sqlite). The store is rebuilt whenever the size or modification time
+of the CSV changes.
+
+Stores are also shared within a process, so the many tables and graphs that
+are created from the same results only load them once.
+"""
+
+import ast
+import csv
+import json
+import os
+import pickle
+import sqlite3
+import sys
+
+from simulator import SourcePeriodModel
+
+VERSION = 1
+
+# How a cell was decoded
+KIND_RAW = 0        # Could not be decoded, only the text is available
+KIND_LITERAL = 1    # Decoded with ast.literal_eval
+KIND_DICT = 2       # A dict decoded with NaN support (see data.results.extract_scaled)
+
+def store_path(csv_path):
+    return csv_path.rsplit(".", 1)[0] + ".sqlite"
+
+def decode_cell(value):
+    """Returns the kind of the cell and its decoded value."""
+    try:
+        decoded = ast.literal_eval(value.replace('nan', '"NaN"'))
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        decoded = None
+
+    if isinstance(decoded, dict):
+        try:
+            return (KIND_DICT, {k: v if v != "NaN" else float("NaN") for (k, v) in decoded.items()})
+        except TypeError:
+            pass
+
+    try:
+        return (KIND_LITERAL, ast.literal_eval(value))
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return (KIND_RAW, None)
+
+def _last_index(headers, name):
+    """The last column with the name is used, like dict(zip(headers, values)) would."""
+    return len(headers) - 1 - headers[::-1].index(name)
+
+def _source_period(value):
+    return SourcePeriodModel.eval_input(value).simple_str()
+
+def _stat(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+class SummaryStore(object):
+    # Stores that have been loaded in this process, by the path of the CSV
+    _loaded = {}
+
+    @classmethod
+    def open(cls, csv_path):
+        """Gets the store for the summary at :csv_path:, building it if it is missing or out of date."""
+        key = os.path.abspath(csv_path)
+        stat = _stat(csv_path)
+
+        store = cls._loaded.get(key)
+        if store is None or store.stat != stat:
+            store = cls(csv_path, stat)
+            cls._loaded[key] = store
+
+        return store
+
+    def __init__(self, csv_path, stat):
+        self.csv_path = csv_path
+        self.stat = stat
+
+        self.path = store_path(csv_path)
+
+        self._columns = {}
+
+        try:
+            self.db = self._connect_existing()
+            if self.db is None:
+                self.db = self._build(self.path)
+        except (OSError, sqlite3.Error) as ex:
+            print(f"Unable to use the summary store {self.path} ({ex}), building it in memory instead", file=sys.stderr)
+            self.db = self._build(":memory:")
+
+        self.headers = json.loads(self._meta("headers"))
+
+        # The rows are always needed, the decoded cells are loaded per column when needed
+        self.rows = [
+            {header: value for (header, value) in zip(self.headers, values) if value is not None}
+            for values in self.db.execute(f"SELECT {self._column_names()} FROM rows ORDER BY row_id")
+        ]
+
+    def _meta(self, key, db=None):
+        row = (db or self.db).execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _column_names(self):
+        return ",".join(f"c{i}" for i in range(len(self.headers)))
+
+    def _connect_existing(self):
+        if not os.path.exists(self.path):
+            return None
+
+        db = sqlite3.connect(self.path)
+
+        try:
+            if self._meta("version", db) == str(VERSION) and self._meta("stat", db) == json.dumps(self.stat, sort_keys=True):
+                return db
+        except sqlite3.Error:
+            pass
+
+        db.close()
+        return None
+
+    def _build(self, path):
+        print(f"Building summary store for {self.csv_path}", file=sys.stderr)
+
+        with open(self.csv_path, 'r') as result_file:
+            reader = csv.reader(result_file, delimiter='|', quoting=csv.QUOTE_NONE)
+
+            headers = next(reader)
+            rows = list(reader)
+
+        # Results are grouped by the simple string of the source period model,
+        # which is the same for many rows
+        source_periods = {}
+        source_period_col = _last_index(headers, 'source period') if 'source period' in headers else None
+
+        tmp_path = None if path == ":memory:" else f"{path}.{os.getpid()}.tmp"
+
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        db = sqlite3.connect(tmp_path or path)
+
+        columns = ",".join(f"c{i} TEXT" for i in range(len(headers)))
+        db.execute(f"CREATE TABLE rows (row_id INTEGER PRIMARY KEY, {columns})")
+        db.execute("CREATE TABLE cells (col INTEGER, row_id INTEGER, kind INTEGER, value BLOB, PRIMARY KEY (col, row_id)) WITHOUT ROWID")
+        db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        placeholders = ",".join("?" for _ in range(len(headers) + 1))
+
+        for (row_id, values) in enumerate(rows):
+            values = values[:len(headers)]
+
+            if source_period_col is not None and source_period_col < len(values):
+                value = values[source_period_col]
+                if value not in source_periods:
+                    source_periods[value] = _source_period(value)
+                values[source_period_col] = source_periods[value]
+
+            for (col, value) in enumerate(values):
+                (kind, decoded) = decode_cell(value)
+                db.execute("INSERT INTO cells VALUES (?, ?, ?, ?)",
+                           (col, row_id, kind, None if kind == KIND_RAW else pickle.dumps(decoded, protocol=pickle.HIGHEST_PROTOCOL)))
+
+            db.execute(f"INSERT INTO rows VALUES ({placeholders})", [row_id] + values + [None] * (len(headers) - len(values)))
+
+        for name in ('network size', 'source period'):
+            if name in headers:
+                col = _last_index(headers, name)
+                db.execute(f"CREATE INDEX rows_c{col} ON rows (c{col})")
+
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", str(VERSION)),
+            ("stat", json.dumps(self.stat, sort_keys=True)),
+            ("headers", json.dumps(headers)),
+        ])
+
+        db.commit()
+
+        if tmp_path is not None:
+            db.close()
+            os.replace(tmp_path, path)
+            db = sqlite3.connect(path)
+
+        return db
+
+    def _col(self, name):
+        try:
+            return _last_index(self.headers, name)
+        except ValueError:
+            raise RuntimeError(f"There is no column {name} in {self.csv_path}")
+
+    def column(self, name):
+        """The (kind, decoded value) of every cell in the column, in row order.
+        None is used for rows that do not have the column."""
+        try:
+            return self._columns[name]
+        except KeyError:
+            pass
+
+        result = [None] * len(self.rows)
+
+        for (row_id, kind, value) in self.db.execute("SELECT row_id, kind, value FROM cells WHERE col = ?", (self._col(name),)):
+            result[row_id] = (kind, None if value is None else pickle.loads(value))
+
+        self._columns[name] = result
+
+        return result
+
+    def select(self, **criteria):
+        """The ids of the rows whose columns equal :criteria:, underscores in names are treated as spaces.
+        For example select(network_size="11", source_period="1.0")"""
+        criteria = {self._col(name.replace("_", " ")): str(value) for (name, value) in criteria.items()}
+
+        try:
+            for col in criteria:
+                self.db.execute(f"CREATE INDEX IF NOT EXISTS rows_c{col} ON rows (c{col})")
+        except sqlite3.Error:
+            # The store may be read only, in which case the query is performed without an index
+            pass
+
+        where = " AND ".join(f"c{col} = ?" for col in criteria) or "1"
+
+        return [
+            row_id
+            for (row_id,) in self.db.execute(f"SELECT row_id FROM rows WHERE {where} ORDER BY row_id", list(criteria.values()))
+        ]
@@ -0,0 +1,213 @@
+"""A model of how long a simulation run takes, fitted on the summaries of earlier results.
+
+The wall time and event count of a run are modelled as log-linear in the network
+size, the source period and the safety factor, with a term for every configuration
+and attacker model. Fitting in log space means the errors are relative, and the
+spread of the residuals gives the prediction intervals.
+
+The model is fitted and saved by 'create.py <algorithm> time-model <sim>' and is
+then used to estimate the time cluster jobs need and the time local runs will take.
+"""
+
+import json
+import math
+import os
+import sys
+from statistics import NormalDist
+
+import numpy as np
+
+from data.summary_store import SummaryStore, KIND_DICT, KIND_LITERAL
+
+NUMERIC_FEATURES = ("network size", "source period", "safety factor")
+CATEGORICAL_FEATURES = ("configuration", "attacker model")
+
+# The summary columns that are modelled
+TARGETS = ("wall time", "event count")
+
+def _period(value):
+    from simulator import SourcePeriodModel
+
+    if isinstance(value, SourcePeriodModel.PeriodModel):
+        return value.fastest()
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return SourcePeriodModel.eval_input(str(value)).fastest()
+
+def _numeric(name, value):
+    value = _period(value) if name == "source period" else float(value)
+
+    return math.log(max(value, 1e-9))
+
+def rows_from_summary(csv_path):
+    """The parameters, mean wall time and event count and repeats of every row of a summary."""
+    store = SummaryStore.open(csv_path)
+
+    if TARGETS[0] not in store.headers:
+        raise RuntimeError(f"The summary {csv_path} does not have a {TARGETS[0]} column")
+
+    columns = {target: store.column(target) for target in TARGETS if target in store.headers}
+
+    rows = []
+
+    for (row_id, values) in enumerate(store.rows):
+        row = dict(values)
+
+        for (target, cells) in columns.items():
+            if cells[row_id] is None:
+                continue
+
+            (kind, value) = cells[row_id]
+            if kind == KIND_DICT:
+                row[target] = value.get("mean")
+            elif kind == KIND_LITERAL:
+                row[target] = value
+
+        row["repeats"] = int(row.get("repeats", 1))
+
+        rows.append(row)
+
+    return rows
+
+class TimeModel(object):
+    def __init__(self, categories, coefficients, sigmas, samples):
+        # The values seen for each categorical feature
+        self.categories = categories
+
+        # Per target, the intercept followed by a coefficient for each feature
+        self.coefficients = coefficients
+
+        # Per target, the standard deviation of the residuals in log space
+        self.sigmas = sigmas
+
+        self.samples = samples
+
+    def _features(self, args):
+        features = [1.0]
+
+        for name in NUMERIC_FEATURES:
+            value = args.get(name)
+            features.append(0.0 if value is None else _numeric(name, value))
+
+        for name in CATEGORICAL_FEATURES:
+            value = str(args.get(name))
+            features.extend(1.0 if value == category else 0.0 for category in self.categories[name])
+
+        return features
+
+    @classmethod
+    def fit(cls, rows, ridge=1e-3):
+        """Fits the model on rows from rows_from_summary. Rows are weighted by their number of repeats."""
+        categories = {
+            name: sorted({str(row.get(name)) for row in rows})
+            for name in CATEGORICAL_FEATURES
+        }
+
+        model = cls(categories, {}, {}, {})
+
+        for target in TARGETS:
+            target_rows = [row for row in rows if isinstance(row.get(target), (int, float)) and row[target] > 0]
+            if not target_rows:
+                continue
+
+            x = np.array([model._features(row) for row in target_rows])
+            y = np.log([row[target] for row in target_rows])
+            w = np.array([max(row["repeats"], 1) for row in target_rows], dtype=float)
+
+            # Ridge regression keeps the fit stable when a feature never varies,
+            # the intercept is not penalised
+            penalty = np.eye(x.shape[1]) * ridge
+            penalty[0, 0] = 0
+
+            coefficients = np.linalg.solve(x.T @ (x * w[:, None]) + penalty, x.T @ (y * w))
+
+            residuals = y - x @ coefficients
+            dof = max(len(y) - np.linalg.matrix_rank(x), 1)
+            sigma = math.sqrt(np.sum(w * residuals ** 2) / np.sum(w) * len(y) / dof)
+
+            model.coefficients[target] = coefficients.tolist()
+            model.sigmas[target] = sigma
+            model.samples[target] = len(target_rows)
+
+        if TARGETS[0] not in model.coefficients:
+            raise RuntimeError(f"There are no rows with a {TARGETS[0]} to fit the time model on")
+
+        return model
+
+    def predict(self, args, target=TARGETS[0], level=0.9):
+        """The (estimate, lower, upper) :target: of a run with the parameters :args:.
+        The true value lies between lower and upper with probability :level:."""
+        mu = float(np.dot(self._features(args), self.coefficients[target]))
+
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        spread = z * self.sigmas[target]
+
+        return (math.exp(mu), math.exp(mu - spread), math.exp(mu + spread))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "categories": self.categories,
+                "coefficients": self.coefficients,
+                "sigmas": self.sigmas,
+                "samples": self.samples,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+def cross_validate(rows, folds=5, level=0.9):
+    """Per target, the median absolute percentage error and the fraction of
+    rows within the prediction interval when each fold is predicted by a model fitted on the others."""
+    folds = max(2, min(folds, len(rows)))
+
+    errors = {target: [] for target in TARGETS}
+    covered = {target: [] for target in TARGETS}
+
+    for fold in range(folds):
+        training = [row for (i, row) in enumerate(rows) if i % folds != fold]
+        testing = [row for (i, row) in enumerate(rows) if i % folds == fold]
+
+        try:
+            model = TimeModel.fit(training)
+        except RuntimeError:
+            continue
+
+        for row in testing:
+            for target in model.coefficients:
+                actual = row.get(target)
+                if not isinstance(actual, (int, float)) or actual <= 0:
+                    continue
+
+                (estimate, lower, upper) = model.predict(row, target=target, level=level)
+
+                errors[target].append(abs(estimate - actual) / actual)
+                covered[target].append(lower <= actual <= upper)
+
+    return {
+        target: {
+            "median absolute percentage error": float(np.median(errors[target])) * 100,
+            "interval coverage": float(np.mean(covered[target])) * 100,
+            "predictions": len(errors[target]),
+        }
+        for target in TARGETS
+        if errors[target]
+    }
+
+def load_or_fit(model_path, summary_path):
+    """The model saved at :model_path:, or one fitted on the summary at :summary_path:.
+    None is returned when neither is available."""
+    if os.path.exists(model_path):
+        return TimeModel.load(model_path)
+
+    if os.path.exists(summary_path):
+        try:
+            return TimeModel.fit(rows_from_summary(summary_path))
+        except RuntimeError as ex:
+            print(f"Unable to fit a time model on {summary_path}: {ex}", file=sys.stderr)
+
+    return None
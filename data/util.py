@@ -141,3 +141,222 @@ class RunningStats(object):
         result.new_s = (self_sum_squares + that_sum_squares) - result.new_m**2 * result.n
 
         return result
+
+class RunningMoments(object):
+    """Mergeable first to fourth central moments, as RunningStats but with
+    batches of values pushed at once, so skew and kurtosis can be found too.
+    See: Pebay, "Formulas for Robust, One-Pass Parallel Computation of Covariances and Arbitrary-Order Statistical Moments"."""
+    def __init__(self):
+        self.n = 0
+        self.m = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = None
+        self.max = None
+
+    def push_many(self, values):
+        values = np.asarray(values)
+
+        if len(values) == 0:
+            return
+
+        that = RunningMoments()
+
+        that.n = len(values)
+        that.min = values.min()
+        that.max = values.max()
+
+        values = values.astype(np.float64)
+
+        that.m = values.mean()
+
+        deviations = values - that.m
+        squared = deviations**2
+
+        that.m2 = squared.sum()
+        that.m3 = (squared * deviations).sum()
+        that.m4 = (squared**2).sum()
+
+        self.combine(that, inplace=True)
+
+    def count(self):
+        return self.n
+
+    def mean(self):
+        return self.m if self.n else float('NaN')
+
+    def var(self, ddof=1):
+        return self.m2 / (self.n - ddof) if self.n > ddof else float('NaN')
+
+    def stddev(self, ddof=1):
+        return math.sqrt(self.var(ddof=ddof))
+
+    def skew(self):
+        """The bias corrected sample skew, as calculated by pandas."""
+        n = self.n
+        if n < 3:
+            return float('NaN')
+        if self.m2 == 0:
+            return 0.0
+        return (n * (n - 1) ** 0.5 / (n - 2)) * (self.m3 / self.m2**1.5)
+
+    def kurt(self):
+        """The bias corrected sample excess kurtosis, as calculated by pandas."""
+        n = self.n
+        if n < 4:
+            return float('NaN')
+        if self.m2 == 0:
+            return 0.0
+        adj = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        return (n * (n + 1) * (n - 1) * self.m4) / ((n - 2) * (n - 3) * self.m2**2) - adj
+
+    def combine(self, that, inplace=False):
+        result = self if inplace else RunningMoments()
+
+        if that.n == 0 or self.n == 0:
+            source = self if that.n == 0 else that
+            (result.n, result.m, result.m2, result.m3, result.m4, result.min, result.max) = (
+                source.n, source.m, source.m2, source.m3, source.m4, source.min, source.max)
+            return result
+
+        (na, nb) = (self.n, that.n)
+        n = na + nb
+        delta = that.m - self.m
+
+        m = self.m + delta * nb / n
+        m2 = self.m2 + that.m2 + delta**2 * na * nb / n
+        m3 = (self.m3 + that.m3 + delta**3 * na * nb * (na - nb) / n**2 +
+              3 * delta * (na * that.m2 - nb * self.m2) / n)
+        m4 = (self.m4 + that.m4 + delta**4 * na * nb * (na**2 - na * nb + nb**2) / n**3 +
+              6 * delta**2 * (na**2 * that.m2 + nb**2 * self.m2) / n**2 +
+              4 * delta * (na * that.m3 - nb * self.m3) / n)
+
+        (result.n, result.m, result.m2, result.m3, result.m4) = (n, m, m2, m3, m4)
+        result.min = min(self.min, that.min)
+        result.max = max(self.max, that.max)
+
+        return result
+
+class QuantileSketch(object):
+    """A mergeable sketch of a distribution to estimate its quantiles.
+    Quantiles are exact (matching numpy and pandas) while there are at most
+    max_size distinct values. After that values are compressed into weighted
+    centroids using the scale function of a t-digest."""
+    def __init__(self, max_size=1000, compression=500):
+        self.max_size = max_size
+        self.compression = compression
+
+        # When exact each mean is a distinct value and its weight is how many times it was seen
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.exact = True
+
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def push_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+
+        if len(values) == 0:
+            return
+
+        that = QuantileSketch(max_size=self.max_size, compression=self.compression)
+        that.min = values.min()
+        that.max = values.max()
+        that.means = values
+        that.weights = np.ones(len(values))
+
+        self._merge(that)
+
+    def combine(self, that):
+        result = QuantileSketch(max_size=self.max_size, compression=self.compression)
+
+        result._merge(self)
+        result._merge(that)
+
+        return result
+
+    def count(self):
+        return self.weights.sum()
+
+    def _merge(self, that):
+        self.min = min(self.min, that.min)
+        self.max = max(self.max, that.max)
+
+        self.means = np.concatenate((self.means, that.means))
+        self.weights = np.concatenate((self.weights, that.weights))
+        self.exact = self.exact and that.exact
+
+        if len(self.means) > self.max_size:
+            self._compress()
+
+    def _compress(self):
+        if self.exact:
+            (means, inverse) = np.unique(self.means, return_inverse=True)
+
+            self.means = means
+            self.weights = np.bincount(inverse, weights=self.weights)
+
+            if len(self.means) <= self.max_size:
+                return
+
+            self.exact = False
+
+        order = np.argsort(self.means, kind="stable")
+        means = self.means[order]
+        weights = self.weights[order]
+
+        total = weights.sum()
+        delta = self.compression
+
+        def k(q):
+            return delta / (2 * math.pi) * math.asin(2 * q - 1)
+
+        def q_limit(q):
+            return (math.sin(min(k(q) + 1, delta / 4) * 2 * math.pi / delta) + 1) / 2
+
+        new_means = [means[0]]
+        new_weights = [weights[0]]
+
+        weight_before = 0.0
+        limit = q_limit(0.0)
+
+        for (mean, weight) in zip(means[1:], weights[1:]):
+            if (weight_before + new_weights[-1] + weight) / total <= limit:
+                merged = new_weights[-1] + weight
+                new_means[-1] += (mean - new_means[-1]) * weight / merged
+                new_weights[-1] = merged
+            else:
+                weight_before += new_weights[-1]
+                limit = q_limit(weight_before / total)
+
+                new_means.append(mean)
+                new_weights.append(weight)
+
+        self.means = np.array(new_means)
+        self.weights = np.array(new_weights)
+
+    def quantile(self, q):
+        if len(self.means) == 0:
+            return float('NaN')
+
+        order = np.argsort(self.means, kind="stable")
+        means = self.means[order]
+        weights = self.weights[order]
+
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+
+        if self.exact:
+            # Linear interpolation between the values either side of the position, as numpy does
+            position = q * (total - 1)
+            (lower, upper) = np.searchsorted(cumulative, [math.floor(position), math.ceil(position)], side="right")
+
+            return means[lower] + (means[upper] - means[lower]) * (position - math.floor(position))
+
+        centres = cumulative - weights / 2
+
+        return np.interp(q * total,
+                         np.concatenate(([0.0], centres, [total])),
+                         np.concatenate(([self.min], means, [self.max])))
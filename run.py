@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 
 import os
+import signal
 import sys
 import faulthandler
+import threading
 
 import algorithm
 
 import simulator.sim
+import simulator.DeterminismCheck as DeterminismCheck
+import simulator.JobServer as JobServer
 import simulator.MetricsCommon as MetricsCommon
+import simulator.RunLedger as RunLedger
 import simulator.VersionDetection as VersionDetection
 
 from data import submodule_loader
@@ -35,6 +40,13 @@ def main(argv):
 
     sim = submodule_loader.load(simulator.sim, a.args.sim)
 
+    # When started by the local driver's global pool, simulations share the machine's slots with other jobs
+    job_server = JobServer.JobServerClient.from_environment() if a.args.mode == "PARALLEL" else None
+
+    # Other jobs must not build until this job no longer needs the files it built
+    if job_server is not None:
+        job_server.acquire_build_lock()
+
     if a.args.mode in ("SINGLE", "GUI", "RAW", "PARALLEL"):
         sim.build(module, a)
 
@@ -42,39 +54,64 @@ def main(argv):
     if a.args.mode == "PROFILE":
         a.args.mode = "SINGLE"
 
-    # Set the thread count, but only for jobs that need it
-    if hasattr(a.args, "thread_count") and a.args.thread_count is None:
+    # Set the thread count, but only for jobs that need it.
+    # Offline replay stays sequential unless a thread count is given.
+    if a.args.mode in ("PARALLEL", "CLUSTER") and a.args.thread_count is None:
         import psutil
         # Set the number of usable CPUs
         a.args.thread_count = len(psutil.Process().cpu_affinity())
 
-    # When doing cluster array jobs only print out this header information on the first job
-    if a.args.mode != "CLUSTER" or a.args.job_id is None or a.args.job_id == 1:
-        from datetime import datetime
+    determinism_check = None
+    if a.args.mode in ("PARALLEL", "CLUSTER"):
+        determinism_check = DeterminismCheck.DeterminismCheck(
+            getattr(a.args, "determinism_check", "always"),
+            rate=getattr(a.args, "determinism_check_rate", None),
+            build_hash=DeterminismCheck.build_hash(sim, module))
+
+    metrics_class = MetricsCommon.import_algorithm_metrics(module, a.args.sim, a.args.extra_metrics)
 
-        metrics_class = MetricsCommon.import_algorithm_metrics(module, a.args.sim, a.args.extra_metrics)
+    # Records the job's runs, so that the job can be resumed if it is killed
+    ledger = None
+    ledger_seeds = None
+    resuming = False
+    if getattr(a.args, "ledger", None) is not None:
+        ledger = RunLedger.RunLedger(a.args.ledger)
 
-        # Print out the versions of slp-algorithms-tinyos and tinyos being used
-        print(f"@version:python={VersionDetection.python_version()}")
-        print(f"@version:numpy={VersionDetection.numpy_version()}")
+        resuming = a.args.ledger_mode == "resume"
 
-        print(f"@version:slp-algorithms={VersionDetection.slp_algorithms_version()}")
-        
-        sim.print_version()
+        if resuming:
+            ledger_seeds = ledger.remaining()
 
-        # Print other potentially useful meta data
-        print(f"@date:{str(datetime.now())}")
-        print(f"@host:{os.uname()}")
+            print(f"Resuming the job with the {len(ledger_seeds)} runs in {a.args.ledger} that did not complete", file=sys.stderr)
 
-        # Record what algorithm is being run and under what simulator
-        print(f"@module:{module}")
-        print(f"@sim:{a.args.sim}")
+            if not ledger_seeds:
+                return 0
+
+            # The columnar results would only contain the resumed runs, so the text results are used instead
+            columnar_output = getattr(a.args, "columnar_output", None)
+            if columnar_output is not None:
+                if os.path.exists(columnar_output):
+                    os.remove(columnar_output)
+                a.args.columnar_output = None
+        else:
+            ledger_seeds = ledger.plan(a.args.job_size)
+
+    # When doing cluster array jobs only print out this header information on the first job.
+    # A resumed job appends to results that already have the header.
+    header_text = ""
+    if not resuming and (a.args.mode != "CLUSTER" or a.args.job_id is None or a.args.job_id == 1):
+        if getattr(a.args, "columnar_output", None) is None:
+            print_header(sim, module, a, metrics_class, determinism_check)
+        else:
+            # Keep a copy of the header to write to the columnar results
+            import contextlib
+            import io
 
-        # Print out the argument settings
-        sim.print_arguments(module, a)
+            with contextlib.redirect_stdout(io.StringIO()) as header:
+                print_header(sim, module, a, metrics_class, determinism_check)
 
-        # Print the header for the results
-        metrics_class.print_header()
+            header_text = header.getvalue()
+            sys.stdout.write(header_text)
 
         # Make sure this header has been written
         sys.stdout.flush()
@@ -84,7 +121,36 @@ def main(argv):
     if a.args.mode in ("GUI", "SINGLE", "RAW"):
         sim.run_simulation(module, a, print_warnings=True)
     else:
-        _run_parallel(sim, module, a, argv)
+        return _run_parallel(sim, module, a, argv, metrics_class, determinism_check, header_text, job_server,
+                             ledger, ledger_seeds)
+
+def print_header(sim, module, a, metrics_class, determinism_check):
+    from datetime import datetime
+
+    # Print out the versions of slp-algorithms-tinyos and tinyos being used
+    print(f"@version:python={VersionDetection.python_version()}")
+    print(f"@version:numpy={VersionDetection.numpy_version()}")
+
+    print(f"@version:slp-algorithms={VersionDetection.slp_algorithms_version()}")
+    
+    sim.print_version()
+
+    # Print other potentially useful meta data
+    print(f"@date:{str(datetime.now())}")
+    print(f"@host:{os.uname()}")
+
+    # Record what algorithm is being run and under what simulator
+    print(f"@module:{module}")
+    print(f"@sim:{a.args.sim}")
+
+    # Print out the argument settings
+    sim.print_arguments(module, a)
+
+    if determinism_check is not None:
+        determinism_check.print_meta()
+
+    # Print the header for the results
+    metrics_class.print_header(attacker_model=getattr(a.args, "attacker_model", None))
 
 def convert_parallel_args_to_single(argv, sim):
     new_args = list(argv[1:])
@@ -113,7 +179,140 @@ def convert_parallel_args_to_single(argv, sim):
 
     return new_args
 
-def _run_parallel(sim, module, a, argv):
+class _ForkServer(object):
+    """Runs each simulation in a forked copy of this process.
+
+    The algorithm, the TOSSIM module and any seed independent state are
+    prepared once, so each child only pays for the simulation itself.
+    As with separate interpreters a crashing child does not bring down the job."""
+    def __init__(self, sim, module, a, single_args, report_result, print_lock):
+        self.sim = sim
+        self.module = module
+        self.arguments_class = type(a)
+
+        # The first element is the module, which the argument parser is not given
+        self.single_args = single_args[1:]
+
+        self.report_result = report_result
+        self.print_lock = print_lock
+
+        # Forking and creating pipes need to be serialised, so that
+        # a child only ever holds open the pipes that belong to it.
+        self._fork_lock = threading.Lock()
+        self._open_fds = set()
+
+        self.prepared_kwargs = sim.prepare_fork_server(module, a)
+
+    def _child_args(self, seed):
+        args = list(self.single_args)
+
+        if seed is not None:
+            try:
+                seed_index = args.index('--seed')
+                args[seed_index + 1] = str(seed)
+            except ValueError:
+                args.extend(('--seed', str(seed)))
+
+        return args
+
+    def _run_child(self, seed, stdout_fd, stderr_fd):
+        result = 1
+        try:
+            os.dup2(stdout_fd, sys.stdout.fileno())
+            os.dup2(stderr_fd, sys.stderr.fileno())
+
+            a = self.arguments_class()
+            a.parse(self._child_args(seed))
+
+            result = self.sim.run_simulation(self.module, a, **self.prepared_kwargs)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            # Skip any cleanup handlers inherited from the parent
+            os._exit(result if isinstance(result, int) else 1)
+
+    @staticmethod
+    def _read_all(stdout_fd, stderr_fd):
+        import selectors
+
+        output = {stdout_fd: [], stderr_fd: []}
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(stdout_fd, selectors.EVENT_READ)
+            selector.register(stderr_fd, selectors.EVENT_READ)
+
+            remaining = 2
+            while remaining > 0:
+                for (key, events) in selector.select():
+                    chunk = os.read(key.fd, 65536)
+                    if chunk:
+                        output[key.fd].append(chunk)
+                    else:
+                        selector.unregister(key.fd)
+                        remaining -= 1
+
+        return tuple(b"".join(output[fd]).decode("utf-8") for fd in (stdout_fd, stderr_fd))
+
+    def __call__(self, seed):
+        with self._fork_lock:
+            (stdout_read, stdout_write) = os.pipe()
+            (stderr_read, stderr_write) = os.pipe()
+
+            # Anything left in the buffers would otherwise be written by the child too.
+            # The print lock is held until the fork, so other threads cannot fill them again.
+            with self.print_lock:
+                sys.stdout.flush()
+                sys.stderr.flush()
+
+                pid = os.fork()
+
+            if pid == 0:
+                for fd in self._open_fds | {stdout_read, stderr_read}:
+                    os.close(fd)
+
+                self._run_child(seed, stdout_write, stderr_write)
+
+            os.close(stdout_write)
+            os.close(stderr_write)
+
+            self._open_fds.update((stdout_read, stderr_read))
+
+        try:
+            (stdoutdata, stderrdata) = self._read_all(stdout_read, stderr_read)
+
+            (_, status) = os.waitpid(pid, 0)
+
+        except (KeyboardInterrupt, SystemExit) as ex:
+            with self.print_lock:
+                print(f"Killing process {pid} due to {ex}", file=sys.stderr)
+                sys.stdout.flush()
+                sys.stderr.flush()
+            os.kill(pid, signal.SIGKILL)
+            raise
+
+        finally:
+            with self._fork_lock:
+                self._open_fds.difference_update((stdout_read, stderr_read))
+
+            os.close(stdout_read)
+            os.close(stderr_read)
+
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+
+        self.report_result(f"fork-server seed={seed}", returncode, stdoutdata, stderrdata)
+
+        return stdoutdata
+
+def _run_parallel(sim, module, a, argv, metrics_class, determinism_check, header_text="", job_server=None,
+                  ledger=None, ledger_seeds=None):
+    import contextlib
     from datetime import datetime
     import multiprocessing.pool
     from threading import Lock
@@ -142,47 +341,52 @@ def _run_parallel(sim, module, a, argv):
         return subprocess_args
 
 
+    def report_result(args, returncode, stdoutdata, stderrdata):
+        # Multiple processes may be attempting to write out at the same
+        # time, so this needs to be protected with a lock.
+        #
+        # Also the streams write method needs to be called directly,
+        # as print has issues with newline printing and multithreading.
+        with print_lock:
+            sys.stdout.write(stdoutdata)
+            sys.stdout.flush()
+
+            sys.stderr.write(stderrdata)
+            sys.stderr.flush()
+
+        if returncode != 0:
+            error_message = f"Bad return code {returncode} (with args: '{args}')"
+
+            # Negative return code indicates process terminated by signal
+            # Do our best to add that information
+            if returncode < 0:
+                try:
+                    import signal
+                    signals = {getattr(signal, n): n for n in dir(signal) if n.startswith("SIG") and not n.startswith("SIG_")}
+                    signal_name = signals.get(-returncode, None)
+                    if signal_name:
+                        error_message += f". Process killed by signal {signal_name}({-returncode})"
+                except:
+                    # Ignore any exceptions that occur, we are just trying to help the users
+                    pass
+
+            with print_lock:
+                print(error_message, file=sys.stderr)
+                sys.stderr.flush()
+
+            # Ignore some signals, if the process crashes we should just keep going:
+            # -11 is SIGSEGV
+            if returncode not in {-11}:
+                raise RuntimeError(error_message)
+
     def runner(args):
         with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8") as process:
             try:
                 (stdoutdata, stderrdata) = process.communicate()
 
-                # Multiple processes may be attempting to write out at the same
-                # time, so this needs to be protected with a lock.
-                #
-                # Also the streams write method needs to be called directly,
-                # as print has issues with newline printing and multithreading.
-                with print_lock:
-                    sys.stdout.write(stdoutdata)
-                    sys.stdout.flush()
-
-                    sys.stderr.write(stderrdata)
-                    sys.stderr.flush()
+                report_result(args, process.returncode, stdoutdata, stderrdata)
 
-                if process.returncode != 0:
-                    error_message = f"Bad return code {process.returncode} (with args: '{args}')"
-
-                    # Negative return code indicates process terminated by signal
-                    # Do our best to add that information
-                    if process.returncode < 0:
-                        try:
-                            import signal
-                            signals = {getattr(signal, n): n for n in dir(signal) if n.startswith("SIG") and not n.startswith("SIG_")}
-                            signal_name = signals.get(-process.returncode, None)
-                            if signal_name:
-                                error_message += f". Process killed by signal {signal_name}({-process.returncode})"
-                        except:
-                            # Ignore any exceptions that occur, we are just trying to help the users
-                            pass
-
-                    with print_lock:
-                        print(error_message, file=sys.stderr)
-                        sys.stderr.flush()
-
-                    # Ignore some signals, if the process crashes we should just keep going:
-                    # -11 is SIGSEGV
-                    if process.returncode not in {-11}:
-                        raise RuntimeError(error_message)
+                return stdoutdata
 
             except (KeyboardInterrupt, SystemExit) as ex:
                 with print_lock:
@@ -194,11 +398,22 @@ def _run_parallel(sim, module, a, argv):
 
     new_args = convert_parallel_args_to_single(argv, sim)
 
+    # The lines printed to stdout, which are also written as columnar results when requested
+    result_lines = None
+
     # Run using faulthandler to get stacktraces for SIGSEGV
 
     subprocess_args = ["python", "-OO", "-X", "faulthandler", "-m", "simulator.DoRun"] + new_args
-    subprocess_args_100 = subprocess_args_with_seed(subprocess_args, seed=100)
-    subprocess_args_44 = subprocess_args_with_seed(subprocess_args, seed=44)
+
+    fork_server = getattr(a.args, "execution_mode", "subprocess") == "fork-server"
+
+    if fork_server:
+        fork_runner = _ForkServer(sim, module, a, new_args, report_result, print_lock)
+
+        # The built module has been loaded, so other jobs may now build theirs.
+        # Without the fork server each run loads the module, so the lock is held until the job finishes.
+        if job_server is not None:
+            job_server.release_build_lock()
 
     start_time = datetime.now()
 
@@ -222,23 +437,72 @@ def _run_parallel(sim, module, a, argv):
     #    The process pool would stay alive.
     job_pool = multiprocessing.pool.ThreadPool(processes=parallel_instances)
 
-    # Always run with a seed of 100 and 44 first and second.
-    # This allows us to do compatibility checks.
-    # It also allows us to test the determinism of this set of parameters.
-    all_args = [subprocess_args_100, subprocess_args_100, subprocess_args_44, subprocess_args_44] + [subprocess_args] * a.args.job_size
+    # When checking determinism, the seeds 100 and 44 are each run twice first.
+    # This also allows us to do compatibility checks.
+    check_seeds = determinism_check.seeds()
+
+    # With a ledger the seeds of the job's runs have already been chosen
+    job_seeds = ledger_seeds if ledger is not None else [None] * a.args.job_size
+
+    if fork_server:
+        all_args = check_seeds + job_seeds
+    else:
+        all_args = [subprocess_args_with_seed(subprocess_args, seed=seed) for seed in check_seeds] + \
+                   [subprocess_args if seed is None else subprocess_args_with_seed(subprocess_args, seed=seed) for seed in job_seeds]
+
+    unit_runner = fork_runner if fork_server else runner
+
+    status = 0
+
+    if job_server is not None or ledger is not None:
+        seed_runner = unit_runner
+
+        def tracked_runner(item):
+            (index, args) = item
+
+            # The determinism check runs are not part of the job's size
+            unit = index >= len(check_seeds)
+
+            with job_server.slot(unit=unit) if job_server is not None else contextlib.nullcontext():
+                if ledger is not None and unit:
+                    return ledger.run(job_seeds[index - len(check_seeds)], seed_runner, args)
+                else:
+                    return seed_runner(args)
+
+        all_args = list(enumerate(all_args))
+        unit_runner = tracked_runner
 
     try:
-        result = job_pool.map_async(runner, all_args)
+        result = job_pool.map_async(unit_runner, all_args)
 
         # No more jobs to submit
         job_pool.close()
 
         # Use get so any exceptions are rethrown
-        result.get()
+        outputs = result.get()
 
         if not result.successful():
             print("The map_async was not successful", file=sys.stderr)
 
+        headings = metrics_class.headings(attacker_model=getattr(a.args, "attacker_model", None))
+
+        trailer = []
+
+        if check_seeds:
+            differing = determinism_check.check(headings, outputs[:len(check_seeds)])
+
+            if differing:
+                print(f"The results for seeds {differing} differed between runs, so this job is not deterministic", file=sys.stderr)
+
+                # The results are still written, but the job fails
+                status = DeterminismCheck.FAILED_EXIT_STATUS
+
+            # Results files treat lines starting with @ as comments
+            trailer.append(DeterminismCheck.VERDICT_META + determinism_check.verdict)
+            print(trailer[-1])
+
+        result_lines = header_text.splitlines() + [line for output in outputs for line in output.splitlines()] + trailer
+
     except (KeyboardInterrupt, SystemExit) as ex:
         print(f"Killing thread pool due to {ex} at {datetime.now()}", file=sys.stderr)
         job_pool.terminate()
@@ -263,12 +527,23 @@ def _run_parallel(sim, module, a, argv):
         else:
             raise RuntimeError(f"Unknown job type of {a.args.mode}")
 
-        print(f"Time taken: {end_time - start_time}")
+        time_taken = f"Time taken: {end_time - start_time}"
+        print(time_taken)
 
         sys.stdout.flush()
         sys.stderr.flush()
 
-    return 0
+    # This is written last, so the columnar results are never older than the text results
+    if getattr(a.args, "columnar_output", None) is not None:
+        import data.columnar as columnar
+
+        # Without the header (e.g., later cluster array jobs) the headings need to be provided
+        columnar.write_columnar(a.args.columnar_output, result_lines + [time_taken],
+                                headings=None if header_text else headings)
+
+        print(f"Wrote columnar results to {a.args.columnar_output}", file=sys.stderr)
+
+    return status
 
 if __name__ == "__main__":
     result = main(sys.argv)
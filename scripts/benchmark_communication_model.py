@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Compares the time taken by the link layer communication model generators."""
+
+import random
+import timeit
+
+import numpy as np
+
+import simulator.CommunicationModel as CommunicationModel
+import simulator.Configuration as Configuration
+
+def benchmark(model_name, network_size, distance, repeats, seed=44):
+    configuration = Configuration.create_specific("SourceCorner", network_size, distance, "topology", None)
+    topology = configuration.topology
+
+    nodes = [(topology.o2i(oid).nid, coords) for (oid, coords) in topology.nodes.items()]
+
+    model = CommunicationModel.eval_input(model_name)
+
+    v1 = timeit.timeit(lambda: model._setup(topology, nodes, random.Random(seed)), number=repeats) / repeats
+    v2 = timeit.timeit(lambda: model._setup_vectorised(topology, nodes, np.random.default_rng(seed)), number=repeats) / repeats
+
+    return (len(nodes), v1, v2)
+
+def main(model_name, network_sizes, distance, repeats):
+    print("nodes|v1 (s)|v2 (s)|speedup")
+
+    for network_size in network_sizes:
+        (num_nodes, v1, v2) = benchmark(model_name, network_size, distance, repeats)
+
+        print(f"{num_nodes}|{v1:.4f}|{v2:.4f}|{v1 / v2:.1f}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Communication model generator benchmark", add_help=True)
+    parser.add_argument("--communication-model", type=str, default="low-asymmetry",
+                        choices=("low-asymmetry", "high-asymmetry", "no-asymmetry"))
+    parser.add_argument("--network-sizes", type=int, nargs="+", default=[11, 21, 31, 51])
+    parser.add_argument("--distance", type=float, default=4.5)
+    parser.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args()
+
+    main(args.communication_model, args.network_sizes, args.distance, args.repeats)
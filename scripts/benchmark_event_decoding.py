@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Compares splitting event lines in every handler against decoding them once with the EventDecoder."""
+
+import random
+import timeit
+
+from simulator.EventDecoder import EventDecoder
+
+def generate_lines(count, seed=44):
+    rng = random.Random(seed)
+
+    lines = []
+    for i in range(count):
+        node_id = rng.randrange(121)
+        time = i * 0.001
+
+        kind = rng.choice(["M-CB", "M-CR", "M-CD"])
+
+        if kind == "M-CB":
+            detail = f"Normal,0,0,{i},7,0102030405060708"
+        elif kind == "M-CR":
+            detail = f"Normal,{rng.randrange(121)},0,{i},{rng.randrange(20)}"
+        else:
+            detail = f"Normal,65535,{rng.randrange(121)},0,{i},{rng.randrange(-90, -40)},{rng.randrange(50, 110)},0102030405060708"
+
+        lines.append((kind, f"D:{node_id}:{time}:{detail}\n"))
+
+    return lines
+
+# What each handler used to do with the detail
+def _legacy_bcast(d_or_e, node_id, time, detail):
+    (kind, status, ultimate_source_id, sequence_number, tx_power, hex_buffer) = detail.split(',')
+    return (int(node_id), float(time), int(status), int(ultimate_source_id), int(sequence_number))
+
+def _legacy_rcv(d_or_e, node_id, time, detail):
+    (kind, proximate_source_id, ultimate_source_id, sequence_number, hop_count) = detail.split(',')
+    return (int(node_id), float(time), int(proximate_source_id), int(ultimate_source_id), int(sequence_number), int(hop_count))
+
+def _legacy_deliver(d_or_e, node_id, time, detail):
+    (kind, target, proximate_source_id, ultimate_source_id, sequence_number, rssi, lqi, hex_buffer) = detail.split(',')
+    return (int(node_id), float(time), int(proximate_source_id), int(ultimate_source_id), int(sequence_number), int(rssi), int(lqi))
+
+LEGACY_HANDLERS = {"M-CB": _legacy_bcast, "M-CR": _legacy_rcv, "M-CD": _legacy_deliver}
+
+def _decoded(event):
+    return event
+
+def legacy_dispatchers(handlers_per_kind):
+    dispatchers = {}
+    for (kind, handler) in LEGACY_HANDLERS.items():
+        callbacks = []
+        for _ in range(handlers_per_kind):
+            # Each handler used to be its own callback that split the line
+            def process_one_line(line, handler=handler):
+                args = line[:-1].split(':', 3)
+                handler(*args)
+            callbacks.append(process_one_line)
+        dispatchers[kind] = callbacks
+    return dispatchers
+
+def run_legacy(lines, dispatchers):
+    for (kind, line) in lines:
+        for callback in dispatchers[kind]:
+            callback(line)
+
+def decoded_dispatchers(handlers_per_kind, decoder):
+    dispatchers = {}
+    for kind in LEGACY_HANDLERS:
+        dispatcher = decoder.dispatcher(kind)
+        for _ in range(handlers_per_kind):
+            dispatcher.add(_decoded, decoded=True)
+        dispatchers[kind] = dispatcher.process_line
+    return dispatchers
+
+def run_decoded(lines, dispatchers):
+    for (kind, line) in lines:
+        dispatchers[kind](line)
+
+def main(count, handlers, repeats):
+    lines = generate_lines(count)
+
+    print("handlers|legacy (s)|decoded (s)|speedup")
+
+    for handlers_per_kind in handlers:
+        legacy = legacy_dispatchers(handlers_per_kind)
+
+        decoder = EventDecoder()
+        decoded = decoded_dispatchers(handlers_per_kind, decoder)
+
+        v1 = min(timeit.repeat(lambda: run_legacy(lines, legacy), number=1, repeat=repeats))
+        v2 = min(timeit.repeat(lambda: run_decoded(lines, decoded), number=1, repeat=repeats))
+
+        print(f"{handlers_per_kind}|{v1:.4f}|{v2:.4f}|{v1 / v2:.2f}")
+
+    print("Decoded events per kind (all repeats):", dict(decoder.counts))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Event decoding benchmark", add_help=True)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--handlers", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args()
+
+    main(args.events, args.handlers, args.repeats)
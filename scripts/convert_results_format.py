@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Converts result files between the text and columnar formats.
+The direction is chosen by the extension of the input file."""
+
+import os
+
+import data.columnar as columnar
+
+def convert(path, output_path=None):
+    if columnar.is_columnar(path):
+        output_path = output_path or path[:-len(columnar.EXTENSION)] + ".txt"
+        columnar.columnar_to_text(path, output_path)
+    else:
+        output_path = output_path or columnar.columnar_path(path)
+        columnar.text_to_columnar(path, output_path)
+
+    print(f"Converted {path} ({os.path.getsize(path)} bytes) to {output_path} ({os.path.getsize(output_path)} bytes)")
+
+def main(paths, output_path, check):
+    if output_path is not None and len(paths) != 1:
+        raise RuntimeError("An output path can only be specified when converting a single file")
+
+    for path in paths:
+        if check:
+            with open(path, "r") as infile:
+                expected = [line.rstrip("\n") for line in infile]
+
+            with columnar.ColumnarResults(output_path or columnar.columnar_path(path)) as results:
+                if list(results.lines()) != expected:
+                    raise RuntimeError(f"The columnar results for {path} differ from the text results")
+
+            print(f"The columnar results for {path} match")
+        else:
+            convert(path, output_path)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Result file format converter", add_help=True)
+    parser.add_argument("paths", nargs="+", help="The .txt results to convert to columnar, or the .npz results to convert to text")
+    parser.add_argument("--output", default=None, help="Where to write the converted results, defaults to the input path with the other extension")
+    parser.add_argument("--check", action="store_true", default=False, help="Check that the existing columnar versions of the text results are identical")
+
+    args = parser.parse_args()
+
+    main(args.paths, args.output, args.check)
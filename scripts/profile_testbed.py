@@ -311,16 +311,16 @@ class AnalyseTestbedProfile(object):
             print(ex)
             return None
 
-        converter = OfflineLogConverter.create_specific(self.testbed_name, result_file)
+        with OfflineLogConverter.create_specific(self.testbed_name, result_file) as converter:
 
-        # This file is of one of two types.
-        # Either is is RSSI measurements, where no nodes are broadcasting.
-        # Or, a single node is broadcasting and the rest and listening.
-        result = self._analyse_log_file(converter)
+            # This file is of one of two types.
+            # Either is is RSSI measurements, where no nodes are broadcasting.
+            # Or, a single node is broadcasting and the rest and listening.
+            result = self._analyse_log_file(converter)
 
-        if isinstance(result, RSSIResult):
-            with open(results_dir + "_rssi.txt", "w") as rssi_log_file:
-                self._create_noise_log(converter, rssi_log_file)
+            if isinstance(result, RSSIResult):
+                with open(results_dir + "_rssi.txt", "w") as rssi_log_file:
+                    self._create_noise_log(converter, rssi_log_file)
 
         with open(pickle_path, 'wb') as pickle_file:
             pickle.dump(result, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
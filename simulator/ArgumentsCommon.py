@@ -7,6 +7,7 @@ import algorithm
 from simulator import CommunicationModel, NoiseModel
 import simulator.AttackerConfiguration as AttackerConfiguration
 import simulator.Configuration as Configuration
+import simulator.DeterminismCheck as DeterminismCheck
 import simulator.SourcePeriodModel as SourcePeriodModel
 import simulator.FaultModel as FaultModel
 import simulator.MetricsCommon as MetricsCommon
@@ -182,6 +183,12 @@ OPTS = {
                                                               required=True,
                                                               help="Model the background noise in the network. meyer-heavy has high noise, casino-lab has lower noise. See models/noise for ways to graph the noisiness of these models."),
 
+    "link gain threshold": lambda x, **kwargs: x.add_argument("--link-gain-threshold",
+                                                              type=float,
+                                                              required=False,
+                                                              default=None,
+                                                              help="Links with a gain (in dBm) below this value are not given to the simulator. By default all links are used."),
+
     # Only for Avrora
     "avrora":              _add_avrora_radio_model,
 
@@ -244,6 +251,36 @@ OPTS = {
                                                               type=ArgumentsCommon.type_positive_int,
                                                               default=None),
 
+    "execution mode":      lambda x, **kwargs: x.add_argument("--execution-mode",
+                                                              choices=("subprocess", "fork-server"),
+                                                              default="subprocess",
+                                                              help="With 'subprocess' each run is performed in a new interpreter. 'fork-server' prepares the algorithm once and forks a child per run."),
+
+    "determinism check":   lambda x, **kwargs: x.add_argument("--determinism-check",
+                                                              choices=DeterminismCheck.MODES,
+                                                              default="always",
+                                                              help="When to run the seeds 100 and 44 twice before the job's runs to check that results are deterministic. 'once-per-build' caches the verdict for the built binary."),
+
+    "determinism check rate": lambda x, **kwargs: x.add_argument("--determinism-check-rate",
+                                                              type=float,
+                                                              default=0.1,
+                                                              help="The probability a job performs the determinism check when using '--determinism-check sampled'."),
+
+    "columnar output":     lambda x, **kwargs: x.add_argument("--columnar-output",
+                                                              type=str,
+                                                              default=None,
+                                                              help="Also write the job's results to this path in the columnar format (see data/columnar.py)."),
+
+    "ledger":              lambda x, **kwargs: x.add_argument("--ledger",
+                                                              type=str,
+                                                              default=None,
+                                                              help="Record the state of each of the job's runs in this file (see simulator/RunLedger.py)."),
+
+    "ledger mode":         lambda x, **kwargs: x.add_argument("--ledger-mode",
+                                                              choices=("record", "resume"),
+                                                              default="record",
+                                                              help="With 'resume' only the runs in the ledger that did not complete are performed."),
+
     "job id":              lambda x, **kwargs: x.add_argument("--job-id",
                                                               type=ArgumentsCommon.type_positive_int,
                                                               default=None,
@@ -338,7 +375,8 @@ class ArgumentsCommon(object):
 
         # Don't show these arguments when printing the argument values before showing the results
         self.arguments_to_hide = {"job_id", "verbose", "low verbose", "debug", "gui_node_label", "gui_scale", "mode", "seed", "thread_count",
-                                  "show_raw_log"}
+                                  "show_raw_log", "execution_mode", "determinism_check", "determinism_check_rate", "columnar_output",
+                                  "ledger", "ledger_mode"}
 
     def add_argument(self, *args, **kwargs):
         for sim in self._subparsers:
@@ -3,6 +3,7 @@ import inspect
 
 import numpy as np
 
+from simulator.EventDecoder import SCHEMAS as EVENT_SCHEMAS
 from simulator.Topology import OrderedId
 
 from data.restricted_eval import restricted_eval
@@ -23,6 +24,65 @@ MESSAGES_TO_IGNORE = {
     'Poll', 'Notify', 'Disable', 'Repair', 'Activate', 'Crash',
 }
 
+class AttackerGroup(object):
+    """The attackers created from one attacker configuration.
+    Capture is tracked per group, so that multiple configurations
+    can be evaluated independently in the same simulation."""
+    __slots__ = ('ident', 'name', 'attackers', 'found_source', 'capture_time')
+
+    def __init__(self, ident, name):
+        self.ident = ident
+        self.name = name
+        self.attackers = []
+        self.found_source = False
+        self.capture_time = None
+
+class AttackerPositionIndex(object):
+    """Indexes the attackers that detect messages using their position by the node they are at.
+    This means a receive event only reaches the attackers at the node that received it."""
+    __slots__ = ('_sim', '_attackers_at', '_order')
+
+    def __init__(self, sim):
+        self._sim = sim
+        self._attackers_at = {}
+        self._order = {}
+
+    def add(self, attacker):
+        if not self._order:
+            self._sim.register_output_handler('A-R', self.process_attacker_rcv_event, decoded=True)
+
+        self._order[id(attacker)] = len(self._order)
+
+        self._insert(attacker, attacker.position)
+
+    def move(self, attacker, old_position, new_position):
+        attackers = self._attackers_at[old_position.nid]
+        attackers.remove(attacker)
+
+        if not attackers:
+            del self._attackers_at[old_position.nid]
+
+        self._insert(attacker, new_position)
+
+    def _insert(self, attacker, position):
+        attackers = self._attackers_at.setdefault(position.nid, [])
+        attackers.append(attacker)
+
+        # Keep the order attackers were added in, so they process events in the same order as before
+        attackers.sort(key=lambda x: self._order[id(x)])
+
+    def attackers_at(self, position):
+        return tuple(self._attackers_at.get(position.nid, ()))
+
+    def process_attacker_rcv_event(self, event):
+        attackers = self._attackers_at.get(event.node_id, None)
+        if attackers is None:
+            return
+
+        # Attackers may move away while processing the event
+        for attacker in tuple(attackers):
+            attacker.process_attacker_rcv_event(event)
+
 class Attacker(object):
     def __init__(self, start_location="only_sink", message_detect="using_position"):
         self._sim = None
@@ -30,8 +90,10 @@ class Attacker(object):
         self._has_found_source = None
         self.moves = None
         self.ident = None
+        self.group = None
         self._has_gui = False
         self._has_metrics_attacker_delivers = False
+        self._uses_position_index = False
 
         # Metric initialisation from here onwards
         self.steps_towards = Counter()
@@ -99,26 +161,28 @@ class Attacker(object):
         # However, when duty cycling this technique is unreliable.
         # So the attacker needs to detect messages broadcasts within some range.
         if self._message_detect == "using_position":
-            self._sim.register_output_handler('A-R', self.process_attacker_rcv_event)
+            # Receive events are dispatched by the simulation's AttackerPositionIndex
+            self._uses_position_index = True
 
         elif self._message_detect == "using_deliver":
-            self._sim.register_output_handler('M-CD', self.process_attacker_node_deliver_event)
+            self._sim.register_output_handler('M-CD', self.process_attacker_node_deliver_event, decoded=True)
             self._sim.register_output_handler('A-R', None)
 
         elif self._message_detect.startswith("within_range"):
 
             self._listen_range = float(self._message_detect[self._message_detect.find('(')+1:self._message_detect.find(')')])
 
-            self._sim.register_output_handler('M-CB', self.process_attacker_neighbour_rcv_event)
+            self._sim.register_output_handler('M-CB', self.process_attacker_neighbour_rcv_event, decoded=True)
             self._sim.register_output_handler('A-R', None)
 
         else:
             raise RuntimeError(f"Unknown message_detect option {self._message_detect}")
 
 
-    def setup(self, sim, ident):
+    def setup(self, sim, ident, group=None):
         self._sim = sim
         self.ident = ident
+        self.group = group if group is not None else sim.add_attacker_group(str(self))
 
         self._register_handlers()
 
@@ -127,6 +191,9 @@ class Attacker(object):
         if __debug__:
             if not isinstance(self.position, OrderedId):
                 raise TypeError("self.position must be a OrderedId but is", type(self.position))
+
+        if self._uses_position_index:
+            self._sim.attacker_positions.add(self)
         
         self._has_found_source = self.found_source_slow()
         self.moves = 0
@@ -150,21 +217,20 @@ class Attacker(object):
     def update_state(self, time, msg_type, node_id, prox_from_id, ult_from_id, sequence_number):
         pass
 
-    def process_attacker_rcv_event(self, d_or_e, node_id, time, detail):
-        # Don't want to move if the source has been found
-        if self._has_found_source:
+    def process_attacker_rcv_event(self, event):
+        # Don't want to move if the source has been found,
+        # either by this attacker or another in the same group
+        if self._has_found_source or self.group.found_source:
             return False
 
-        node_id = OrderedId(int(node_id))
+        node_id = OrderedId(event.node_id)
 
         # Don't want to process this message if we are not on the correct node
         if self.position != node_id:
             return False
 
-        (msg_type, prox_from_id, ult_from_id, sequence_number, rssi, lqi) = detail.split(',')
-
-        time = float(time)
-        msg_type = self._sim.metrics.message_kind_to_string(msg_type)
+        time = event.time
+        msg_type = self._sim.metrics.message_kind_to_string(event.kind)
 
         # Record when messages have been delivered when requested
         if self._has_metrics_attacker_delivers:
@@ -174,9 +240,9 @@ class Attacker(object):
         if msg_type in MESSAGES_TO_IGNORE:
             return False
 
-        prox_from_id = OrderedId(int(prox_from_id))
-        ult_from_id = OrderedId(int(ult_from_id))
-        sequence_number = int(sequence_number)
+        prox_from_id = OrderedId(event.proximate_source_id)
+        ult_from_id = OrderedId(event.ultimate_source_id)
+        sequence_number = event.sequence_number
 
         # Record the time we received this message to allow calculation
         # of the attacker receive ratio
@@ -206,32 +272,30 @@ class Attacker(object):
 
         return should_move
 
-    def process_attacker_neighbour_rcv_event(self, d_or_e, node_id, time, detail):
-        (kind, status, ultimate_source_id, sequence_number, tx_power, hex_buffer) = detail.split(',')
-
+    def process_attacker_neighbour_rcv_event(self, event):
         # Check that the bcast was successful
-        if status != "0":
+        if event.status != 0:
             return False
 
-        ord_node_id = OrderedId(int(node_id))
+        ord_node_id = OrderedId(event.node_id)
 
         if self._sim.node_distance_meters(ord_node_id, self.position) <= self._listen_range:
 
             rssi = None
             lqi = None
 
-            detail = (kind, node_id, ultimate_source_id, sequence_number, rssi, lqi)
+            attacker_event = EVENT_SCHEMAS['A-R'].record("D", self.position.nid, event.time,
+                event.kind, event.node_id, event.ultimate_source_id, event.sequence_number, rssi, lqi)
 
-            return self.process_attacker_rcv_event("D", self.position.nid, time, ",".join(str(x) for x in detail))
+            return self.process_attacker_rcv_event(attacker_event)
 
         return False
 
-    def process_attacker_node_deliver_event(self, d_or_e, node_id, time, detail):
-        (kind, target, proximate_source_id, ultimate_source_id, sequence_number, rssi, lqi, hex_buffer) = detail.split(',')
+    def process_attacker_node_deliver_event(self, event):
+        attacker_event = EVENT_SCHEMAS['A-R'].record("D", event.node_id, event.time,
+            event.kind, event.proximate_source_id, event.ultimate_source_id, event.sequence_number, event.rssi, event.lqi)
 
-        detail = ",".join([kind, proximate_source_id, ultimate_source_id, sequence_number, rssi, lqi])
-
-        self.process_attacker_rcv_event("D", node_id, time, detail)
+        self.process_attacker_rcv_event(attacker_event)
 
 
     def found_source_slow(self):
@@ -275,11 +339,15 @@ class Attacker(object):
 
             self._update_min_source_distance(ord_source, new_distance)
 
+        if self._uses_position_index:
+            self._sim.attacker_positions.move(self, self.position, node_id)
+
         self.position = node_id
         self._has_found_source = self.found_source_slow()
 
         # Update the simulator, informing them that an attacker has found the source
-        self._sim.attacker_found_source |= self._has_found_source
+        if self._has_found_source:
+            self._sim.attacker_group_found_source(self.group)
     
         if self._has_gui:
             self._draw(time, self.position)
@@ -534,7 +602,8 @@ class CollaborativeSeqNosReactiveAttacker(Attacker):
         self._sequence_numbers = {}
 
     def _other_attackers_responded(self, seqno_key, sequence_number):
-        others = [attacker for attacker in self._sim.attackers if attacker is not self]
+        # Only collaborate with the attackers of the same attacker configuration
+        others = [attacker for attacker in self.group.attackers if attacker is not self]
 
         for attacker in others:
             if attacker._sequence_numbers.get(seqno_key, -1) >= sequence_number:
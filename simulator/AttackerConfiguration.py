@@ -10,13 +10,16 @@ class AttackerConfiguration(object):
         self.attackers = attackers
 
     def setup(self, sim):
-        # Setup each attacker model, giving them their own unique identifier
-        for (i, attacker) in enumerate(self.attackers):
+        group = sim.add_attacker_group(str(self))
+
+        # Setup each attacker model, giving them their own unique identifier.
+        # The identifier is unique across all the attacker configurations set up in sim.
+        for attacker in self.attackers:
 
             # Need to copy each attacker to ensure subsequent attacker configuration reuse
             # does not pull in modified attacker state
             new_attacker = copy.deepcopy(attacker)
-            new_attacker.setup(sim, ident=i)
+            new_attacker.setup(sim, ident=len(sim.attackers), group=group)
 
             sim.add_attacker(new_attacker)
 
@@ -59,6 +62,37 @@ class MultipleAttackers(AttackerConfiguration):
     def __init__(self, *args):
         super().__init__(args)
 
+class IndependentAttackers(AttackerConfiguration):
+    """
+    Evaluates several attacker configurations in the same simulation.
+    Attackers only observe the network, so each configuration can be tracked
+    independently. The simulation continues until every configuration has
+    captured a source (or the safety period expires) and one result row is
+    produced per configuration.
+
+    For example: -am "IndependentAttackers(SeqNosReactiveAttacker(),MultipleAttackers(SeqNosReactiveAttacker(),SeqNosReactiveAttacker()))"
+    """
+    def __init__(self, *args):
+        self.configurations = [
+            SingleAttacker(conf) if isinstance(conf, Attacker.Attacker) else conf
+            for conf in args
+        ]
+
+        if any(isinstance(conf, IndependentAttackers) for conf in self.configurations):
+            raise RuntimeError("IndependentAttackers cannot be nested")
+
+        super().__init__([attacker for conf in self.configurations for attacker in conf.attackers])
+
+    def setup(self, sim):
+        for conf in self.configurations:
+            conf.setup(sim)
+
+    def __str__(self):
+        return "{}({})".format(type(self).__name__, ",".join(str(conf) for conf in self.configurations))
+
+    def short_name(self):
+        return "{}({})".format(type(self).__name__, ",".join(conf.short_name() for conf in self.configurations))
+
 
 def models():
     """A list of the the available attacker configurations."""
@@ -0,0 +1,229 @@
+"""A content-addressed cache of built binaries.
+
+Every parameter combination is built with a 'make clean' followed by a full
+compile, even when its build arguments are the same as an earlier build. The
+cache stores the files created by a build under a key made from:
+ - the sources of the algorithm and of the directories its Makefile refers to
+ - the TinyOS sources (by path, size and modification time)
+ - the compilers that are used
+ - the make command, which contains the target and the -D flags
+On a hit the files are restored instead of building.
+
+The cache is kept in SLP_BUILD_CACHE_DIR (default ~/.cache/slp/build) and is
+limited to SLP_BUILD_CACHE_MAX_MB megabytes (default 2048). The least recently
+used builds are evicted when the limit is exceeded. A limit of 0 disables the cache.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+SOURCE_EXTENSIONS = (".nc", ".h", ".c", ".cpp", ".hpp", ".java", ".extra", ".target", ".platform", ".mk")
+
+# Directories that only contain the output of builds
+BUILD_DIRECTORIES = {"build", "simbuild", "__pycache__"}
+
+TOOLS = ("nescc", "ncc", "gcc", "avr-gcc", "msp430-gcc", "mig")
+
+def cache_dir():
+    return os.environ.get("SLP_BUILD_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "slp", "build"))
+
+def max_size():
+    return int(float(os.environ.get("SLP_BUILD_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+def _is_source(name):
+    return name.startswith(("Makefile", "makefile")) or name.endswith(SOURCE_EXTENSIONS)
+
+def _walk_sources(directory):
+    for (root, dirs, files) in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d not in BUILD_DIRECTORIES and not d.startswith("."))
+
+        for name in sorted(files):
+            if _is_source(name):
+                yield os.path.join(root, name)
+
+def source_directories(directory):
+    """The directory being built and the directories it includes from its parent (e.g., ../common)."""
+    parent = os.path.dirname(os.path.abspath(directory))
+
+    names = {"common"}
+
+    for name in os.listdir(directory):
+        if name.startswith(("Makefile", "makefile")):
+            with open(os.path.join(directory, name)) as makefile:
+                names.update(re.findall(r"\.\./([A-Za-z0-9_]+)", makefile.read()))
+
+    others = sorted(os.path.join(parent, name) for name in names if os.path.isdir(os.path.join(parent, name)))
+
+    return [os.path.abspath(directory)] + [other for other in others if other != os.path.abspath(directory)]
+
+def hash_sources(directory):
+    h = hashlib.sha256()
+
+    for source_directory in source_directories(directory):
+        for path in _walk_sources(source_directory):
+            h.update(os.path.relpath(path, os.path.dirname(source_directory)).encode("utf-8"))
+            with open(path, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+
+    return h.hexdigest()
+
+_environment_fingerprint = None
+
+def environment_fingerprint():
+    """Identifies the TinyOS sources and the compilers, without reading every file."""
+    global _environment_fingerprint
+
+    if _environment_fingerprint is None:
+        h = hashlib.sha256()
+
+        tinyos = os.environ.get("TOSROOT") or os.environ.get("TOSDIR")
+        h.update(str(tinyos).encode("utf-8"))
+
+        if tinyos is not None:
+            for path in _walk_sources(tinyos):
+                st = os.stat(path)
+                h.update(f"{os.path.relpath(path, tinyos)}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+
+        for tool in TOOLS:
+            path = shutil.which(tool)
+            if path is not None:
+                st = os.stat(path)
+                h.update(f"{tool}:{path}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+
+        _environment_fingerprint = h.hexdigest()
+
+    return _environment_fingerprint
+
+def snapshot(directory):
+    """The modification time of every file in directory, used to find the files a build creates."""
+    result = {}
+    for (root, dirs, files) in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            result[os.path.relpath(path, directory)] = os.stat(path).st_mtime_ns
+    return result
+
+def _directory_size(directory):
+    return sum(os.path.getsize(os.path.join(root, name)) for (root, dirs, files) in os.walk(directory) for name in files)
+
+class BuildCache(object):
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_environment(cls):
+        """The build cache, or None if it is disabled."""
+        max_bytes = max_size()
+        if max_bytes <= 0:
+            return None
+
+        return cls(cache_dir(), max_bytes)
+
+    def key(self, directory, command):
+        h = hashlib.sha256()
+        h.update(hash_sources(directory).encode("utf-8"))
+        h.update(environment_fingerprint().encode("utf-8"))
+        h.update(command.encode("utf-8"))
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def restore(self, key, directory):
+        """Copies the files of a cached build into directory. Returns False if there is no such build."""
+        entry = self._entry(key)
+
+        try:
+            with open(os.path.join(entry, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        try:
+            for name in meta["files"]:
+                target = os.path.join(directory, name)
+                os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+                shutil.copy2(os.path.join(entry, "files", name), target)
+        except OSError as ex:
+            # The build may have been evicted by another process
+            print(f"Unable to restore the build {key} from the cache: {ex}", file=sys.stderr)
+            return False
+
+        # The modification time of the entry records when it was last used
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        return True
+
+    def store(self, key, directory, before):
+        """Stores the files in directory created or changed since the :before: snapshot was taken."""
+        after = snapshot(directory)
+        files = sorted(name for (name, mtime) in after.items() if before.get(name) != mtime)
+
+        if not files:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        tmp_entry = os.path.join(self.directory, f".{key}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        try:
+            for name in files:
+                target = os.path.join(tmp_entry, "files", name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(os.path.join(directory, name), target)
+
+            with open(os.path.join(tmp_entry, "meta.json"), "w") as f:
+                json.dump({"files": files, "size": _directory_size(tmp_entry), "created": time.time()}, f)
+
+            os.rename(tmp_entry, self._entry(key))
+        except OSError as ex:
+            # Another process may have stored the same build first
+            if not os.path.isdir(self._entry(key)):
+                print(f"Unable to store the build in the cache {self.directory}: {ex}", file=sys.stderr)
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        self.evict()
+
+    def entries(self):
+        """(last used, size, key) of each cached build."""
+        result = []
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return result
+
+        for name in names:
+            entry = self._entry(name)
+            try:
+                with open(os.path.join(entry, "meta.json")) as f:
+                    size = json.load(f)["size"]
+                result.append((os.stat(entry).st_mtime, size, name))
+            except (OSError, ValueError, KeyError):
+                pass
+
+        return result
+
+    def evict(self):
+        """Removes the least recently used builds until the cache is within its size limit."""
+        entries = sorted(self.entries())
+        total = sum(size for (last_used, size, name) in entries)
+
+        for (last_used, size, name) in entries:
+            if total <= self.max_bytes:
+                break
+
+            shutil.rmtree(self._entry(name), ignore_errors=True)
+            total -= size
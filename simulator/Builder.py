@@ -4,6 +4,8 @@ import os
 import subprocess
 import sys
 
+import simulator.BuildCache as BuildCache
+
 ALLOWED_TOSSIM_PLATFORMS = ("micaz",)
 ALLOWED_PLATFORMS = ("micaz", "telosb", "wsn430v13", "wsn430v14", "z1")
 #ALLOWED_PLATFORMS = [
@@ -41,6 +43,32 @@ def make_clean(directory, platform=None):
         stderr=sys.stderr
         )
 
+def _make(directory, command):
+    """Runs the make :command: in :directory:, unless the same build is in the build cache."""
+    cache = BuildCache.BuildCache.from_environment()
+
+    if cache is not None:
+        key = cache.key(directory, command)
+
+        if cache.restore(key, directory):
+            print(f"Restored the build {key} from the build cache", file=sys.stderr)
+            return 0
+
+        before = BuildCache.snapshot(directory)
+
+    result = subprocess.check_call(
+        command,
+        cwd=directory,
+        shell=True,
+        stdout=sys.stderr,
+        stderr=sys.stderr
+        )
+
+    if cache is not None:
+        cache.store(key, directory, before)
+
+    return result
+
 def build_sim(directory, platform="micaz", **kwargs):
 
     if platform not in ALLOWED_TOSSIM_PLATFORMS:
@@ -65,15 +93,7 @@ def build_sim(directory, platform="micaz", **kwargs):
 
     print(command, file=sys.stderr)
 
-    result = subprocess.check_call(
-        command,
-        cwd=directory,
-        shell=True,
-        stdout=sys.stderr,
-        stderr=sys.stderr
-        )
-
-    return result
+    return _make(directory, command)
 
 def build_actual(directory, platform, enable_fast_serial=False, **kwargs):
 
@@ -116,12 +136,4 @@ def build_actual(directory, platform, enable_fast_serial=False, **kwargs):
 
     print(command, file=sys.stderr)
 
-    result = subprocess.check_call(
-        command,
-        cwd=directory,
-        shell=True,
-        stdout=sys.stderr,
-        stderr=sys.stderr
-        )
-
-    return result
+    return _make(directory, command)
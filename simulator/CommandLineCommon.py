@@ -20,10 +20,11 @@ import algorithm
 from simulator import CommunicationModel, NoiseModel
 import simulator.sim
 import simulator.ArgumentsCommon as ArgumentsCommon
+import simulator.DeterminismCheck as DeterminismCheck
 import simulator.Configuration as Configuration
 import simulator.CoojaRadioModel as CoojaRadioModel
 
-from data import results, latex, submodule_loader
+from data import columnar, results, latex, submodule_loader
 from data.run.common import MissingSafetyPeriodError
 from data.run.driver import platform_builder
 
@@ -37,6 +38,18 @@ from data.table import safety_period, fake_result
 
 from data.util import create_dirtree, recreate_dirtree, touch, scalar_extractor
 
+def type_walltime(x):
+    """Parses a HH:MM:SS walltime, the hours can be 24 or more."""
+    try:
+        (hours, minutes, seconds) = (int(part) for part in x.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{x} is not a walltime in the form HH:MM:SS")
+
+    if hours < 0 or not 0 <= minutes < 60 or not 0 <= seconds < 60:
+        raise argparse.ArgumentTypeError(f"{x} is not a walltime in the form HH:MM:SS")
+
+    return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+
 # From: https://stackoverflow.com/questions/32954486/zip-iterators-asserting-for-equal-length-in-python
 def zip_equal(*iterables):
     sentinel = object()
@@ -82,6 +95,8 @@ class CLI(object):
         subparser = cluster_subparsers.add_parser("build", help="Build the binaries used to run jobs on the cluster. One set of binaries will be created per parameter combination you request.")
         subparser.add_argument("sim", choices=submodule_loader.list_available(simulator.sim), help="The simulator you wish to run with.")
         subparser.add_argument("--no-skip-complete", action="store_true")
+        subparser.add_argument("--extended-horizon", action="store_true", default=False, help="Only simulate the largest safety factor and derive the results for smaller safety factors during analysis.")
+        subparser.add_argument("--build-workers", type=ArgumentsCommon.ArgumentsCommon.type_positive_int, default=1, help="The number of parameter combinations to build at the same time, each in its own scratch directory.")
 
         subparser = cluster_subparsers.add_parser("copy", help="Copy the built binaries for this algorithm to the cluster.")
         subparser.add_argument("--user", type=str, default=None, required=False, help="Override the username being guessed.")
@@ -101,6 +116,12 @@ class CLI(object):
         subparser.add_argument("--dry-run", action="store_true", default=False)
         subparser.add_argument("--unhold", action="store_true", default=False, help="By default jobs are submitted in the held state. This argument will submit jobs in the unheld state.")
         subparser.add_argument("--min-repeats", type=ArgumentsCommon.ArgumentsCommon.type_positive_int, default=40, help="Minimum number of repeats to perform if an insufficient number has been performed thus far")
+        subparser.add_argument("--extended-horizon", action="store_true", default=False, help="Only simulate the largest safety factor and derive the results for smaller safety factors during analysis.")
+        subparser.add_argument("--determinism-check", choices=DeterminismCheck.MODES, default=None, help="When to check that runs with the same seed give the same results. Defaults to every job.")
+        subparser.add_argument("--determinism-check-rate", type=float, default=None, help="The probability a job checks determinism with '--determinism-check sampled'.")
+        subparser.add_argument("--pack-walltime", type=type_walltime, default=None, help="Pack parameter combinations with short time estimates into submissions that take at most this long (HH:MM:SS).")
+        subparser.add_argument("--pack-lanes", type=ArgumentsCommon.ArgumentsCommon.type_positive_int, default=1, help="The number of packed parameter combinations to run at the same time in a submission, sharing its threads.")
+        subparser.add_argument("--resume", action="store_true", default=False, help="Only perform the runs recorded in each parameter combination's ledger that did not complete, such as those of jobs that were killed.")
 
         subparser = cluster_subparsers.add_parser("copy-back", help="Copies the results off the cluster. WARNING: This will overwrite files in the algorithm's results directory with the same name.")
         subparser.add_argument("sim", choices=submodule_loader.list_available(simulator.sim), help="The simulator you wish to run with.")
@@ -117,6 +138,7 @@ class CLI(object):
         subparser.add_argument("--platform", type=str, default=None)
         subparser.add_argument("-v", "--verbose", default=False, action="store_true", help="Produce verbose logging output from the testbed binaries")
         subparser.add_argument("--debug", default=False, action="store_true", help="Build debug binaries")
+        subparser.add_argument("--build-workers", type=ArgumentsCommon.ArgumentsCommon.type_positive_int, default=1, help="The number of parameter combinations to build at the same time, each in its own scratch directory.")
 
         subparser = testbed_subparsers.add_parser("submit", help="Use this command to submit the testbed jobs. Run this on your machine.")
         subparser.add_argument("--duration", type=str, help="How long you wish to run on the testbed for.", required=True)
@@ -133,6 +155,7 @@ class CLI(object):
         subparser.add_argument("-S", "--headers-to-skip", nargs="*", metavar="H", help="The headers you want to skip analysis of.")
         subparser.add_argument("-K", "--keep-if-hit-upper-time-bound", action="store_true", default=False, help="Specify this flag if you wish to keep results that hit the upper time bound.")
         subparser.add_argument("--flush", action="store_true", default=False, help="Flush any cached results.")
+        subparser.add_argument("--memory-limit", type=float, default=None, help="The memory in GiB the analysis may use. Defaults to the memory available.")
 
         ###
 
@@ -146,6 +169,7 @@ class CLI(object):
         subparser.add_argument("--log-mode", choices=platform_builder.LOG_MODES.keys(), required=True)
         subparser.add_argument("-v", "--verbose", default=False, action="store_true", help="Produce verbose logging output from the testbed binaries")
         subparser.add_argument("--debug", default=False, action="store_true", help="Build debug binaries")
+        subparser.add_argument("--build-workers", type=ArgumentsCommon.ArgumentsCommon.type_positive_int, default=1, help="The number of parameter combinations to build at the same time, each in its own scratch directory.")
 
         ###
 
@@ -153,6 +177,12 @@ class CLI(object):
         subparser.add_argument("sim", choices=submodule_loader.list_available(simulator.sim), help="The simulator you wish to run with.")
         subparser.add_argument("--thread-count", type=int, default=None)
         subparser.add_argument("--no-skip-complete", action="store_true")
+        subparser.add_argument("--extended-horizon", action="store_true", default=False, help="Only simulate the largest safety factor and derive the results for smaller safety factors during analysis.")
+        subparser.add_argument("--determinism-check", choices=DeterminismCheck.MODES, default=None, help="When to check that runs with the same seed give the same results. Defaults to every job.")
+        subparser.add_argument("--determinism-check-rate", type=float, default=None, help="The probability a job checks determinism with '--determinism-check sampled'.")
+        subparser.add_argument("--columnar", action="store_true", default=False, help="Also write each results file in the columnar format, which the analysis loads faster.")
+        subparser.add_argument("--global-pool", action="store_true", default=False, help="Run the jobs of all parameter combinations at once, sharing --thread-count simulation slots across them.")
+        subparser.add_argument("--resume", action="store_true", default=False, help="Only perform the runs recorded in each parameter combination's ledger that did not complete, such as those of jobs that were killed.")
 
         ###
 
@@ -162,6 +192,7 @@ class CLI(object):
         subparser.add_argument("-S", "--headers-to-skip", nargs="*", metavar="H", help="The headers you want to skip analysis of.")
         subparser.add_argument("-K", "--keep-if-hit-upper-time-bound", action="store_true", default=False, help="Specify this flag if you wish to keep results that hit the upper time bound.")
         subparser.add_argument("--flush", action="store_true", default=False, help="Flush any cached results.")
+        subparser.add_argument("--memory-limit", type=float, default=None, help="The memory in GiB the analysis may use. Defaults to the memory available.")
 
         ###
 
@@ -179,6 +210,10 @@ class CLI(object):
         subparser.add_argument("--show", action="store_true", default=False)
         subparser.add_argument("--testbed", type=str, choices=submodule_loader.list_available(data.testbed), default=None, help="Select the testbed to analyse. (Only if not analysing regular results.)")
 
+        subparser = self._add_argument("time-model", self._run_time_model, help="Fit the model of how long runs take on the results, report its accuracy and save it for estimating job times.")
+        subparser.add_argument("sim", choices=submodule_loader.list_available(simulator.sim), help="The simulator you wish to fit the model for.")
+        subparser.add_argument("--level", type=float, default=0.9, help="The probability that a run's time is within its prediction interval.")
+
         subparser = self._add_argument("error-table", self._run_error_table, help="Creates a table showing the number of simulations in which an error occurred.")
         subparser.add_argument("sim", choices=submodule_loader.list_available(simulator.sim), help="The simulator you wish to check results for.")
         subparser.add_argument("--show", action="store_true", default=False)
@@ -651,7 +686,9 @@ class CLI(object):
         return time_after_first_normal
 
     def _execute_runner(self, sim_name, driver, result_path, time_estimator=None,
-                        skip_completed_simulations=True, verbose=False, debug=False, min_repeats=1):
+                        skip_completed_simulations=True, verbose=False, debug=False, min_repeats=1,
+                        extended_horizon=False, determinism_check=None, determinism_check_rate=None, columnar_output=False,
+                        resume=False):
         testbed_name = None
 
         if driver.mode() in {"TESTBED", "PLATFORM"}:
@@ -715,7 +752,12 @@ class CLI(object):
                        time_estimator,
                        verbose=verbose,
                        debug=debug,
-                       min_repeats=min_repeats)
+                       min_repeats=min_repeats,
+                       extended_horizon=extended_horizon,
+                       determinism_check=determinism_check,
+                       determinism_check_rate=determinism_check_rate,
+                       columnar_output=columnar_output,
+                       resume=resume)
         except MissingSafetyPeriodError as ex:
             from pprint import pprint
             import traceback
@@ -777,7 +819,69 @@ class CLI(object):
                 raise RuntimeError("No time estimate for network sizes other than 7, 11, 15, 21 or 25")
 
     def _cluster_time_estimator(self, sim_name, args, **kwargs):
-        return self._default_cluster_time_estimator(sim_name, args, **kwargs)
+        return self._learned_cluster_time_estimator(sim_name, args, **kwargs)
+
+    def _time_model_path(self, sim_name):
+        return os.path.join(self.algorithm_module.results_path(sim_name), f"{self.algorithm_module.name}-time-model.json")
+
+    def _time_model(self, sim_name):
+        """The time model saved by 'time-model', or one fitted on the current results. None if there are no results."""
+        from data import time_model
+
+        if not hasattr(self, "_time_models"):
+            self._time_models = {}
+
+        if sim_name not in self._time_models:
+            self._time_models[sim_name] = time_model.load_or_fit(self._time_model_path(sim_name),
+                                                                 self.algorithm_module.result_file_path(sim_name))
+
+        return self._time_models[sim_name]
+
+    def _learned_cluster_time_estimator(self, sim_name, args, **kwargs):
+        """Asks for the upper bound of the time model's prediction interval.
+        Uses the default estimator when there are no results to learn from."""
+        model = self._time_model(sim_name)
+
+        if model is None:
+            return self._default_cluster_time_estimator(sim_name, args, **kwargs)
+
+        (estimate, lower, upper) = model.predict(args)
+
+        return self._cluster_time_from_run_time(timedelta(seconds=upper), kwargs, allowance=0)
+
+    def _local_time_estimator(self, sim_name, args, **kwargs):
+        """The total time the runs of a job are expected to take, or None if there is no time model."""
+        model = self._time_model(sim_name)
+
+        if model is None:
+            return None
+
+        (estimate, lower, upper) = model.predict(args)
+
+        return timedelta(seconds=estimate * (kwargs.get("job_size") or 1))
+
+    @staticmethod
+    def _cluster_time_from_run_time(run_time, kwargs, allowance=0.2, max_time=None):
+        job_size = kwargs["job_size"]
+        thread_count = kwargs["thread_count"]
+
+        total_time = run_time * job_size
+        time_per_proc = total_time // thread_count
+        time_per_proc_with_allowance = timedelta(seconds=time_per_proc.total_seconds() * (1 + allowance))
+
+        # To count for python process start up and shutdown
+        extra_time_per_proc = timedelta(seconds=2)
+        extra_time = (extra_time_per_proc * job_size) // thread_count
+
+        # Always ask for at least 2 minutes
+        calculated_time = timedelta(minutes=2) + time_per_proc_with_allowance + extra_time
+
+        if max_time is not None:
+            if calculated_time > max_time:
+                print(f"Warning: The estimated cluster time is {calculated_time}, overriding this with the maximum set time of {max_time}")
+                calculated_time = max_time
+
+        return calculated_time
 
     def _cluster_time_estimator_from_historical(self, sim, args, kwargs, historical_key_names, historical, allowance=0.2, max_time=None):
         key = tuple(args[name] for name in historical_key_names)
@@ -790,56 +894,58 @@ class CLI(object):
                 key = tuple(str(x) for x in key)
                 hist_time = historical[key]
 
-            job_size = kwargs["job_size"]
-            thread_count = kwargs["thread_count"]
-
-            total_time = hist_time * job_size
-            time_per_proc = total_time // thread_count
-            time_per_proc_with_allowance = timedelta(seconds=time_per_proc.total_seconds() * (1 + allowance))
-
-            # To count for python process start up and shutdown
-            extra_time_per_proc = timedelta(seconds=2)
-            extra_time = (extra_time_per_proc * job_size) // thread_count
+        except KeyError:
+            print(f"Unable to find historical time for {key} on {sim}, so using the learned time estimator.")
+            return self._learned_cluster_time_estimator(sim, args, **kwargs)
 
-            # Always ask for at least 2 minutes
-            calculated_time = timedelta(minutes=2) + time_per_proc_with_allowance + extra_time
+        return self._cluster_time_from_run_time(hist_time, kwargs, allowance=allowance, max_time=max_time)
 
-            if max_time is not None:
-                if calculated_time > max_time:
-                    print(f"Warning: The estimated cluster time is {calculated_time}, overriding this with the maximum set time of {max_time}")
-                    calculated_time = max_time
+    def _run_run(self, args):
+        from data.run.driver import local as LocalDriver
 
-            return calculated_time
+        time_estimator = None
 
-        except KeyError:
-            print(f"Unable to find historical time for {key} on {sim}, so using default time estimator.")
-            return self._default_cluster_time_estimator(sim, args, **kwargs)
+        if args.global_pool:
+            driver = LocalDriver.PooledRunner(worker_count=args.thread_count)
 
-    def _run_run(self, args):
-        from data.run.driver import local as LocalDriver
-        driver = LocalDriver.Runner()
+            # Used to estimate how long the remaining runs will take
+            time_estimator = self._local_time_estimator
+        else:
+            driver = LocalDriver.Runner()
 
-        try:
-            driver.job_thread_count = int(args.thread_count)
-        except TypeError:
-            # None tells the runner to use the default
-            driver.job_thread_count = None
+            try:
+                driver.job_thread_count = int(args.thread_count)
+            except TypeError:
+                # None tells the runner to use the default
+                driver.job_thread_count = None
 
         skip_complete = not args.no_skip_complete
 
         self._execute_runner(args.sim, driver, self.algorithm_module.results_path(args.sim),
-                             time_estimator=None,
-                             skip_completed_simulations=skip_complete)
+                             time_estimator=time_estimator,
+                             skip_completed_simulations=skip_complete,
+                             extended_horizon=args.extended_horizon,
+                             determinism_check=args.determinism_check,
+                             determinism_check_rate=args.determinism_check_rate,
+                             columnar_output=args.columnar,
+                             resume=args.resume)
+
+    @staticmethod
+    def _memory_limit_bytes(args):
+        return None if args.memory_limit is None else int(args.memory_limit * 1024 ** 3)
 
     def _run_analyse(self, args):
         def results_finder(results_directory):
-            return fnmatch.filter(os.listdir(results_directory), '*.txt')
+            # Columnar results load faster, so use them when they are available
+            return columnar.prefer_columnar(results_directory, fnmatch.filter(os.listdir(results_directory), '*.txt'))
 
         analyzer = self.algorithm_module.Analysis.Analyzer(args.sim, self.algorithm_module.results_path(args.sim))
         analyzer.run(self.algorithm_module.result_file,
                      results_finder,
                      nprocs=args.thread_count,
                      flush=args.flush,
+                     memory_limit=self._memory_limit_bytes(args),
+                     safety_factors=getattr(self.algorithm_module.Parameters, "safety_factors", None),
                      headers_to_skip=args.headers_to_skip,
                      keep_if_hit_upper_time_bound=args.keep_if_hit_upper_time_bound)
 
@@ -855,6 +961,7 @@ class CLI(object):
                      results_finder,
                      nprocs=args.thread_count,
                      flush=args.flush,
+                     memory_limit=self._memory_limit_bytes(args),
                      headers_to_skip=args.headers_to_skip,
                      keep_if_hit_upper_time_bound=args.keep_if_hit_upper_time_bound,
                      testbed=True)
@@ -930,7 +1037,8 @@ class CLI(object):
 
             log_files = " ".join(os.path.join(input_results_path, x + "_*", testbed.result_file_name) for x in in_params)
 
-            command = "python3 -OO -X faulthandler run.py algorithm.{} offline SINGLE --log-converter {} --log-file {} --non-strict ".format(
+            # The commands are already run in parallel, so each replays its log files one at a time
+            command = "python3 -OO -X faulthandler run.py algorithm.{} offline SINGLE --log-converter {} --log-file {} --non-strict --thread-count 1 ".format(
                 self.algorithm_module.name,
                 testbed.name(),
                 log_files)
@@ -1104,9 +1212,10 @@ class CLI(object):
 
             skip_complete = not args.no_skip_complete
 
-            self._execute_runner(args.sim, cluster.builder(args.sim), cluster_directory,
+            self._execute_runner(args.sim, cluster.builder(args.sim, build_workers=args.build_workers), cluster_directory,
                                  time_estimator=None,
-                                 skip_completed_simulations=skip_complete)
+                                 skip_completed_simulations=skip_complete,
+                                 extended_horizon=args.extended_horizon)
 
         elif 'copy' == args.cluster_mode:
             cluster.copy_to(self.algorithm_module.name, user=args.user)
@@ -1122,14 +1231,30 @@ class CLI(object):
 
             submitter_fn = cluster.array_submitter if args.array else cluster.submitter
 
-            submitter = submitter_fn(args.sim, notify_emails=emails_to_notify, dry_run=args.dry_run, unhold=args.unhold)
+            if args.resume and args.array:
+                raise RuntimeError("Array jobs share a results file and ledger, so cannot be resumed")
+
+            submitter_kwargs = {}
+
+            if args.pack_walltime is not None:
+                if args.array:
+                    raise RuntimeError("Packing jobs is not supported when submitting array jobs")
+
+                submitter_kwargs["pack_walltime"] = args.pack_walltime
+                submitter_kwargs["pack_lanes"] = args.pack_lanes
+
+            submitter = submitter_fn(args.sim, notify_emails=emails_to_notify, dry_run=args.dry_run, unhold=args.unhold, **submitter_kwargs)
 
             skip_complete = not args.no_skip_complete
 
             self._execute_runner(args.sim, submitter, cluster_directory,
                                  time_estimator=self._cluster_time_estimator,
                                  skip_completed_simulations=skip_complete,
-                                 min_repeats=args.min_repeats)
+                                 min_repeats=args.min_repeats,
+                                 extended_horizon=args.extended_horizon,
+                                 determinism_check=args.determinism_check,
+                                 determinism_check_rate=args.determinism_check_rate,
+                                 resume=args.resume)
 
         elif 'copy-back' == args.cluster_mode:
             cluster.copy_back(self.algorithm_module.name, args.sim, user=args.user)
@@ -1150,7 +1275,7 @@ class CLI(object):
             print(f"Removing existing testbed directory {testbed_directory} and creating a new one")
             recreate_dirtree(testbed_directory)
 
-            builder = Builder(testbed, platform=args.platform)
+            builder = Builder(testbed, platform=args.platform, build_workers=args.build_workers)
 
             self._execute_runner("real", builder, testbed_directory,
                                  time_estimator=None,
@@ -1197,7 +1322,8 @@ class CLI(object):
             recreate_dirtree(platform_directory)
 
             builder = Builder(platform, args.log_mode,
-                              generate_per_node_id_binary=args.generate_per_node_id_binary)
+                              generate_per_node_id_binary=args.generate_per_node_id_binary,
+                              build_workers=args.build_workers)
 
             self._execute_runner("real", builder, platform_directory,
                                  time_estimator=None,
@@ -1224,6 +1350,27 @@ class CLI(object):
 
         self._create_table(self.algorithm_module.name + "-time-taken", result_table, orientation="landscape", show=args.show)
 
+    def _run_time_model(self, args):
+        from data import time_model
+
+        result_file_path = self.algorithm_module.result_file_path(args.sim)
+
+        rows = time_model.rows_from_summary(result_file_path)
+
+        model = time_model.TimeModel.fit(rows)
+
+        print(f"Fitted the time model on {len(rows)} parameter combinations from {result_file_path}")
+
+        for (target, accuracy) in time_model.cross_validate(rows, level=args.level).items():
+            print(f"{target}: median absolute percentage error {accuracy['median absolute percentage error']:.1f}%, "
+                  f"{accuracy['interval coverage']:.1f}% of {accuracy['predictions']} within the {args.level:.0%} prediction interval "
+                  f"(cross validated, residual sigma {model.sigmas[target]:.3f})")
+
+        model_path = self._time_model_path(args.sim)
+        model.save(model_path)
+
+        print(f"Saved the time model to {model_path}")
+
     def _run_detect_missing(self, args):
         import difflib
 
@@ -1,4 +1,5 @@
 
+from functools import partial
 from itertools import combinations
 from math import log10, sqrt
 
@@ -24,9 +25,20 @@ class CommunicationModel(object):
         raise NotImplementedError()
 
 class LinkLayerCommunicationModel(CommunicationModel):
-    def __init__(self, path_loss_exponent, shadowing_stddev, d0, pl_d0, noise_floor, s, white_gausian_noise):
+    """Version 1 generates the gains pair by pair, drawing from the simulation's rng.
+    Version 2 generates them all at once with numpy, drawing from a numpy.random.Generator
+    seeded by the simulation's rng. The two versions produce different gains for the
+    same seed, so the version forms part of the model name (e.g., low-asymmetry-v2)."""
+
+    GENERATOR_VERSIONS = (1, 2)
+
+    def __init__(self, path_loss_exponent, shadowing_stddev, d0, pl_d0, noise_floor, s, white_gausian_noise,
+                 generator_version=1):
         super(LinkLayerCommunicationModel, self).__init__(white_gausian_noise)
 
+        if generator_version not in self.GENERATOR_VERSIONS:
+            raise RuntimeError(f"Unknown generator version {generator_version}, available: {self.GENERATOR_VERSIONS}")
+
         # Argument validity checking
         if s[0,1] != s[1,0]:
             raise RuntimeError("S12 and S21 must have the same value.")
@@ -44,12 +56,16 @@ class LinkLayerCommunicationModel(CommunicationModel):
         self.pl_d0 = pl_d0
         self.noise_floor_pn = noise_floor
         self.s = s
+        self.generator_version = generator_version
 
     def setup(self, sim):
         topology = sim.configuration.topology
         nodes = [(topology.o2i(oid).nid, coords) for (oid, coords) in topology.nodes.items()]
 
-        self._setup(topology, nodes, sim.rng)
+        if self.generator_version == 1:
+            self._setup(topology, nodes, sim.rng)
+        else:
+            self._setup_vectorised(topology, nodes, np.random.default_rng(sim.rng.getrandbits(64)))
 
     def _setup(self, topology, nodes, rng):
         """Provide a second setup function to help test this model against the Java version"""
@@ -123,6 +139,54 @@ class LinkLayerCommunicationModel(CommunicationModel):
             lg[i,j] += pathloss
             lg[j,i] += pathloss
 
+    def _t_coefficients(self):
+        s = self.s
+
+        if s[0,0] == 0 and s[1,1] == 0:
+            return (0.0, 0.0, 0.0)
+
+        t00 = sqrt(s[0,0])
+        t01 = s[0,1] / t00
+        t11 = sqrt((s[0,0] * s[1,1] - s[0,1] * s[0,1]) / s[0,0])
+
+        return (t00, t01, t11)
+
+    def _setup_vectorised(self, topology, nodes, generator):
+        """Generates the same model as _setup, but for all nodes at once."""
+        num_nodes = len(nodes)
+
+        # Coordinates ordered by node index
+        indexes = np.fromiter((i for (i, coord) in nodes), dtype=np.intp, count=num_nodes)
+        coords = np.empty((num_nodes, 2), dtype=np.float64)
+        coords[indexes] = [coord for (i, coord) in nodes]
+
+        (iu, ju) = np.triu_indices(num_nodes, k=1)
+
+        deltas = coords[iu] - coords[ju]
+        distances = np.hypot(deltas[:,0], deltas[:,1])
+
+        if __debug__:
+            too_close = np.flatnonzero(distances < self.d0)
+            if too_close.size > 0:
+                k = too_close[0]
+                (i, j) = (iu[k], ju[k])
+                raise RuntimeError("The distance ({}) between any two nodes ({}={}, {}={}) must be at least d0 ({})".format(
+                    distances[k], topology.ri2o(i), coords[i], topology.ri2o(j), coords[j], self.d0))
+
+        (t00, t01, t11) = self._t_coefficients()
+
+        rnd = generator.standard_normal((num_nodes, 2))
+
+        self.noise_floor = self.noise_floor_pn + t00 * rnd[:,0]
+
+        output_power = t01 * rnd[:,0] + t11 * rnd[:,1]
+
+        pathloss = -self.pl_d0 - (self.path_loss_exponent * 10.0) * np.log10(distances / self.d0) + \
+                   generator.standard_normal(distances.size) * self.shadowing_stddev
+
+        self.link_gain = np.repeat(output_power[:,np.newaxis], num_nodes, axis=1)
+        self.link_gain[iu, ju] += pathloss
+        self.link_gain[ju, iu] += pathloss
 
 
 class IdealCommunicationModel(CommunicationModel):
@@ -202,7 +266,7 @@ class TestbedCommunicationModel(CommunicationModel):
 
 
 class LowAsymmetry(LinkLayerCommunicationModel):
-    def __init__(self):
+    def __init__(self, generator_version=1):
         super(LowAsymmetry, self).__init__(
             path_loss_exponent=4.7,
             shadowing_stddev=3.2,
@@ -210,11 +274,12 @@ class LowAsymmetry(LinkLayerCommunicationModel):
             pl_d0=55.4,
             noise_floor=-105.0,
             s=np.matrix(((0.9, -0.7),(-0.7, 1.2)), dtype=np.float64),
-            white_gausian_noise=4.0
+            white_gausian_noise=4.0,
+            generator_version=generator_version
         )
 
 class HighAsymmetry(LinkLayerCommunicationModel):
-    def __init__(self):
+    def __init__(self, generator_version=1):
         super(HighAsymmetry, self).__init__(
             path_loss_exponent=4.7,
             shadowing_stddev=3.2,
@@ -222,11 +287,12 @@ class HighAsymmetry(LinkLayerCommunicationModel):
             pl_d0=55.4,
             noise_floor=-105.0,
             s=np.matrix(((3.7, -3.3),(-3.3, 6.0)), dtype=np.float64),
-            white_gausian_noise=4.0
+            white_gausian_noise=4.0,
+            generator_version=generator_version
         )
 
 class NoAsymmetry(LinkLayerCommunicationModel):
-    def __init__(self):
+    def __init__(self, generator_version=1):
         super(NoAsymmetry, self).__init__(
             path_loss_exponent=4.7,
             shadowing_stddev=3.2,
@@ -234,7 +300,8 @@ class NoAsymmetry(LinkLayerCommunicationModel):
             pl_d0=55.4,
             noise_floor=-105.0,
             s=np.zeros((2, 2), dtype=np.float64),
-            white_gausian_noise=4.0
+            white_gausian_noise=4.0,
+            generator_version=generator_version
         )
 
 class Ideal(IdealCommunicationModel):
@@ -271,6 +338,11 @@ MODEL_NAME_MAPPING = {
     "high-asymmetry": HighAsymmetry,
     "no-asymmetry": NoAsymmetry,
     "ideal": Ideal,
+
+    # Vectorised generators, see LinkLayerCommunicationModel
+    "low-asymmetry-v2": partial(LowAsymmetry, generator_version=2),
+    "high-asymmetry-v2": partial(HighAsymmetry, generator_version=2),
+    "no-asymmetry-v2": partial(NoAsymmetry, generator_version=2),
 }
 
 def models():
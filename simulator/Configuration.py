@@ -20,7 +20,14 @@ class InvalidSourceError(RuntimeError):
     def __init__(self, source_id, source_ids):
         super().__init__(f"Invalid source ({source_id} not in {source_ids})")
 
+# Bits of the entries in a direction table, set when the sender is further from the source than the receiver
+DIRECTION_FROM_FURTHER_HOPS = 1
+DIRECTION_FROM_FURTHER_METERS = 2
+
 class Configuration(object):
+    # Networks with more nodes than this only build direction tables when they are first used
+    eager_direction_tables_max_nodes = 1024
+
     def __init__(self, topology, source_ids, sink_ids, space_behind_sink):
         super().__init__()
 
@@ -51,6 +58,8 @@ class Configuration(object):
         self._dist_matrix_meters = None
         self._predecessors = None
 
+        self._direction_tables = {}
+
         self._build_connectivity_matrix()
 
     def build_arguments(self):
@@ -149,6 +158,46 @@ class Configuration(object):
 
         return self._dist_matrix[i,j]
 
+    def direction_table(self, ordered_source_id):
+        """A table indexed by [sender index, receiver index] describing whether a message moving
+        between the two nodes was received from further away from the given source,
+        that is the receiver is closer to the source than the sender.
+        Entries are a combination of DIRECTION_FROM_FURTHER_HOPS and DIRECTION_FROM_FURTHER_METERS.
+        The hops bit is never set when the topology does not know the hop distances.
+
+        The source does not need to be one of the configuration's sources, as sources may be mobile."""
+        try:
+            return self._direction_tables[ordered_source_id]
+        except KeyError:
+            pass
+
+        s = self.topology.o2i(ordered_source_id).nid
+
+        ndm = self._dist_matrix_meters[s]
+
+        table = (ndm[None,:] < ndm[:,None]).astype(np.int8) * DIRECTION_FROM_FURTHER_METERS
+
+        # Not all topologies know the distance in hops
+        if self._dist_matrix is not None:
+            nd = self._dist_matrix[s]
+            table |= (nd[None,:] < nd[:,None]).astype(np.int8) * DIRECTION_FROM_FURTHER_HOPS
+
+        self._direction_tables[ordered_source_id] = table
+
+        return table
+
+    def build_direction_tables(self, lazy=None):
+        """Builds the direction tables of the configured sources.
+        By default this is deferred until they are used for large networks."""
+        if lazy is None:
+            lazy = self.size() > self.eager_direction_tables_max_nodes
+
+        if lazy:
+            return
+
+        for source_id in self.source_ids:
+            self.direction_table(source_id)
+
     def ssd(self, sink_id, source_id):
         """The number of hops between the sink and the specified source node"""
         if sink_id not in self.sink_ids:
@@ -0,0 +1,166 @@
+"""Checks that simulations with the same seed produce the same results.
+
+A parallel job can run each of SEEDS twice ahead of its real runs and compare
+the results. How often this happens is configurable:
+ - always:         every job performs the check
+ - once-per-build: the check is performed once per unique build and a passing
+                   verdict is cached on disk, keyed by the hash of the built binary
+ - sampled:        each job performs the check with a given probability
+ - disabled:       the check is never performed
+"""
+
+import glob
+import hashlib
+import os
+import random
+import sys
+
+MODES = ("always", "once-per-build", "sampled", "disabled")
+
+SEEDS = (100, 44)
+
+# The columns that must match for two runs to be considered the same
+COLUMNS = ("AttackerModel", "Seed", "Sent", "Received", "Delivered", "Captured", "FirstNormalSentTime", "EventCount")
+
+# The verdict is written after the results, as a line the result parsers treat as a comment
+VERDICT_META = "@meta:determinism="
+FAILED_META = VERDICT_META + "fail"
+
+# The exit status of a job whose determinism check failed
+FAILED_EXIT_STATUS = 3
+
+def cache_dir():
+    return os.environ.get("SLP_DETERMINISM_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "slp", "determinism"))
+
+def build_hash(sim, module):
+    """The hash of the binaries built for module, or None if none could be found."""
+    patterns = getattr(sim, "build_artifacts", lambda module: [])(module)
+
+    paths = sorted(path for pattern in patterns for path in glob.glob(pattern))
+    if not paths:
+        return None
+
+    h = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+
+    return h.hexdigest()
+
+class DeterminismCheck(object):
+    def __init__(self, mode, rate=None, build_hash=None, rng=None):
+        if mode not in MODES:
+            raise RuntimeError(f"Unknown determinism check mode {mode}")
+
+        if mode == "sampled" and (rate is None or not 0 <= rate <= 1):
+            raise RuntimeError(f"The determinism check rate must be between 0 and 1, not {rate}")
+
+        self.mode = mode
+        self.rate = rate
+        self.build_hash = build_hash
+
+        self.cached_verdict = self._load_verdict()
+
+        if mode == "always":
+            self.enabled = True
+        elif mode == "once-per-build":
+            self.enabled = self.cached_verdict is None
+        elif mode == "sampled":
+            self.enabled = (rng or random).random() < rate
+        else:
+            self.enabled = False
+
+        self.verdict = self.cached_verdict
+
+    def _verdict_path(self):
+        if self.mode != "once-per-build" or self.build_hash is None:
+            return None
+
+        return os.path.join(cache_dir(), f"{self.build_hash}.verdict")
+
+    def _load_verdict(self):
+        path = self._verdict_path()
+        if path is None:
+            return None
+
+        try:
+            with open(path, "r") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _save_verdict(self):
+        path = self._verdict_path()
+
+        # Only passes are cached, so a failing build keeps being checked
+        if path is None or self.verdict != "pass":
+            return
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                print(self.verdict, file=f)
+            os.replace(tmp_path, path)
+        except OSError as ex:
+            print(f"Unable to cache the determinism verdict in {path}: {ex}", file=sys.stderr)
+
+    def seeds(self):
+        """The seeds that need to be run before the job's own runs."""
+        if not self.enabled:
+            return []
+
+        return [seed for seed in SEEDS for _ in range(2)]
+
+    def print_meta(self, stream=None):
+        print(f"@meta:determinism-check={self.mode}", file=stream)
+
+        if self.mode == "sampled":
+            print(f"@meta:determinism-check-rate={self.rate}", file=stream)
+
+        if self.build_hash is not None:
+            print(f"@meta:build-hash={self.build_hash}", file=stream)
+
+        if self.enabled:
+            print(f"@meta:determinism-seeds={','.join(str(seed) for seed in self.seeds())}", file=stream)
+        elif self.cached_verdict is not None:
+            print(f"@meta:determinism={self.cached_verdict} (cached)", file=stream)
+        else:
+            print("@meta:determinism=skipped", file=stream)
+
+    def check(self, headings, outputs):
+        """Compares the outputs of the runs of seeds().
+        Returns a list of the seeds whose runs differed."""
+        columns = [headings.index(column) for column in COLUMNS if column in headings]
+
+        def rows(output):
+            return [
+                tuple(values[i] for i in columns)
+                for values in (line.split("|") for line in output.splitlines())
+                if len(values) == len(headings)
+            ]
+
+        differing = []
+        missing = []
+
+        for (i, seed) in enumerate(SEEDS):
+            (first, second) = (rows(outputs[2*i]), rows(outputs[2*i + 1]))
+
+            if not first or not second:
+                missing.append(seed)
+            elif first != second:
+                differing.append(seed)
+
+        if differing:
+            self.verdict = "fail"
+        elif missing:
+            self.verdict = "inconclusive"
+        else:
+            self.verdict = "pass"
+
+        self._save_verdict()
+
+        return differing
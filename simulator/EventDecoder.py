@@ -0,0 +1,145 @@
+"""Decodes the events that nodes output into typed records.
+
+Each event kind (e.g., M-CB) has a schema that describes the
+comma separated fields of its detail. An event is decoded once
+and the resulting record is passed to every handler that asked
+for decoded events."""
+
+from collections import Counter, namedtuple
+
+class EventSchema(object):
+    __slots__ = ("kind", "record", "converters", "maxsplit", "decode")
+
+    def __init__(self, kind, name, fields, maxsplit=-1):
+        self.kind = kind
+        self.record = namedtuple(name, ["d_or_e", "node_id", "time"] + [field for (field, converter) in fields])
+        self.converters = tuple(converter for (field, converter) in fields)
+        self.maxsplit = maxsplit
+        self.decode = self._build_decode()
+
+    def _build_decode(self):
+        """Generates a function that splits the detail and converts each field.
+        Unpacking the split detail raises a ValueError when the number of fields is wrong."""
+        namespace = {"_new": tuple.__new__, "_record": self.record}
+
+        names = [f"f{i}" for i in range(len(self.converters))]
+        # TOSSIM provides the node id and time as strings, offline simulations have already parsed them
+        values = ["d_or_e",
+                  "int(node_id) if node_id.__class__ is str else node_id",
+                  "float(time) if time.__class__ is str else time"]
+
+        for (i, (name, converter)) in enumerate(zip(names, self.converters)):
+            if converter is str:
+                values.append(name)
+            else:
+                namespace[f"_c{i}"] = converter
+                values.append(f"_c{i}({name})")
+
+        lines = ["def decode(d_or_e, node_id, time, detail):"]
+        if names:
+            lines.append(f"    ({', '.join(names)},) = detail.split(',', {self.maxsplit})")
+        lines.append(f"    return _new(_record, ({', '.join(values)},))")
+
+        exec("\n".join(lines), namespace)
+
+        return namespace["decode"]
+
+SCHEMAS = {}
+
+def register_schema(kind, name, fields, maxsplit=-1):
+    """Register the schema of the event with the given kind.
+    fields is a list of (field name, converter) pairs."""
+    if kind in SCHEMAS:
+        raise RuntimeError(f"A schema for {kind} has already been registered")
+
+    SCHEMAS[kind] = EventSchema(kind, name, fields, maxsplit=maxsplit)
+
+# Used for events that do not have a schema
+_RAW_SCHEMA = EventSchema(None, "RawEvent", [("detail", str)], maxsplit=0)
+
+# The message kind is left as a string, as it may either be a name or an id
+register_schema("M-B", "NodeBooted", [])
+register_schema("M-CB", "BcastEvent", [("kind", str), ("status", int), ("ultimate_source_id", int),
+                                       ("sequence_number", int), ("tx_power", int), ("hex_buffer", str)])
+register_schema("M-CR", "ReceiveEvent", [("kind", str), ("proximate_source_id", int), ("ultimate_source_id", int),
+                                         ("sequence_number", int), ("hop_count", int)])
+register_schema("M-CD", "DeliverEvent", [("kind", str), ("target", int), ("proximate_source_id", int), ("ultimate_source_id", int),
+                                         ("sequence_number", int), ("rssi", int), ("lqi", int), ("hex_buffer", str)])
+register_schema("A-R", "AttackerReceiveEvent", [("kind", str), ("proximate_source_id", int), ("ultimate_source_id", int),
+                                                ("sequence_number", int), ("rssi", int), ("lqi", int)])
+register_schema("M-NC", "NodeChangeEvent", [("old_name", str), ("new_name", str)])
+register_schema("M-NTA", "NodeTypeAdd", [("ident", int), ("name", str)])
+register_schema("M-MTA", "MessageTypeAdd", [("ident", int), ("name", str)])
+register_schema("M-G", "GenericEvent", [("kind", int), ("data", str)], maxsplit=1)
+register_schema("stderr", "ErrorEvent", [("code", int), ("message", str)], maxsplit=1)
+
+class EventDecoder(object):
+    """Decodes events using the registered schemas, counting how many of each kind were decoded."""
+    def __init__(self, schemas=None):
+        self.schemas = SCHEMAS if schemas is None else schemas
+
+        self.failures = Counter()
+
+        self._dispatchers = []
+
+    @property
+    def counts(self):
+        counts = Counter()
+        for dispatcher in self._dispatchers:
+            counts[dispatcher.kind] += dispatcher.decoded
+        return counts
+
+    def dispatcher(self, kind):
+        """Creates a dispatcher for events of the given kind that decodes using this decoder."""
+        dispatcher = EventDispatcher(kind, self)
+        self._dispatchers.append(dispatcher)
+        return dispatcher
+
+    def decode(self, kind, d_or_e, node_id, time, detail):
+        try:
+            return self.schemas.get(kind, _RAW_SCHEMA).decode(d_or_e, node_id, time, detail)
+        except (ValueError, TypeError) as ex:
+            self.failures[kind] += 1
+            raise RuntimeError(f"Unable to decode the {kind} event '{detail}' on node {node_id}: {ex}") from ex
+
+class EventDispatcher(object):
+    """Calls the handlers registered for one kind of event.
+    The event is decoded at most once, no matter how many handlers want it decoded."""
+    __slots__ = ("kind", "decoder", "handlers", "decoded", "_decode")
+
+    def __init__(self, kind, decoder):
+        self.kind = kind
+        self.decoder = decoder
+        self.handlers = []
+        self.decoded = 0
+
+        self._decode = decoder.schemas.get(kind, _RAW_SCHEMA).decode
+
+    def __len__(self):
+        return len(self.handlers)
+
+    def add(self, function, decoded=False):
+        self.handlers.append((function, decoded))
+
+    def dispatch(self, d_or_e, node_id, time, detail):
+        record = None
+
+        for (function, decoded) in self.handlers:
+            if decoded:
+                if record is None:
+                    try:
+                        record = self._decode(d_or_e, node_id, time, detail)
+                    except (ValueError, TypeError):
+                        # Decode again to record the failure and raise a more helpful error
+                        self.decoder.decode(self.kind, d_or_e, node_id, time, detail)
+                        raise
+
+                    self.decoded += 1
+
+                function(record)
+            else:
+                function(d_or_e, node_id, time, detail)
+
+    def process_line(self, line):
+        # Do not pass newline in detail onwards
+        self.dispatch(*line[:-1].split(':', 3))
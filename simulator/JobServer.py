@@ -0,0 +1,143 @@
+"""Shares a fixed number of simulation slots between many run.py processes.
+
+This works in the same way as the GNU make jobserver. The driver creates a pipe
+holding one token per slot and passes it to every run.py it starts. Each
+simulation reads a token before it starts and writes it back when it finishes,
+so no more simulations run at once across the machine than there are slots.
+
+Each acquire and release is also recorded on a second pipe, so the driver can
+report progress and return the tokens held by a run.py that died.
+
+Building modifies the algorithm's directory, so run.py processes also share a
+lock that is held while building and until the built module has been loaded.
+"""
+
+import contextlib
+import fcntl
+import os
+import select
+import struct
+import sys
+
+ENV_VAR = "SLP_JOBSERVER"
+
+# (kind, pid) records are smaller than PIPE_BUF, so writes of them are atomic
+RECORD = struct.Struct("<cI")
+
+ACQUIRE = b"A"
+RELEASE = b"R"
+RELEASE_UNIT = b"U"
+
+class JobServer(object):
+    """Created by the driver that starts the run.py processes."""
+    def __init__(self, slots, lock_path):
+        if slots < 1:
+            raise RuntimeError(f"The job server needs at least one slot, not {slots}")
+
+        self.slots = slots
+        self.lock_path = lock_path
+
+        (self.tokens_read, self.tokens_write) = os.pipe()
+        (self.records_read, self.records_write) = os.pipe()
+
+        os.write(self.tokens_write, b"+" * slots)
+
+        self._partial = b""
+
+        # The number of tokens each process currently holds
+        self.held = {}
+
+        self.units_completed = 0
+
+    def environment(self):
+        env = dict(os.environ)
+        env[ENV_VAR] = f"{self.tokens_read},{self.tokens_write},{self.records_write},{self.lock_path}"
+        return env
+
+    def pass_fds(self):
+        return (self.tokens_read, self.tokens_write, self.records_write)
+
+    def process_records(self, timeout):
+        """Reads the records written by clients, waiting at most :timeout: seconds for any to arrive."""
+        data = self._partial
+
+        while select.select([self.records_read], [], [], timeout)[0]:
+            data += os.read(self.records_read, 64 * 1024)
+
+            # Only wait for the first read, then take whatever else is available
+            timeout = 0
+
+        complete = len(data) - len(data) % RECORD.size
+        self._partial = data[complete:]
+
+        for (kind, pid) in RECORD.iter_unpack(data[:complete]):
+            if kind == ACQUIRE:
+                self.held[pid] = self.held.get(pid, 0) + 1
+            else:
+                self.held[pid] -= 1
+
+                if kind == RELEASE_UNIT:
+                    self.units_completed += 1
+
+    def reclaim(self):
+        """Returns the tokens held by processes that no longer exist."""
+        for (pid, count) in list(self.held.items()):
+            if count <= 0:
+                del self.held[pid]
+                continue
+
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                print(f"Reclaiming {count} job server tokens from the exited process {pid}", file=sys.stderr)
+                os.write(self.tokens_write, b"+" * count)
+                del self.held[pid]
+
+    def close(self):
+        for fd in (self.tokens_read, self.tokens_write, self.records_read, self.records_write):
+            os.close(fd)
+
+class JobServerClient(object):
+    """Used by run.py when it was started by a driver with a job server."""
+    def __init__(self, tokens_read, tokens_write, records_write, lock_path):
+        self.tokens_read = tokens_read
+        self.tokens_write = tokens_write
+        self.records_write = records_write
+        self.lock_path = lock_path
+
+        self._lock_file = None
+
+    @classmethod
+    def from_environment(cls):
+        value = os.environ.get(ENV_VAR)
+        if not value:
+            return None
+
+        (tokens_read, tokens_write, records_write, lock_path) = value.split(",", 3)
+
+        return cls(int(tokens_read), int(tokens_write), int(records_write), lock_path)
+
+    def _record(self, kind):
+        os.write(self.records_write, RECORD.pack(kind, os.getpid()))
+
+    @contextlib.contextmanager
+    def slot(self, unit=True):
+        """Holds one of the job server's slots. :unit: is False for runs that do not count towards the job's size."""
+        token = os.read(self.tokens_read, 1)
+        self._record(ACQUIRE)
+
+        try:
+            yield
+        finally:
+            os.write(self.tokens_write, token)
+            self._record(RELEASE_UNIT if unit else RELEASE)
+
+    def acquire_build_lock(self):
+        self._lock_file = open(self.lock_path, "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+    def release_build_lock(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
@@ -1,5 +1,6 @@
 
 from collections import Counter, OrderedDict, defaultdict, namedtuple
+from contextlib import contextmanager
 import base64
 from itertools import zip_longest, tee
 import math
@@ -18,6 +19,7 @@ except ImportError:
 import numpy as np
 
 import simulator.Attacker
+from simulator.Configuration import DIRECTION_FROM_FURTHER_HOPS, DIRECTION_FROM_FURTHER_METERS
 from simulator.Topology import OrderedId
 
 from data.util import RunningStats
@@ -95,6 +97,10 @@ class MetricsCommon(object):
         self.received_from_closer_or_same_meters = defaultdict(Counter)
         self.received_from_further_meters = defaultdict(Counter)
 
+        # Ordered source id -> (topology source id, direction table)
+        self._direction_tables = {}
+        configuration.build_direction_tables()
+
         self.delivered_from_closer_or_same_hops = defaultdict(Counter)
         self.delivered_from_further_hops = defaultdict(Counter)
         self.delivered_from_closer_or_same_meters = defaultdict(Counter)
@@ -111,6 +117,9 @@ class MetricsCommon(object):
         self.wall_time = None
         self.event_count = None
 
+        # The results of each attacker group, as they were when that group captured a source
+        self.attacker_group_capture_results = {}
+
         self.errors = Counter()
 
         self.became_source_times = defaultdict(list)
@@ -126,19 +135,19 @@ class MetricsCommon(object):
 
         self._generic_handlers = {}
 
-        self.register('M-B', self.process_node_booted)
-        self.register('M-G', self.process_generic)
-        self.register('M-NC', self.process_node_change_event)
+        self.register('M-B', self.process_node_booted, decoded=True)
+        self.register('M-G', self.process_generic, decoded=True)
+        self.register('M-NC', self.process_node_change_event, decoded=True)
 
-        self.register('M-NTA', self.process_node_type_add)
-        self.register('M-MTA', self.process_message_type_add)
+        self.register('M-NTA', self.process_node_type_add, decoded=True)
+        self.register('M-MTA', self.process_message_type_add, decoded=True)
 
         # BCAST / RCV / DELIVER events
-        self.register('M-CB', self.process_bcast_event)
-        self.register('M-CR', self.process_rcv_event)
-        self.register('M-CD', self.process_deliver_event)
+        self.register('M-CB', self.process_bcast_event, decoded=True)
+        self.register('M-CR', self.process_rcv_event, decoded=True)
+        self.register('M-CD', self.process_deliver_event, decoded=True)
 
-        self.register('stderr', self.process_error_event)
+        self.register('stderr', self.process_error_event, decoded=True)
 
         if not self.strict:
             self._non_strict_setup()
@@ -216,9 +225,10 @@ class MetricsCommon(object):
         ordered_node_id = OrderedId(ordered_node_id)
         return ordered_node_id, self.topology.o2t(ordered_node_id)
 
-    def register(self, name, function):
-        """Register a callback :function: for the event with name :name:"""
-        self.sim.register_output_handler(name, function)
+    def register(self, name, function, decoded=False):
+        """Register a callback :function: for the event with name :name:
+        If :decoded: the callback is passed a record from simulator.EventDecoder"""
+        self.sim.register_output_handler(name, function, decoded)
 
     def register_generic(self, identifier, function):
         """Register a callback for a generic event."""
@@ -276,13 +286,11 @@ class MetricsCommon(object):
             self._warning_or_error(f"The sequence number is an invalid unknown of {sequence_number}")
             return None
 
-    def process_node_type_add(self, d_or_e, node_id, time, detail):
-        (ident, name) = detail.split(',')
-        self.node_types[int(ident)] = name
+    def process_node_type_add(self, event):
+        self.node_types[event.ident] = event.name
 
-    def process_message_type_add(self, d_or_e, node_id, time, detail):
-        (ident, name) = detail.split(',')
-        self.message_types[int(ident)] = name
+    def process_message_type_add(self, event):
+        self.message_types[event.ident] = event.name
 
     def _warning_or_error(self, message):
         if self.strict:
@@ -292,24 +300,25 @@ class MetricsCommon(object):
 
 
 
-    def process_bcast_event(self, d_or_e, node_id, time, detail):
-        (kind, status, ultimate_source_id, sequence_number, tx_power, hex_buffer) = detail.split(',')
+    def process_bcast_event(self, event):
+        (kind, status, ultimate_source_id, sequence_number, hex_buffer) = (
+            event.kind, event.status, event.ultimate_source_id, event.sequence_number, event.hex_buffer)
 
         # If the BCAST succeeded, then status was SUCCESS (See TinyError.h)
-        if status != "0":
+        if status != 0:
             return
 
         if __debug__:
             if len(hex_buffer) % 2 != 0:
                 raise RuntimeError(f"The sent buffer {hex_buffer} does not have an even length {len(hex_buffer)/2}")
 
-        key = (str(node_id), kind, ultimate_source_id, sequence_number)
+        key = (event.node_id, kind, ultimate_source_id, sequence_number)
         if key not in self.messages_broadcast:
             self.messages_broadcast[key] = list()
         self.messages_broadcast[key].append(hex_buffer)
 
-        ord_node_id, top_node_id = self._process_node_id(node_id)
-        time = float(time)
+        ord_node_id, top_node_id = self._process_node_id(event.node_id)
+        time = event.time
 
         kind = self.message_kind_to_string(kind)
 
@@ -348,11 +357,11 @@ class MetricsCommon(object):
                 try:
                     ord_ultimate_source_id, top_ultimate_source_id = self._process_node_id(ultimate_source_id)
                     if ord_ultimate_source_id not in self.source_ids():
-                        self._warning_or_error("Node {} bcast a Normal message from {} which is not a source id ({}). Detail: {}".format(
-                            node_id, ord_ultimate_source_id, self.source_ids(), detail))
+                        self._warning_or_error("Node {} bcast a Normal message from {} which is not a source id ({}). Event: {}".format(
+                            event.node_id, ord_ultimate_source_id, self.source_ids(), event))
                 except KeyError:
-                    self._warning_or_error("Node {} bcast a Normal message from {} which is not a valid ordered node id. Detail: {}".format(
-                            node_id, ultimate_source_id, detail))
+                    self._warning_or_error("Node {} bcast a Normal message from {} which is not a valid ordered node id. Event: {}".format(
+                            event.node_id, ultimate_source_id, event))
 
     def _record_direction_received(self, kind, ord_node_id, ord_proximate_source_id,
                                    further_hops, closer_or_same_hops,
@@ -367,53 +376,48 @@ class MetricsCommon(object):
             return
 
         conf = self.configuration
-        topo = conf.topology
-
-        o2i = topo.o2i
-        o2t = topo.o2t
+        o2i = conf.topology.o2i
 
         idx_proximate_source_id = o2i(ord_proximate_source_id).nid
         idx_node_id = o2i(ord_node_id).nid
 
-        nd = conf._dist_matrix
-        ndm = conf._dist_matrix_meters
+        # Not all topologies know the distance in hops
+        knows_hops = conf._dist_matrix is not None
 
         for ord_source_id in self.source_ids():
-            top_source_id = o2t(ord_source_id)
-            idx_source_id = o2i(ord_source_id).nid
-
-            # Not all topologies know the distance in hops
-            if nd is not None:
-                prox_distance = nd[idx_source_id, idx_proximate_source_id]
-                node_distance = nd[idx_source_id, idx_node_id]
-                
-                if node_distance < prox_distance:
+            try:
+                (top_source_id, table) = self._direction_tables[ord_source_id]
+            except KeyError:
+                top_source_id = conf.topology.o2t(ord_source_id)
+                table = conf.direction_table(ord_source_id)
+                self._direction_tables[ord_source_id] = (top_source_id, table)
+
+            direction = table[idx_proximate_source_id, idx_node_id]
+
+            if knows_hops:
+                if direction & DIRECTION_FROM_FURTHER_HOPS:
                     further_hops[kind][top_source_id] += 1
                 else:
                     closer_or_same_hops[kind][top_source_id] += 1
-            
-            prox_distance_m = ndm[idx_source_id, idx_proximate_source_id]
-            node_distance_m = ndm[idx_source_id, idx_node_id]
-            
-            if node_distance_m < prox_distance_m:
+
+            if direction & DIRECTION_FROM_FURTHER_METERS:
                 further_meters[kind][top_source_id] += 1
             else:
                 closer_or_same_meters[kind][top_source_id] += 1
 
-    def process_rcv_event(self, d_or_e, node_id, time, detail):
-        (kind, proximate_source_id, ultimate_source_id, sequence_number, hop_count) = detail.split(',')
+    def process_rcv_event(self, event):
+        (node_id, time, proximate_source_id, ultimate_source_id, sequence_number, hop_count) = (
+            event.node_id, event.time, event.proximate_source_id, event.ultimate_source_id, event.sequence_number, event.hop_count)
 
         ord_node_id, top_node_id = self._process_node_id(node_id)
 
-        time = float(time)
-        kind = self.message_kind_to_string(kind)
+        kind = self.message_kind_to_string(event.kind)
 
         self.received[kind][top_node_id] += 1
 
         if ord_node_id in self.sink_ids() and kind == "Normal":
             sequence_number = self.parse_sequence_number(sequence_number)
             ord_ultimate_source_id, top_ultimate_source_id = self._process_node_id(ultimate_source_id)
-            hop_count = int(hop_count)
 
             # If there is a KeyError on the line with self.normal_sent_time
             # then that means that a message was received, but not recorded as sent.
@@ -446,8 +450,9 @@ class MetricsCommon(object):
 
         self.receive_time.setdefault(kind, {}).setdefault(ord_node_id, []).append(time)
 
-    def process_deliver_event(self, d_or_e, node_id, time, detail):
-        (kind, target, proximate_source_id, ultimate_source_id, sequence_number, rssi, lqi, hex_buffer) = detail.split(',')
+    def process_deliver_event(self, event):
+        (node_id, kind, proximate_source_id, ultimate_source_id, sequence_number, hex_buffer) = (
+            event.node_id, event.kind, event.proximate_source_id, event.ultimate_source_id, event.sequence_number, event.hex_buffer)
 
         if __debug__:
             key = (proximate_source_id, kind, ultimate_source_id, sequence_number)
@@ -482,8 +487,8 @@ class MetricsCommon(object):
 
         key = (top_prox_src_id, top_node_id)
 
-        self.delivered_rssi[key].push(int(rssi))
-        self.delivered_lqi[key].push(int(lqi))
+        self.delivered_rssi[key].push(event.rssi)
+        self.delivered_lqi[key].push(event.lqi)
 
         # Check that the normal message that has been delivered has a ultimate source
         # that we believe to be a source.
@@ -492,32 +497,29 @@ class MetricsCommon(object):
                 try:
                     ord_ultimate_source_id, top_ultimate_source_id = self._process_node_id(ultimate_source_id)
                     if ord_ultimate_source_id not in self.source_ids():
-                        self._warning_or_error("Node {} received a Normal message from {} which is not a source id ({}). Detail: {}".format(
-                            node_id, ord_ultimate_source_id, self.source_ids(), detail))
+                        self._warning_or_error("Node {} received a Normal message from {} which is not a source id ({}). Event: {}".format(
+                            node_id, ord_ultimate_source_id, self.source_ids(), event))
                 except KeyError:
-                    self._warning_or_error("Node {} received a Normal message from {} which is not a valid ordered node id. Detail: {}".format(
-                            node_id, ultimate_source_id, detail))
-
-    def process_node_booted(self, d_or_e, node_id, time, detail):
-        ord_node_id, top_node_id = self._process_node_id(node_id)
-        self.node_booted_at[ord_node_id].append(float(time))
+                    self._warning_or_error("Node {} received a Normal message from {} which is not a valid ordered node id. Event: {}".format(
+                            node_id, ultimate_source_id, event))
 
-    def process_generic(self, d_or_e, node_id, time, detail):
-        (kind, data) = detail.split(",", 1)
-        kind = int(kind)
+    def process_node_booted(self, event):
+        ord_node_id, top_node_id = self._process_node_id(event.node_id)
+        self.node_booted_at[ord_node_id].append(event.time)
 
-        handler = self._generic_handlers.get(kind, None)
+    def process_generic(self, event):
+        handler = self._generic_handlers.get(event.kind, None)
 
         if handler is None:
             return
 
-        handler(d_or_e, node_id, time, data)
+        handler(event.d_or_e, event.node_id, event.time, event.data)
 
-    def process_node_change_event(self, d_or_e, node_id, time, detail):
-        (old_name, new_name) = detail.split(',')
+    def process_node_change_event(self, event):
+        (old_name, new_name) = (event.old_name, event.new_name)
 
-        ord_node_id, top_node_id = self._process_node_id(node_id)
-        time = float(time)
+        ord_node_id, top_node_id = self._process_node_id(event.node_id)
+        time = event.time
 
         if new_name == "SourceNode":
             self.reported_source_ids.add(ord_node_id)
@@ -540,12 +542,8 @@ class MetricsCommon(object):
 
         self.node_transitions[(old_name, new_name)] += 1
 
-    def process_error_event(self, d_or_e, node_id, time, detail):
-        (code, message) = detail.split(",", 1)
-
-        code = int(code)
-
-        self.errors[code] += 1
+    def process_error_event(self, event):
+        self.errors[event.code] += 1
 
 
     def num_normal_sent_if_finished(self):
@@ -1039,29 +1037,50 @@ class MetricsCommon(object):
         return d
 
     @classmethod
-    def print_header(cls, stream=None):
-        """Print the results header to the specified stream (defaults to sys.stdout)."""
-        print("#" + "|".join(cls.items().keys()), file=stream)
+    def print_header(cls, stream=None, attacker_model=None):
+        """Print the results header to the specified stream (defaults to sys.stdout).
+        When multiple attacker configurations are evaluated together, each row
+        is prefixed by the attacker model that it is for."""
+        print("#" + "|".join(cls.headings(attacker_model=attacker_model)), file=stream)
 
-    def get_results(self):
-        """Get the results in the result file format."""
+    @classmethod
+    def headings(cls, attacker_model=None):
+        """The names of the columns in the results."""
+        headings = list(cls.items().keys())
+
+        if hasattr(attacker_model, "configurations"):
+            headings.insert(0, "AttackerModel")
+
+        return headings
+
+    def get_results(self, overrides=None):
+        """Get the results in the result file format.
+        Values in :overrides: are used instead of the current values of those items."""
         results = []
 
         for (name, fn) in self.items().items():
-            try:
-                result = str(fn(self))
-            except Exception as ex:
-                import traceback
-                print("Error finding the value of '{}': {}".format(name, ex), file=sys.stderr)
-                print(traceback.format_exc(), file=sys.stderr)
-                result = "None"
-
-            results.append(result)
+            if overrides is not None and name in overrides:
+                results.append(overrides[name])
+            else:
+                results.append(self._get_result(name, fn))
 
         return "|".join(results)
 
+    def _get_result(self, name, fn):
+        try:
+            return str(fn(self))
+        except Exception as ex:
+            import traceback
+            print("Error finding the value of '{}': {}".format(name, ex), file=sys.stderr)
+            print(traceback.format_exc(), file=sys.stderr)
+            return "None"
+
     def print_results(self, stream=None):
         """Print the results to the specified stream (defaults to sys.stdout)."""
+        if hasattr(getattr(self.sim.args, "attacker_model", None), "configurations"):
+            self._print_attacker_group_results(stream)
+            return
+
         try:
             print(self.get_results(), file=stream)
         except Exception as ex:
@@ -1070,6 +1089,55 @@ class MetricsCommon(object):
                 self.seed(), self.event_count, self.sim_time(), traceback.format_exc())
             )
 
+    # The items that describe the simulation process rather than what happened in it.
+    # These are shared by every attacker group, all other items are cut at a group's capture time.
+    ATTACKER_GROUP_RUN_ITEMS = (
+        "Seed", "WallTime", "TotalWallTime", "EventCount", "MemoryRSS", "MemoryVMS",
+    )
+
+    @contextmanager
+    def _attacker_group_view(self, group):
+        """Make the simulation only see the attackers of the given group."""
+        all_attackers = self.sim.attackers
+        all_found_source = self.sim.attacker_found_source
+
+        self.sim.attackers = group.attackers
+        self.sim.attacker_found_source = group.found_source
+
+        try:
+            yield
+        finally:
+            self.sim.attackers = all_attackers
+            self.sim.attacker_found_source = all_found_source
+
+    def attacker_group_captured(self, group):
+        """Called when an attacker group has captured a source, but other groups have not.
+        Records the results of that group, as they would have been if the simulation stopped now."""
+        if not hasattr(getattr(self.sim.args, "attacker_model", None), "configurations"):
+            return
+
+        with self._attacker_group_view(group):
+            self.attacker_group_capture_results[group.ident] = {
+                name: self._get_result(name, fn)
+                for (name, fn) in self.items().items()
+                if name not in self.ATTACKER_GROUP_RUN_ITEMS
+            }
+
+    def _print_attacker_group_results(self, stream=None):
+        """Print one row per attacker group, each only seeing its own attackers.
+        The results of groups that captured a source are cut at their capture time."""
+        for group in self.sim.attacker_groups:
+            overrides = self.attacker_group_capture_results.get(group.ident)
+
+            with self._attacker_group_view(group):
+                try:
+                    print(group.name + "|" + self.get_results(overrides=overrides), file=stream)
+                except Exception:
+                    import traceback
+                    raise RuntimeError("Failed to get the result string for seed {} and attacker {} (events={}, sim_time={}) caused by {}".format(
+                        self.seed(), group.name, self.event_count, self.sim_time(), traceback.format_exc())
+                    )
+
     def print_warnings(self, stream=None):
         """Print any warnings about result consistency."""
 
@@ -1089,6 +1157,9 @@ class MetricsCommon(object):
             print("\tThis time {} was less than the safety period {}".format(self.sim_time() - self.sim._duration_start_time, self.sim.safety_period_value), file=stream)
             print("\tIf running on COOJA or AVRORA try creating a variable in Arguments called 'cycle_accurate_setup_period' that contains the length of the algorithm's setup period in seconds.", file=stream)
 
+        if getattr(self.sim, "pruned_link_count", None):
+            print(f"Pruned {self.sim.pruned_link_count} links with a gain below {self.sim.link_gain_threshold} dBm.", file=stream)
+
         if self.reached_sim_upper_bound():
             print("Reached Upper Bound:", file=stream)
             print("\tSimulation reached the upper bound, likely because the safety period was not triggered.", file=stream)
@@ -1559,9 +1630,9 @@ class MessageTimeMetricsGrapher(MetricsCommon):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.register('M-CB', self.log_time_bcast_event)
-        self.register('M-CD', self.log_time_deliver_event)
-        self.register('M-NC', self.log_time_node_change_event)
+        self.register('M-CB', self.log_time_bcast_event, decoded=True)
+        self.register('M-CD', self.log_time_deliver_event, decoded=True)
+        self.register('M-NC', self.log_time_node_change_event, decoded=True)
 
         self._bcasts = defaultdict(list)
         self._delivers = defaultdict(list)
@@ -1570,14 +1641,13 @@ class MessageTimeMetricsGrapher(MetricsCommon):
         self._node_change = defaultdict(list)
 
 
-    def log_time_bcast_event(self, d_or_e, node_id, time, detail):
-        (kind, status, ultimate_source_id, sequence_number, tx_power, hex_buffer) = detail.split(',')
+    def log_time_bcast_event(self, event):
+        (node_id, time, kind, status, hex_buffer) = (event.node_id, event.time, event.kind, event.status, event.hex_buffer)
 
         # If the BCAST succeeded, then status was SUCCESS (See TinyError.h)
-        if status != "0":
+        if status != 0:
             return
 
-        time = float(time)
         kind = self.message_kind_to_string(kind)
         ord_node_id, top_node_id = self._process_node_id(node_id)
 
@@ -1588,10 +1658,9 @@ class MessageTimeMetricsGrapher(MetricsCommon):
 
         self._bcasts[kind].append((time, ord_node_id, f"{contents}"))
 
-    def log_time_deliver_event(self, d_or_e, node_id, time, detail):
-        (kind, target, proximate_source_id, ultimate_source_id, sequence_number, rssi, lqi, hex_buffer) = detail.split(',')
+    def log_time_deliver_event(self, event):
+        (node_id, time, kind, hex_buffer) = (event.node_id, event.time, event.kind, event.hex_buffer)
 
-        time = float(time)
         kind = self.message_kind_to_string(kind)
         ord_node_id, top_node_id = self._process_node_id(node_id)
 
@@ -1602,10 +1671,9 @@ class MessageTimeMetricsGrapher(MetricsCommon):
 
         self._delivers[kind].append((time, ord_node_id, f"{contents}"))
 
-    def log_time_node_change_event(self, d_or_e, node_id, time, detail):
-        (old_name, new_name) = detail.split(',')
+    def log_time_node_change_event(self, event):
+        (node_id, time, old_name, new_name) = (event.node_id, event.time, event.old_name, event.new_name)
 
-        time = float(time)
         old_name = self.node_kind_to_string(old_name)
         new_name = self.node_kind_to_string(new_name)
         ord_node_id, top_node_id = self._process_node_id(node_id)
@@ -1788,14 +1856,13 @@ class ILPRoutingMessageTimeMetricsGrapher(MessageTimeMetricsGrapher):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def log_time_bcast_event(self, d_or_e, node_id, time, detail):
-        (kind, status, ultimate_source_id, sequence_number, tx_power, hex_buffer) = detail.split(',')
+    def log_time_bcast_event(self, event):
+        (node_id, time, kind, status, sequence_number, hex_buffer) = (event.node_id, event.time, event.kind, event.status, event.sequence_number, event.hex_buffer)
 
         # If the BCAST succeeded, then status was SUCCESS (See TinyError.h)
-        if status != "0":
+        if status != 0:
             return
 
-        time = float(time)
         kind = self.message_kind_to_string(kind)
         ord_node_id, top_node_id = self._process_node_id(node_id)
 
@@ -1805,14 +1872,13 @@ class ILPRoutingMessageTimeMetricsGrapher(MessageTimeMetricsGrapher):
             contents = None
 
         if kind == "Normal":
-            kind = f"{kind}:{int(sequence_number)%self.sim.args.msg_group_size}"
+            kind = f"{kind}:{sequence_number%self.sim.args.msg_group_size}"
 
         self._bcasts[kind].append((time, ord_node_id, f"{contents}"))
 
-    def log_time_deliver_event(self, d_or_e, node_id, time, detail):
-        (kind, target, proximate_source_id, ultimate_source_id, sequence_number, rssi, lqi, hex_buffer) = detail.split(',')
+    def log_time_deliver_event(self, event):
+        (node_id, time, kind, sequence_number, hex_buffer) = (event.node_id, event.time, event.kind, event.sequence_number, event.hex_buffer)
 
-        time = float(time)
         kind = self.message_kind_to_string(kind)
         ord_node_id, top_node_id = self._process_node_id(node_id)
 
@@ -1822,7 +1888,7 @@ class ILPRoutingMessageTimeMetricsGrapher(MessageTimeMetricsGrapher):
             contents = None
 
         if kind == "Normal":
-            kind = f"{kind}:{int(sequence_number)%self.sim.args.msg_group_size}"
+            kind = f"{kind}:{sequence_number%self.sim.args.msg_group_size}"
 
         self._delivers[kind].append((time, ord_node_id, f"{contents}"))
 
@@ -1834,8 +1900,8 @@ class MessageDutyCycleBoundaryHistogram(MetricsCommon):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.register('M-CR', self.log_time_receive_event_hist)
-        self.register('M-G', self.log_time_generic_event_lpl_on)
+        self.register('M-CR', self.log_time_receive_event_hist, decoded=True)
+        self.register('M-G', self.log_time_generic_event_lpl_on, decoded=True)
 
         self._delivers_hist = defaultdict(list)
         self._radio_on_times = defaultdict(list)
@@ -1846,21 +1912,18 @@ class MessageDutyCycleBoundaryHistogram(MetricsCommon):
             "Normal": (int(self.sim.args.lpl_normal_early), int(self.sim.args.lpl_normal_late)),
         }
 
-    def log_time_receive_event_hist(self, d_or_e, node_id, time, detail):
-        (kind, proximate_source_id, ultimate_source_id, sequence_number, hop_count) = detail.split(',')
+    def log_time_receive_event_hist(self, event):
+        (node_id, time, kind) = (event.node_id, event.time, event.kind)
 
-        time = float(time)
         kind = self.message_kind_to_string(kind)
         ord_node_id, top_node_id = self._process_node_id(node_id)
 
         self._delivers_hist[(kind, ord_node_id)].append(time)
 
-    def log_time_generic_event_lpl_on(self, d_or_e, node_id, time, detail):
-        (code, message) = detail.split(",")
+    def log_time_generic_event_lpl_on(self, event):
+        (node_id, time, code) = (event.node_id, event.time, event.kind)
 
-        time = float(time)
         ord_node_id, top_node_id = self._process_node_id(node_id)
-        code = int(code)
 
         code_to_name = {
             3001: "Normal",
@@ -1952,24 +2015,22 @@ class MessageArrivalTimeScatterGrapher(MetricsCommon):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.register('M-CB', self.log_time_diff_bcast_event)
-        self.register('M-CD', self.log_time_diff_deliver_event)
+        self.register('M-CB', self.log_time_diff_bcast_event, decoded=True)
+        self.register('M-CD', self.log_time_diff_deliver_event, decoded=True)
 
         self._bcasts_at = {}
         self._delivers_at = defaultdict(dict)
 
-    def log_time_diff_bcast_event(self, d_or_e, node_id, time, detail):
-        (kind, status, ultimate_source_id, sequence_number, tx_power, hex_buffer) = detail.split(',')
+    def log_time_diff_bcast_event(self, event):
+        (node_id, time, kind, status, ultimate_source_id, sequence_number) = (event.node_id, event.time, event.kind, event.status, event.ultimate_source_id, event.sequence_number)
 
         # If the BCAST succeeded, then status was SUCCESS (See TinyError.h)
-        if status != "0":
+        if status != 0:
             return
 
-        time = float(time)
         kind = self.message_kind_to_string(kind)
         ord_node_id, top_node_id = self._process_node_id(node_id)
         ord_ult_node_id, top_ult_node_id = self._process_node_id(ultimate_source_id)
-        sequence_number = int(sequence_number)
 
         if ord_node_id == ord_ult_node_id:
             key = (ord_node_id, kind, sequence_number)
@@ -1977,14 +2038,12 @@ class MessageArrivalTimeScatterGrapher(MetricsCommon):
             if key not in self._bcasts_at:
                 self._bcasts_at[key] = time
 
-    def log_time_diff_deliver_event(self, d_or_e, node_id, time, detail):
-        (kind, target, proximate_source_id, ultimate_source_id, sequence_number, rssi, lqi, hex_buffer) = detail.split(',')
+    def log_time_diff_deliver_event(self, event):
+        (node_id, time, kind, ultimate_source_id, sequence_number) = (event.node_id, event.time, event.kind, event.ultimate_source_id, event.sequence_number)
 
-        time = float(time)
         kind = self.message_kind_to_string(kind)
         ord_node_id, top_node_id = self._process_node_id(node_id)
         ord_ult_node_id, top_ult_node_id = self._process_node_id(ultimate_source_id)
-        sequence_number = int(sequence_number)
 
         key = (ord_ult_node_id, kind, sequence_number)
 
@@ -2131,7 +2190,8 @@ class FlockLabEnergyMetricsCommon(MetricsCommon):
 
         super().finish()
 
-        start, end = self.sim._real_start_time.timestamp(), self.sim._real_end_time.timestamp()
+        # The FlockLab converter provides times as microseconds since the epoch
+        start, end = self.sim._real_start_us / 1000000.0, self.sim._real_end_us / 1000000.0
 
         log_path = os.path.join(os.path.dirname(self.sim._event_log.log_path), "powerprofilingstats.csv")
         with open(log_path, 'r') as log_file:
@@ -2207,9 +2267,54 @@ class FlockLabEnergyMetricsCommon(MetricsCommon):
         return d
 
 
+class ExtendedHorizonMetrics(MetricsCommon):
+    """Records the times needed to derive the results of a shorter safety period.
+    A run with the largest safety factor can then be used to find out what
+    would have happened with any smaller safety factor, see data.analysis."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def duration_start_time(self):
+        return self.sim._duration_start_time
+
+    def source_capture_time(self):
+        """The time at which each source was first captured"""
+        o2t = self.topology.o2t
+
+        result = {}
+
+        for group in getattr(self.sim, "attacker_groups", []):
+            if not group.found_source:
+                continue
+
+            # Attackers do not move once they have found the source,
+            # so their position is the source that was captured.
+            for attacker in group.attackers:
+                if attacker.found_source():
+                    source = o2t(attacker.position).nid
+                    result[source] = min(result.get(source, group.capture_time), group.capture_time)
+
+        return result
+
+    def normal_sent_receive_times(self):
+        return [
+            (round(sent_time, 6), round(self.normal_receive_time[key], 6) if key in self.normal_receive_time else None)
+            for (key, sent_time)
+            in self.normal_sent_time.items()
+        ]
+
+    @staticmethod
+    def items():
+        d = OrderedDict()
+        d["DurationStartTime"]             = lambda x: x.duration_start_time()
+        d["SourceCaptureTime"]             = lambda x: MetricsCommon.smaller_dict_str(x.source_capture_time())
+        d["NormalSentReceiveTimes"]        = lambda x: MetricsCommon.compressed_dict_str(x.normal_sent_receive_times())
+        return d
+
 
 EXTRA_METRICS = (DutyCycleMetricsGrapher, MessageTimeMetricsGrapher, ILPRoutingMessageTimeMetricsGrapher,
-                 MessageDutyCycleBoundaryHistogram, MessageArrivalTimeScatterGrapher, FlockLabEnergyMetricsCommon)
+                 MessageDutyCycleBoundaryHistogram, MessageArrivalTimeScatterGrapher, FlockLabEnergyMetricsCommon,
+                 ExtendedHorizonMetrics)
 EXTRA_METRICS_CHOICES = [cls.__name__ for cls in EXTRA_METRICS]
 
 def import_algorithm_metrics(module_name, sim, extra_metrics=None):
@@ -1,9 +1,75 @@
 
-from itertools import islice
-import os.path
+import hashlib
+import os
+import tempfile
+
+import numpy as np
 
 from data.restricted_eval import restricted_eval
 
+def noise_cache_dir():
+    """The directory where the preprocessed noise traces are stored.
+    All runs on a machine share this directory, so each noise file is only parsed once."""
+    return os.environ.get("SLP_NOISE_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "slp", "noise"))
+
+def _file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cached_trace(path, parse):
+    """Returns the array produced by parse(path), memory-mapped from a .npy
+    file keyed by the content hash of path. The cache is created if needed."""
+    cache_dir = noise_cache_dir()
+    cache_file = os.path.join(cache_dir, f"{os.path.basename(path)}-{_file_digest(path)}.npy")
+
+    try:
+        return np.load(cache_file, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        pass
+
+    trace = parse()
+
+    # Write to a temporary file and rename so concurrent runs never see a partial cache file
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        (fd, tmp_file) = tempfile.mkstemp(dir=cache_dir, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, trace)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+    except OSError:
+        # Not being able to cache is not fatal
+        return trace
+
+    return np.load(cache_file, mmap_mode="r")
+
+def add_noise_traces(sim, traces):
+    """Gives each node its noise trace and creates the noise models.
+    traces is a dict of node id to a 1D array of noise readings."""
+    # Nodes often share the same trace, so only convert each one once
+    converted = {}
+
+    for node in sim.nodes:
+        trace = traces[node.nid]
+
+        noises = converted.get(id(trace))
+        if noises is None:
+            noises = converted[id(trace)] = trace.tolist()
+
+        tnode = node.tossim_node
+
+        tnode.addNoiseTraces(noises)
+
+        tnode.createNoiseModel()
+
 class NoiseModel(object):
     def setup(self, sim):
         raise NotImplementedError()
@@ -19,14 +85,17 @@ class FileTraceNoiseModel(NoiseModel):
             raise FileNotFoundError(f"File not found {self.log_file}")
 
     def setup(self, sim):
-        noises = list(islice(self._read_noise_from_file(), self.count))
+        noises = self.read_noise()
+
+        add_noise_traces(sim, {node.nid: noises for node in sim.nodes})
 
-        for node in sim.nodes:
-            tnode = node.tossim_node
+    def read_noise(self):
+        trace = cached_trace(self.log_file, self._parse_noise_file)
 
-            tnode.addNoiseTraces(noises)
+        return trace[:self.count]
 
-            tnode.createNoiseModel()
+    def _parse_noise_file(self):
+        return np.fromiter(self._read_noise_from_file(), dtype=np.int16)
 
     def _read_noise_from_file(self):
         with open(self.log_file, "r") as f:
@@ -48,12 +117,13 @@ class TestbedTraceNoiseModel(NoiseModel):
     def setup(self, sim):
         noises = self._read_enough_for_each_node(sim.nodes)
 
-        for node in sim.nodes:
-            tnode = node.tossim_node
+        add_noise_traces(sim, noises)
 
-            tnode.addNoiseTraces(noises[node.nid])
+    def _parse_noise_file(self):
+        trace = np.array(list(self._read_noise_from_file()), dtype=np.int16).reshape(-1, 2)
 
-            tnode.createNoiseModel()
+        # Group the readings by node id, keeping the order in which they were taken
+        return trace[np.argsort(trace[:, 0], kind="stable")]
 
     def _read_noise_from_file(self):
         with open(self.log_file, "r") as f:
@@ -63,24 +133,23 @@ class TestbedTraceNoiseModel(NoiseModel):
                     yield int(nid), int(rssi)
 
     def _read_enough_for_each_node(self, nodes):
-        noises = {node.nid: list() for node in nodes}
+        trace = cached_trace(self.log_file, self._parse_noise_file)
 
-        enough = set()
+        nids = trace[:, 0]
 
-        for (nid, rssi) in self._read_noise_from_file():
-            if nid not in noises:
-                continue
+        noises = {}
+        missing = {}
 
-            if len(noises[nid]) < self.count:
-                noises[nid].append(rssi)
+        for node in nodes:
+            start = np.searchsorted(nids, node.nid, side="left")
+            end = np.searchsorted(nids, node.nid, side="right")
 
-                if len(noises[nid]) == self.count:
-                    enough.add(nid)
+            if end - start < self.count:
+                missing[node.nid] = self.count - (end - start)
+            else:
+                noises[node.nid] = trace[start:start + self.count, 1]
 
-                    if enough == set(noises.keys()):
-                        break
-        else:
-            missing = {nid: self.count - len(noise) for (nid, noise) in noises.items() if nid not in enough}
+        if missing:
             raise RuntimeError(f"Not enough noise readings for all nodes (missing: {missing})")
 
         return noises
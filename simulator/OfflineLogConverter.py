@@ -2,13 +2,20 @@
 import binascii
 from datetime import datetime
 import glob
+import heapq
+from operator import itemgetter
 import os.path
 import re
+import shutil
+import sys
+import tempfile
+import timeit
 import traceback
 
-import numpy as np
 import pandas
 
+from simulator.Simulation import parse_log_event
+
 def _sanitise_string(input_string):
     if len(input_string) > 255:
         input_string = input_string[:255] + "..."
@@ -22,58 +29,68 @@ class OfflineLogConverter(object):
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
 
-class LineLogConverter(object):
+class Null(OfflineLogConverter):
+    """Dummy converter that just provides iteration of the log without changes."""
     def __init__(self, log_path):
         super().__init__()
 
         self.log_path = log_path
-        self.processed_lines = None
-
-        with open(log_path, 'r', encoding="ascii", errors="ignore") as log_file:
-            self._process_file(log_file)
+        self._log_file = open(log_path, 'r')
 
-    def _process_file(self, log_file):
-        raise NotImplementedError()
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._log_file.close()
 
     def __iter__(self):
-        return iter(self.processed_lines)
+        return iter(self._log_file)
 
-class Null(OfflineLogConverter):
-    """Dummy converter that just provides iteration of the log without changes."""
-    def __init__(self, log_path):
+class FlockLab(OfflineLogConverter):
+    """Merges the serial and gpio tracing logs of a FlockLab run into time order.
+
+    The logs are grouped by observer, so the lines of each observer are sorted into a run.
+    Runs are kept in memory until they hold memory_lines lines, after which further
+    runs are spilled to temporary files. The runs are then merged as they are iterated over,
+    and the temporary files are removed once the iteration finishes."""
+
+    memory_lines = int(os.environ.get("SLP_FLOCKLAB_MEMORY_LINES", 1000000))
+
+    def __init__(self, log_path, memory_lines=None):
         super().__init__()
 
         self.log_path = log_path
-        self._log_file = open(log_path, 'r')
+
+        if memory_lines is not None:
+            self.memory_lines = memory_lines
+
+        # The spill directories of iterations that have not finished
+        self._temp_dirs = set()
+        self.spilled_runs = 0
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._log_file.close()
+        for temp_dir in list(self._temp_dirs):
+            self._remove_temp_dir(temp_dir)
 
-    def __iter__(self):
-        return iter(self._log_file)
+    def _remove_temp_dir(self, temp_dir):
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        self._temp_dirs.discard(temp_dir)
 
-class FlockLab(OfflineLogConverter, LineLogConverter):
-    def __init__(self, log_path):
-        super().__init__(log_path)
+    @staticmethod
+    def _time_us(timestamp):
+        return int(round(float(timestamp) * 1000000))
 
     def _process_line(self, line):
         timestamp, observer_id, node_id, direction, output = line.split(",", 4)
 
-        timestamp = float(timestamp)
-
-        node_time = datetime.fromtimestamp(timestamp)
+        node_time = self._time_us(timestamp)
 
         # Remove newline from output
         output = output.strip()
 
-        return [(node_time, output)]
+        return (observer_id, [(node_time, output)])
 
     def _process_gpio_line(self, line):
         timestamp, observer_id, node_id, name, value = line.split(",", 4)
 
-        timestamp = float(timestamp)
-
-        node_time = datetime.fromtimestamp(timestamp)
+        node_time = self._time_us(timestamp)
 
         if not name.startswith('LED'):
             raise ValueError(f"Bad name {name}, expected LED")
@@ -84,71 +101,120 @@ class FlockLab(OfflineLogConverter, LineLogConverter):
         # Remove newline from output
         output = f"LedsC:D:{node_id}:None:{led_num},{led_value}"
 
-        return (node_time, output)
-
-    def _process_file(self, log_file):
-
-        self.processed_lines = []
-
-        for line in log_file:
-            if line.startswith('#'):
-                continue
-            if line.endswith("\0\n"):
-                continue
-
-            try:
-                output = self._process_line(line)
-            except ValueError as ex:
-                print("Failed to parse the line:", _sanitise_string(line))
-                traceback.print_exc()
-                continue
-
-            if output:
-                self.processed_lines.extend(output)
+        return (observer_id, [(node_time, output)])
 
-        # Also need to process gpio tracing
-        gpiotracing_path = os.path.join(os.path.dirname(log_file.name), "gpiotracing.csv")
-        with open(gpiotracing_path, "r") as gpiotracing_file:
-            for line in gpiotracing_file:
+    @staticmethod
+    def _read(path, process_line):
+        with open(path, 'r', encoding="ascii", errors="ignore") as log_file:
+            for line in log_file:
                 if line.startswith('#'):
                     continue
                 if line.endswith("\0\n"):
                     continue
 
                 try:
-                    output = self._process_gpio_line(line)
+                    yield process_line(line)
                 except ValueError as ex:
                     print("Failed to parse the line:", _sanitise_string(line))
                     traceback.print_exc()
-                    continue
 
-                self.processed_lines.append(output)
+    def _spill(self, run, temp_dir):
+        path = os.path.join(temp_dir, f"run{self.spilled_runs}.txt")
+        self.spilled_runs += 1
+
+        with open(path, 'w') as run_file:
+            run_file.writelines(f"{node_time}\t{output}\n" for (node_time, output) in run)
+
+        return self._read_run(path)
+
+    @staticmethod
+    def _read_run(path):
+        with open(path, 'r') as run_file:
+            for line in run_file:
+                node_time, output = line[:-1].split("\t", 1)
+
+                yield (int(node_time), output)
+
+    def _runs(self):
+        # First line is a comment that begins with a #
+        # Each line is comma separated with "timestamp,observer_id,node_id,direction,output"
+
+        # Logs are grouped together by node id
+        # The time will reset to earlier when the serial output for a new node is encountered
+
+        # Also need to process gpio tracing
+        gpiotracing_path = os.path.join(os.path.dirname(self.log_path), "gpiotracing.csv")
+
+        sources = [(self.log_path, self._process_line), (gpiotracing_path, self._process_gpio_line)]
+
+        runs = []
+        held = 0
+        temp_dir = None
 
-        # MUST sort output here, as flocklab output is grouped by node ids
-        self.processed_lines.sort(key=lambda x: x[0])
+        def end_run(run, held):
+            nonlocal temp_dir
 
+            if not run:
+                return held
 
-    # First line is a comment that begins with a #
-    # Each line is comma separated with "timestamp,observer_id,node_id,direction,output"
+            # Sorts are stable, so lines with the same time stay in the order they were logged
+            run.sort(key=itemgetter(0))
 
-    # Logs are grouped together by node id
-    # The time will reset to earlier when the serial output for a new node is encountered
+            if held + len(run) > self.memory_lines:
+                if temp_dir is None:
+                    temp_dir = tempfile.mkdtemp(prefix="flocklab-")
+                    self._temp_dirs.add(temp_dir)
+
+                runs.append(self._spill(run, temp_dir))
+                return held
+
+            runs.append(run)
+            return held + len(run)
+
+        for (path, process_line) in sources:
+            run = []
+            run_observer_id = None
+
+            for (observer_id, records) in self._read(path, process_line):
+                if observer_id != run_observer_id or len(run) >= self.memory_lines:
+                    held = end_run(run, held)
+                    run = []
+                    run_observer_id = observer_id
+
+                run.extend(records)
+
+            held = end_run(run, held)
+
+        return (runs, temp_dir)
+
+    def __iter__(self):
+        (runs, temp_dir) = self._runs()
+
+        try:
+            # Merging is stable, so ties are ordered by the order of the runs
+            yield from heapq.merge(*runs, key=itemgetter(0))
+        finally:
+            if temp_dir is not None:
+                # Close the spilled runs that were not read to the end
+                for run in runs:
+                    if not isinstance(run, list):
+                        run.close()
+
+                self._remove_temp_dir(temp_dir)
 
 class HexFlockLab(FlockLab, OfflineLogConverter):
     # Assumes that log lines for the same node are adjacent
-    def __init__(self, log_path):
+    def __init__(self, log_path, memory_lines=None):
 
         self._buffer_timestamp = None
         self._buffer = ""
 
-        super().__init__(log_path)
+        super().__init__(log_path, memory_lines=memory_lines)
 
     def _process_line(self, line):
         timestamp, observer_id, node_id, direction, output = line.split(",", 4)
 
-        timestamp = float(timestamp)
-
-        node_time = datetime.fromtimestamp(timestamp)
+        node_time = self._time_us(timestamp)
 
         # Remove newline from output
         output = output.strip()
@@ -180,50 +246,98 @@ class HexFlockLab(FlockLab, OfflineLogConverter):
 
         self._buffer_timestamp = node_time if self._buffer else None
 
-        return result
+        return (observer_id, result)
 
 
-class FitIotLab(OfflineLogConverter, LineLogConverter):
-    def __init__(self, log_path):
-        super().__init__(log_path)
-
-    def _process_file(self, log_file):
-        self._check_nul_byte_log_file(log_file)
-
-        usecols = ["globaltime", "metric", "localtime", "kind", "node", "data"]
-
-        df = pandas.read_csv(log_file,
-            sep="[;:]",
-            header=None,
-            names=("globaltime", "testbed node", "metric", "kind", "node", "localtime", "data"),
-            usecols=usecols,
-            dtype={
-                "globaltime": np.float_,
-                #"metric": "category",
-                #"localtime": np.uint32,
-                #"node": np.uint16,
-            },
-            engine="python",
-            nrows=1000000,
-        )
+class FitIotLab(OfflineLogConverter):
+    """Streams the serial aggregator log of a FIT IoT-LAB run.
+
+    Each line is 'globaltime;testbed node;metric:kind:node:localtime:data'.
+    Lines are tokenised as they are read, so the memory used does not grow with the log.
+    The aggregator can log lines slightly out of order, so lines are reordered
+    within a window of reorder_lines lines."""
+
+    reorder_lines = int(os.environ.get("SLP_FITIOTLAB_REORDER_LINES", 10000))
+
+    def __init__(self, log_path, reorder_lines=None):
+        super().__init__()
+
+        self.log_path = log_path
+
+        if reorder_lines is not None:
+            self.reorder_lines = reorder_lines
 
-        # Remove missing data
-        df.dropna(subset=("node", "localtime"), how="any", inplace=True)
+        self.parsed_lines = 0
+        self.malformed_lines = 0
+        self.late_lines = 0
 
-        # Coerce types
-        df["globaltime"] = pandas.to_datetime(df["globaltime"], unit='s')
-        #df["localtime"] = df["localtime"].astype(np.uint32)
-        df["node"] = df["node"].astype(np.uint16)
+        self._parse_seconds = 0.0
 
-        # mergesort to be stable
-        #df.sort_values("globaltime", kind="mergesort", inplace=True)
+        self._log_file = open(log_path, 'r', encoding="ascii", errors="ignore")
 
-        # Change order
-        df = df[usecols]
+        self._check_nul_byte_log_file(self._log_file)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._log_file.close()
+
+        if self.parsed_lines + self.malformed_lines > 0:
+            rate = self.parsed_lines / self._parse_seconds if self._parse_seconds > 0 else float('inf')
+
+            print(f"Parsed {self.parsed_lines} lines of {self.log_path} at {rate:.0f} lines/s, "
+                  f"skipped {self.malformed_lines} malformed lines and "
+                  f"{self.late_lines} lines were later than the reorder window", file=sys.stderr)
+
+    def _parse_line(self, line):
+        fields = line.split(";", 2)
+        if len(fields) != 3:
+            return None
+
+        (globaltime, testbed_node, rest) = fields
+
+        try:
+            globaltime = int(round(float(globaltime) * 1000000))
+        except ValueError:
+            return None
+
+        return parse_log_event(globaltime, rest.rstrip())
+
+    def _events(self):
+        start = timeit.default_timer()
+
+        for line in self._log_file:
+            event = self._parse_line(line)
+
+            if event is None:
+                self.malformed_lines += 1
+                continue
+
+            self.parsed_lines += 1
+            self._parse_seconds += timeit.default_timer() - start
+
+            yield event
+
+            start = timeit.default_timer()
+
+    def __iter__(self):
+        window = []
+        last_time = None
+
+        # The count keeps lines with the same time in the order they were logged
+        for (count, event) in enumerate(self._events()):
+            heapq.heappush(window, (event.time_us, count, event))
+
+            if len(window) > self.reorder_lines:
+                (time_us, _, event) = heapq.heappop(window)
+
+                if last_time is not None and time_us < last_time:
+                    self.late_lines += 1
+                else:
+                    last_time = time_us
 
-        #print(df[df["node"] == 153])
+                yield event
 
-        self.processed_lines = df.itertuples(index=False)
+        while window:
+            yield heapq.heappop(window)[2]
 
     def _check_nul_byte_log_file(self, log_file):
         firstn = log_file.read(1024)
@@ -0,0 +1,112 @@
+"""Records the seeds of a job as they are planned, started, completed and crash.
+
+The results of each run are written to the job's results file as the run
+finishes, but nothing recorded which of the job's runs had finished. A job
+killed at its wall time limit had to be rerun in full. With a ledger the seeds
+of the job are chosen up front and every change of a seed's state is appended
+to the ledger file, so that:
+ - a resumed job only runs the seeds that did not complete
+ - the driver can count the completed runs without analysing the results
+
+Each line of the ledger is '<state> <seed> <time>'. Lines are appended with a
+single write, so the ledger stays readable if the job is killed.
+"""
+
+import os
+import time
+
+from simulator.ArgumentsCommon import _secure_random
+
+PLAN = "plan"
+START = "start"
+DONE = "done"
+CRASH = "crash"
+
+def ledger_path(result_path):
+    return os.path.splitext(result_path)[0] + ".ledger"
+
+class RunLedger(object):
+    def __init__(self, path):
+        self.path = path
+
+    def _append(self, lines):
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            data = "".join(lines).encode("utf-8")
+
+            # Do not continue the incomplete last line of a job that was killed
+            size = os.fstat(fd).st_size
+            if size > 0 and os.pread(fd, 1, size - 1) != b"\n":
+                data = b"\n" + data
+
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _record(self, state, seed):
+        self._append([f"{state} {seed} {time.time():.3f}\n"])
+
+    def states(self):
+        """The planned seeds, in order, and the last state of each of them."""
+        planned = []
+        states = {}
+
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        (state, seed, when) = line.split()
+                        seed = int(seed)
+                    except ValueError:
+                        # Lines may be incomplete if the job was killed
+                        continue
+
+                    if state not in (PLAN, START, DONE, CRASH):
+                        continue
+
+                    if state == PLAN:
+                        planned.append(seed)
+                        states.setdefault(seed, PLAN)
+
+                    # A seed that is done stays done, even if it is run again
+                    elif states.get(seed) != DONE:
+                        states[seed] = state
+
+        except FileNotFoundError:
+            pass
+
+        return (planned, states)
+
+    def completed(self):
+        """The number of the planned runs that completed."""
+        (planned, states) = self.states()
+        return sum(1 for seed in set(planned) if states.get(seed) == DONE)
+
+    def remaining(self):
+        """The planned seeds that did not complete, as they were never started,
+        were running when the job was killed or crashed."""
+        (planned, states) = self.states()
+        return [seed for seed in planned if states.get(seed) != DONE]
+
+    def plan(self, job_size):
+        """Chooses the seeds of :job_size: new runs."""
+        seeds = [_secure_random() for _ in range(job_size)]
+
+        self._append([f"{PLAN} {seed} {time.time():.3f}\n" for seed in seeds])
+
+        return seeds
+
+    def run(self, seed, runner, *args):
+        """Runs :runner: recording the state of :seed:.
+        A run is done when it printed results, runs that exit without doing so have crashed."""
+        self._record(START, seed)
+
+        try:
+            output = runner(*args)
+        except BaseException:
+            self._record(CRASH, seed)
+            raise
+
+        self._record(DONE if output.strip() else CRASH, seed)
+
+        return output
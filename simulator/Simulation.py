@@ -1,15 +1,19 @@
 
 import ast
-from datetime import datetime
+from collections import namedtuple
+from datetime import datetime, timedelta
 import heapq
 import importlib
 import os
 import random
+import re
 import sys
 import timeit
 
 import numpy as np
 
+from simulator.Attacker import AttackerGroup, AttackerPositionIndex
+from simulator.EventDecoder import EventDecoder
 import simulator.CommunicationModel as CommunicationModel
 import simulator.MetricsCommon as MetricsCommon
 import simulator.NoiseModel as NoiseModel
@@ -67,6 +71,10 @@ class Simulation(object):
         self.wireless_range = args.distance
         self.latest_node_start_time = args.latest_node_start_time
 
+        # Links with a gain below this threshold (in dBm) are not installed
+        self.link_gain_threshold = getattr(args, "link_gain_threshold", None)
+        self.pruned_link_count = None
+
         # Cache the number of ticks per second.
         # This value should not change throughout the simulation's execution
         self._ticks_per_second = self.tossim.ticksPerSecond()
@@ -94,6 +102,11 @@ class Simulation(object):
         self.fault_model = args.fault_model
 
         self.attackers = []
+        self.attacker_groups = []
+        self.attacker_positions = AttackerPositionIndex(self)
+
+        self.event_decoder = EventDecoder()
+        self._event_dispatchers = {}
 
         metrics_class = MetricsCommon.import_algorithm_metrics(module_name, args.sim, args.extra_metrics)
 
@@ -122,8 +135,9 @@ class Simulation(object):
         del self.radio
         del self.tossim
 
-    def register_output_handler(self, name, function):
-        """Registers this class to catch the output from the simulation on the given channel."""
+    def register_output_handler(self, name, function, decoded=False):
+        """Registers this class to catch the output from the simulation on the given channel.
+        When decoded is True, function is passed a single record decoded by the EventDecoder."""
 
         if self.args.show_raw_log:
             # Only add if no callbacks were previously present for this name
@@ -137,20 +151,15 @@ class Simulation(object):
                 self.tossim.addCallback(name, process_one_line)
 
         if function is not None:
-            def process_one_line(line):
-                # Do not pass newline in detail onwards
-                args = line[:-1].split(':', 3)
-                
-                # Checking that event time and sim time correspond
-                #(d_or_e, node_id, time, detail) = args
-                #time = float(time)
-                #rounded_sim_time = round(self.sim_time(), 6)
-                #if time != rounded_sim_time:
-                #    print(f"Event occurred at {time} and sim_time of {rounded_sim_time}")
+            # A single callback per channel, so the line is only split and decoded once
+            dispatcher = self._event_dispatchers.get(name, None)
 
-                function(*args)
+            if dispatcher is None:
+                dispatcher = self._event_dispatchers[name] = self.event_decoder.dispatcher(name)
 
-            self.tossim.addCallback(name, process_one_line)
+                self.tossim.addCallback(name, dispatcher.process_line)
+
+            dispatcher.add(function, decoded)
 
     def node_distance_meters(self, left, right):
         """Get the euclidean distance between two nodes specified by their ids"""
@@ -261,25 +270,42 @@ class Simulation(object):
         cm.setup(self)
 
         ri2o = self.configuration.topology.ri2o
-        isnan = np.isnan
 
         wgn = cm.white_gausian_noise
 
-        radio_add = self.radio.add
         radio_setNoise = self.radio.setNoise
 
-        for ((i, j), gain) in np.ndenumerate(cm.link_gain):
-            if i == j:
-                continue
-            if isnan(gain):
-                continue
+        link_gain = cm.link_gain
 
-            # Convert from the indexes to the ordered node ids
-            nidi = ri2o(i).nid
-            nidj = ri2o(j).nid
+        # NaN signals that there is no link
+        valid = ~np.isnan(link_gain)
+        np.fill_diagonal(valid, False)
+
+        if self.link_gain_threshold is not None:
+            with np.errstate(invalid='ignore'):
+                mask = valid & (link_gain >= self.link_gain_threshold)
+        else:
+            mask = valid
+
+        (iis, jjs) = np.nonzero(mask)
+        gains = link_gain[iis, jjs]
 
+        self.pruned_link_count = int(np.count_nonzero(valid)) - gains.size
+
+        # Convert from the indexes to the ordered node ids
+        index_to_nid = np.array([ri2o(i).nid for i in range(link_gain.shape[0])], dtype=np.int64)
+
+        srcs = index_to_nid[iis]
+        dsts = index_to_nid[jjs]
+
+        radio_add = self.radio.add
+
+        for (nidi, nidj, gain) in zip(srcs.tolist(), dsts.tolist(), gains.tolist()):
             radio_add(nidi, nidj, gain)
 
+        if self.args.verbose and self.link_gain_threshold is not None:
+            print(f"Installed {gains.size} links, pruned {self.pruned_link_count} below {self.link_gain_threshold} dBm", file=sys.stderr)
+
         for (i, noise_floor) in enumerate(cm.noise_floor):
             nidi = ri2o(i).nid
 
@@ -292,11 +318,182 @@ class Simulation(object):
 
     def add_attacker(self, attacker):
         self.attackers.append(attacker)
+        attacker.group.attackers.append(attacker)
+
+    def add_attacker_group(self, name):
+        group = AttackerGroup(len(self.attacker_groups), name)
+        self.attacker_groups.append(group)
+        return group
+
+    def attacker_group_found_source(self, group):
+        """Records that an attacker in the group has found a source.
+        The run only stops once every group has found a source."""
+        if group.found_source:
+            return
+
+        group.found_source = True
+        group.capture_time = self.sim_time()
+
+        self.attacker_found_source = all(g.found_source for g in self.attacker_groups)
+
+        if not self.attacker_found_source:
+            self.metrics.attacker_group_captured(group)
 
     def any_attacker_found_source(self):
         return self.attacker_found_source
 
 
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _time_us(value):
+    """Converts a log time to integer microseconds since the epoch."""
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+
+    return (value - _EPOCH) // _MICROSECOND
+
+def _us_time(value):
+    return None if value is None else _EPOCH + timedelta(microseconds=int(value))
+
+def _int_or_none(value):
+    if value == "None":
+        return None
+    if not value.isdigit():
+        raise ValueError(value)
+    return int(value)
+
+OfflineEvent = namedtuple("OfflineEvent", ("time_us", "kind", "node_local_time", "log_type", "node_id", "message_line"))
+
+def parse_log_event(time_us, rest):
+    """Structures the 'kind:D:node:time:message' part of a log line that happened at :time_us:.
+    None is returned when :rest: is not in that form."""
+    fields = rest.split(":", 4)
+    if len(fields) != 5:
+        return None
+
+    (kind, log_type, node_id, node_local_time, message_line) = fields
+
+    if log_type != "D" and log_type != "E":
+        return None
+    if not kind.isascii() or not kind.replace("-", "").isalpha():
+        return None
+
+    try:
+        return OfflineEvent(time_us, kind, _int_or_none(node_local_time), log_type,
+                            _int_or_none(node_id), message_line.partition("\n")[0])
+    except ValueError:
+        return None
+
+def log_events(lines):
+    """Structures the (time_us, rest) lines of a simulator into OfflineEvents.
+    This allows simulators to hand events to OfflineSimulation without formatting them as text.
+    Lines that cannot be structured are passed on for OfflineSimulation to parse."""
+    for (time_us, rest) in lines:
+        event = parse_log_event(time_us, rest)
+
+        yield (time_us, rest) if event is None else event
+
+class OfflineLineParser(object):
+    """Parses the lines of an offline log into
+    (time_us, kind, node_local_time, log_type, node_id, message_line).
+
+    Lines in the common formats are parsed by slicing on the fast path,
+    anything else falls back to strptime and a regular expression."""
+
+    LINE_RE = re.compile(r'([a-zA-Z-]+):([DE]):(\d+|None):(\d+|None):(.*)\s*')
+
+    def __init__(self, show_raw_log=False):
+        self.show_raw_log = show_raw_log
+
+        # Microseconds at the start of each day seen in the log
+        self._day_us = {}
+
+        self.fast_lines = 0
+        self.fast_seconds = 0.0
+        self.fallback_lines = 0
+        self.fallback_seconds = 0.0
+
+    def __call__(self, line):
+        start = timeit.default_timer()
+
+        result = self.parse_fast(line)
+        if result is not None:
+            self.fast_lines += 1
+            self.fast_seconds += timeit.default_timer() - start
+        else:
+            result = self.parse_fallback(line)
+            self.fallback_lines += 1
+            self.fallback_seconds += timeit.default_timer() - start
+
+        if result is not None and self.show_raw_log:
+            print(line)
+
+        return result
+
+    def parse_fast(self, line):
+        # Example line:
+        #2016/07/27 14:47:34.418000|Metric-COMM:D:2:42202:DELIVER:Normal,4,1,1,22
+        if type(line) is OfflineEvent:
+            return line
+
+        try:
+            if isinstance(line, str):
+                if line[26:27] == "|" and line[4:5] == "/" and line[19:20] == ".":
+                    day = line[:10]
+
+                    day_us = self._day_us.get(day)
+                    if day_us is None:
+                        day_us = self._day_us[day] = _time_us(datetime.strptime(day, "%Y/%m/%d"))
+
+                    seconds = int(line[11:13]) * 3600 + int(line[14:16]) * 60 + int(line[17:19])
+
+                    return parse_log_event(day_us + seconds * 1000000 + int(line[20:26]), line[27:])
+
+                if line.startswith("None|"):
+                    return parse_log_event(None, line[5:])
+
+                return None
+
+            # Some nice parsers might already be in the right form
+            if isinstance(line, tuple) and len(line) > 2:
+                return (_time_us(line[0]),) + tuple(line[1:])
+
+            (current_time, rest) = line
+
+            return parse_log_event(_time_us(current_time), rest)
+
+        except (ValueError, TypeError):
+            return None
+
+    def parse_fallback(self, line):
+        if isinstance(line, str):
+            date_string, rest = line.split("|", 1)
+
+            current_time = datetime.strptime(date_string, "%Y/%m/%d %H:%M:%S.%f") if date_string != "None" else None
+
+        else:
+            current_time, rest = line
+
+        match = self.LINE_RE.match(rest)
+        if match is not None:
+            (kind, log_type, node_id, node_local_time, message_line) = match.groups()
+
+            node_id = ast.literal_eval(node_id)
+            node_local_time = ast.literal_eval(node_local_time)
+
+            return (_time_us(current_time), kind, node_local_time, log_type, node_id, message_line)
+        else:
+            return None
+
+    def throughput(self):
+        """A description of the number of lines parsed by each path and how quickly."""
+        def rate(lines, seconds):
+            return f"{lines / seconds:.0f} lines/s" if seconds > 0 else "n/a"
+
+        return (f"fast path {self.fast_lines} lines ({rate(self.fast_lines, self.fast_seconds)}), "
+                f"fallback {self.fallback_lines} lines ({rate(self.fallback_lines, self.fallback_seconds)})")
+
 class OfflineSimulation(object):
     def __init__(self, module_name, configuration, args, event_log):
         self.module_name = module_name
@@ -330,6 +527,7 @@ class OfflineSimulation(object):
 
         self.safety_period_value = float('inf') if self.safety_period is None else (self.safety_period * self.safety_factor)
 
+        self.event_decoder = EventDecoder()
         self._line_handlers = {}
 
         self._callbacks = []
@@ -337,6 +535,8 @@ class OfflineSimulation(object):
         self.fault_model = args.fault_model
 
         self.attackers = []
+        self.attacker_groups = []
+        self.attacker_positions = AttackerPositionIndex(self)
 
         self.configuration = configuration
 
@@ -351,10 +551,11 @@ class OfflineSimulation(object):
         self.start_time = None
         self.enter_start_time = None
 
-        # The times that the actual execution started and ended.
+        # The times that the actual execution started and ended, in microseconds.
         # They are used to emulate sim_time and calculate the execution length.
-        self._real_start_time = None
-        self._real_end_time = None
+        self._real_start_us = None
+        self._real_end_us = None
+        self._sim_time = None
         self._duration_start_time = None
 
         self.attacker_found_source = False
@@ -369,8 +570,7 @@ class OfflineSimulation(object):
         self.debug = getattr(args, "debug", False)
         self.show_raw_log = getattr(args, "show_raw_log", False)
 
-        import re
-        self.LINE_RE = re.compile(r'([a-zA-Z-]+):([DE]):(\d+|None):(\d+|None):(.*)\s*')
+        self._parser = OfflineLineParser(show_raw_log=self.show_raw_log)
 
     def __enter__(self):
 
@@ -389,12 +589,12 @@ class OfflineSimulation(object):
     def __exit__(self, tp, value, tb):
         pass
 
-    def register_output_handler(self, name, function):
+    def register_output_handler(self, name, function, decoded=False):
         if name not in self._line_handlers:
-            self._line_handlers[name] = []
+            self._line_handlers[name] = self.event_decoder.dispatcher(name)
 
         if function is not None:
-            self._line_handlers[name].append(function)
+            self._line_handlers[name].add(function, decoded)
 
     def node_distance_meters(self, left, right):
         """Get the euclidean distance between two nodes specified by their ids"""
@@ -402,10 +602,15 @@ class OfflineSimulation(object):
 
     def sim_time(self):
         """Returns the current simulation time in seconds"""
-        try:
-            return (self._real_end_time - self._real_start_time).total_seconds()
-        except TypeError:
-            return None
+        return self._sim_time
+
+    @property
+    def _real_start_time(self):
+        return _us_time(self._real_start_us)
+
+    @property
+    def _real_end_time(self):
+        return _us_time(self._real_end_us)
 
     def register_event_callback(self, callback, call_at_time):
         heapq.heappush(self._callbacks, (call_at_time, callback))
@@ -456,6 +661,9 @@ class OfflineSimulation(object):
 
         self.metrics.event_count = event_count
 
+        if self._parser.fast_lines + self._parser.fallback_lines > 0:
+            print(f"Parsed the log: {self._parser.throughput()}", file=sys.stderr)
+
         self.metrics.finish()
 
     def continue_predicate(self):
@@ -465,37 +673,7 @@ class OfflineSimulation(object):
         return not self.attacker_found_source
 
     def _parse_line(self, line):
-        # Example line:
-        #2016/07/27 14:47:34.418:Metric-COMM:2:D:42202:DELIVER:Normal,4,1,1,22
-
-        # Some nice parsers might already be in the right form
-        if isinstance(line, tuple) and len(line) > 2:
-            if self.show_raw_log:
-                print(line)
-
-            return line
-
-        if isinstance(line, str):
-            date_string, rest = line.split("|", 1)
-
-            current_time = datetime.strptime(date_string, "%Y/%m/%d %H:%M:%S.%f") if date_string != "None" else None
-
-        else:
-            current_time, rest = line
-
-        match = self.LINE_RE.match(rest)
-        if match is not None:
-            (kind, log_type, node_id, node_local_time, message_line) = match.groups()
-
-            node_id = ast.literal_eval(node_id)
-            node_local_time = ast.literal_eval(node_local_time)
-
-            if self.show_raw_log:
-                print(line)
-
-            return (current_time, kind, node_local_time, log_type, node_id, message_line)
-        else:
-            return None
+        return self._parser(line)
 
     def trigger_duration_run_start(self, time):
         if self._duration_start_time is None:
@@ -504,8 +682,6 @@ class OfflineSimulation(object):
     def run(self):
         """Run the simulator loop."""
 
-        handler_missing = object()
-
         log_file = open("output.log", "w") if self.debug else None
 
         event_count = 0
@@ -520,25 +696,29 @@ class OfflineSimulation(object):
                 result = self._parse_line(line)
 
                 if result is None:
-                    hex_line = ":".join(f"{ord(c):02x}" for c in line)
-                    print(f"Warning unable to parse: '{line}'. As hex: '{hex_line}'. Skipping that line.", file=sys.stderr)
+                    # Events from a simulator are (time_us, rest) rather than a line of text
+                    text = line if isinstance(line, str) else repr(line)
+                    hex_line = ":".join(f"{ord(c):02x}" for c in text)
+                    print(f"Warning unable to parse: '{text}'. As hex: '{hex_line}'. Skipping that line.", file=sys.stderr)
                     continue
 
                 (current_time, kind, node_local_time, log_type, node_id, message_line) = result
 
                 # Record the start and stop time
-                if self._real_start_time is None and current_time is not None:
-                    self._real_start_time = current_time
-
                 if current_time is not None:
-                    self._real_end_time = current_time
+                    if self._real_start_us is None:
+                        self._real_start_us = current_time
+
+                    if current_time != self._real_end_us:
+                        self._real_end_us = current_time
+                        self._sim_time = (current_time - self._real_start_us) / 1e6
 
                 # Run any callbacks that happened before now
                 while len(self._callbacks) > 0:
 
                     (call_at_time, callback) = self._callbacks[0]
 
-                    if call_at_time >= self.sim_time():
+                    if call_at_time >= self._sim_time:
                         break
 
                     heapq.heappop(self._callbacks)
@@ -546,10 +726,9 @@ class OfflineSimulation(object):
                     callback(call_at_time)
 
                 # Handle the event
-                handlers = self._line_handlers.get(kind, handler_missing)
-                if handlers is not handler_missing:
-                    for handler in handlers:
-                        handler(log_type, node_id, self.sim_time(), message_line)
+                dispatcher = self._line_handlers.get(kind, None)
+                if dispatcher is not None:
+                    dispatcher.dispatch(log_type, node_id, self.sim_time(), message_line)
                 else:
                     print(f"There is no handler for the kind {kind}. Unable to process the line '{message_line}'.", file=sys.stderr)
 
@@ -581,6 +760,26 @@ class OfflineSimulation(object):
 
     def add_attacker(self, attacker):
         self.attackers.append(attacker)
+        attacker.group.attackers.append(attacker)
+
+    def add_attacker_group(self, name):
+        group = AttackerGroup(len(self.attacker_groups), name)
+        self.attacker_groups.append(group)
+        return group
+
+    def attacker_group_found_source(self, group):
+        """Records that an attacker in the group has found a source.
+        The run only stops once every group has found a source."""
+        if group.found_source:
+            return
+
+        group.found_source = True
+        group.capture_time = self.sim_time()
+
+        self.attacker_found_source = all(g.found_source for g in self.attacker_groups)
+
+        if not self.attacker_found_source:
+            self.metrics.attacker_group_captured(group)
 
     def any_attacker_found_source(self):
         return self.attacker_found_source
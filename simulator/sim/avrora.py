@@ -22,7 +22,7 @@ def parsers():
         ("SINGLE", None, raw_single_common + ["attacker model"]),
         ("RAW", None, raw_single_common),
         ("GUI", "SINGLE", ["gui scale"]),
-        ("PARALLEL", "SINGLE", ["job size"]),
+        ("PARALLEL", "SINGLE", ["job size", "determinism check", "determinism check rate", "columnar output", "ledger", "ledger mode"]),
         ("CLUSTER", "PARALLEL", ["job id"]),
     ]
 
@@ -49,6 +49,12 @@ def build(module, a):
     #(a, module, module_path, target_directory)
     builder.add_job((module, a), target)
 
+def build_artifacts(module):
+    """The files produced by building module, used to identify the build."""
+    import os.path
+
+    return [os.path.join(module.replace(".", os.path.sep), "main.elf")]
+
 def print_version():
     import simulator.VersionDetection as VersionDetection
 
@@ -148,10 +154,14 @@ def avrora_command(module, a, configuration):
     return command
 
 
-def avrora_iter(iterable):
-    from datetime import datetime
-    import sys
+def _avrora_time_us(time_str):
+    # Avrora prints nanoseconds, of which microseconds are kept
+    (hours, minutes, seconds) = time_str[:-3].split(":")
+    (seconds, fraction) = seconds.split(".")
 
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000000 + int(fraction.ljust(6, "0"))
+
+def _avrora_lines(iterable):
     from queue import PriorityQueue
 
     results_start = "------------------------------------------------------------------------------"
@@ -212,33 +222,31 @@ def avrora_iter(iterable):
             match = RESULT_LINE_RE.match(line)
 
             node = int(match.group(1))
-            node_time = datetime.strptime(match.group(2)[:-3], "%H:%M:%S.%f")
+            node_time = _avrora_time_us(match.group(2))
 
             log = match.group(3)
 
-            stime_str = node_time.strftime("%Y/%m/%d %H:%M:%S.%f")
-
             if log.startswith("---->"):
                 tx_match = TX_LINE_RE.match(log)
                 data = tx_match.group(1)
                 time_length_ms = float(tx_match.group(2))
 
-                fullstr = "{}|AVRORA-TX:D:{}:None:{},{}".format(stime_str, node, data, time_length_ms)
+                rest = "AVRORA-TX:D:{}:None:{},{}".format(node, data, time_length_ms)
 
             elif log.startswith("<===="):
                 rx_match = RX_LINE_RE.match(log)
                 data = rx_match.group(1)
                 time_length_ms = float(rx_match.group(2))
 
-                fullstr = "{}|AVRORA-RX:D:{}:None:{},{}".format(stime_str, node, data, time_length_ms)
+                rest = "AVRORA-RX:D:{}:None:{},{}".format(node, data, time_length_ms)
 
             else:
-                fullstr = "{}|{}".format(stime_str, log)
+                rest = log
 
-            line_buffer.put((node_time, fullstr))
+            line_buffer.put((node_time, rest))
 
             if line_buffer.full():
-                yield line_buffer.get_nowait()[1]
+                yield line_buffer.get_nowait()
 
         else:
             # After the end the simulation has finished and avrora metrics are being printed
@@ -246,13 +254,13 @@ def avrora_iter(iterable):
 
             # Finish printing the rest of the line buffer
             while not line_buffer.empty():
-                yield line_buffer.get_nowait()[1]
+                yield line_buffer.get_nowait()
 
             if not avrora_sim_cycles:
                 match = SIMULATED_TIME_RE.match(line)
                 sim_time_cycles = match.group(1)
 
-                yield "None|AVRORA-SIM-CYCLES:D:None:None:{}".format(sim_time_cycles)
+                yield (None, "AVRORA-SIM-CYCLES:D:None:None:{}".format(sim_time_cycles))
 
                 avrora_sim_cycles = True
 
@@ -269,10 +277,10 @@ def avrora_iter(iterable):
                 if match is None:
                     continue
 
-                yield "None|AVRORA-PACKET-SUMMARY:D:{}:None:{}".format(
+                yield (None, "AVRORA-PACKET-SUMMARY:D:{}:None:{}".format(
                     match.group(1),
                     ",".join(match.group(x) for x in range(2, 8))
-                )
+                ))
 
             if avrora_energy_stats is None and line.startswith(energy_stats_start):
                 avrora_energy_stats = True
@@ -283,7 +291,7 @@ def avrora_iter(iterable):
                     if len(energy_stats_buffer) > 0:
                         energy = NodeEnergy("\n".join(energy_stats_buffer))
 
-                        yield "None|AVRORA-ENERGY-STATS:D:{}:None:{}".format(energy.nid, energy.encode())
+                        yield (None, "AVRORA-ENERGY-STATS:D:{}:None:{}".format(energy.nid, energy.encode()))
 
                     energy_stats_buffer = [line]
 
@@ -293,7 +301,27 @@ def avrora_iter(iterable):
     if len(energy_stats_buffer) > 0:
         energy = NodeEnergy("\n".join(energy_stats_buffer))
 
-        yield "None|AVRORA-ENERGY-STATS:D:{}:None:{}".format(energy.nid, energy.encode())
+        yield (None, "AVRORA-ENERGY-STATS:D:{}:None:{}".format(energy.nid, energy.encode()))
+
+def avrora_iter(iterable):
+    """The output of Avrora as the lines of a log file."""
+    from datetime import datetime, timedelta
+
+    start = datetime(1900, 1, 1)
+
+    for (time_us, rest) in _avrora_lines(iterable):
+        if time_us is None:
+            stime_str = "None"
+        else:
+            stime_str = (start + timedelta(microseconds=time_us)).strftime("%Y/%m/%d %H:%M:%S.%f")
+
+        yield "{}|{}".format(stime_str, rest)
+
+def avrora_events(iterable):
+    """The output of Avrora as events for OfflineSimulation."""
+    from simulator.Simulation import log_events
+
+    return log_events(_avrora_lines(iterable))
 
 def print_arguments(module, a):
     for (k, v) in sorted(vars(a.args).items()):
@@ -354,7 +382,7 @@ def run_simulation(module, a, count=1, print_warnings=False):
 
                 proc_iter = iter(proc.stdout.readline, '')
 
-                with OfflineSimulation(module, configuration, a.args, event_log=avrora_iter(proc_iter)) as sim:
+                with OfflineSimulation(module, configuration, a.args, event_log=avrora_events(proc_iter)) as sim:
                     
                     a.args.attacker_model.setup(sim)
 
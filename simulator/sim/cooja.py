@@ -20,7 +20,7 @@ def parsers():
         ("RAW", None, raw_single_common),
         ("PROFILE", "SINGLE", ["cooja profile"]),
         ("GUI", "SINGLE", ["gui scale"]),
-        ("PARALLEL", "SINGLE", ["job size"]),
+        ("PARALLEL", "SINGLE", ["job size", "determinism check", "determinism check rate", "columnar output", "ledger", "ledger mode"]),
         ("CLUSTER", "PARALLEL", ["job id"]),
     ]
 
@@ -55,6 +55,12 @@ def build(module, a):
     # 0 For successful build result
     return 0
 
+def build_artifacts(module):
+    """The files produced by building module, used to identify the build."""
+    import os.path
+
+    return [os.path.join(module.replace(".", os.path.sep), "main.exe")]
+
 def print_version():
     import os
     import simulator.VersionDetection as VersionDetection
@@ -111,9 +117,7 @@ def cooja_command(module, a, configuration):
     return command
 
 
-def cooja_iter(iterable):
-    from datetime import datetime
-
+def _cooja_lines(iterable):
     exception = None
 
     for line in iterable:
@@ -141,22 +145,35 @@ def cooja_iter(iterable):
             print(f"Failed to process {line}")
             raise
 
-        time_s = float(time_us) / 1000000.0
-
-        node_time = datetime.fromtimestamp(time_s)
-
-        stime_str = node_time.strftime("%Y/%m/%d %H:%M:%S.%f")
-
         # When running in cooja log output mode, an extra "DEBUG: " gets prepended
         # remove this here.
         if rest.startswith("DEBUG: "):
             rest = rest[len("DEBUG: "):]
 
-        yield stime_str + "|" + rest
+        yield (int(time_us), rest)
 
     if exception is not None:
         raise RuntimeError(f"Cooja exception: '{exception}'")
 
+def cooja_iter(iterable):
+    """The output of Cooja as the lines of a log file."""
+    from datetime import datetime
+
+    for (time_us, rest) in _cooja_lines(iterable):
+        time_s = float(time_us) / 1000000.0
+
+        node_time = datetime.fromtimestamp(time_s)
+
+        stime_str = node_time.strftime("%Y/%m/%d %H:%M:%S.%f")
+
+        yield stime_str + "|" + rest
+
+def cooja_events(iterable):
+    """The output of Cooja as events for OfflineSimulation."""
+    from simulator.Simulation import log_events
+
+    return log_events(_cooja_lines(iterable))
+
 def print_arguments(module, a):
     import os
     import hashlib
@@ -238,7 +255,7 @@ def run_simulation(module, a, count=1, print_warnings=False):
 
                 proc_iter = iter(proc.stderr.readline, '')
 
-                with OfflineSimulation(module, configuration, a.args, event_log=cooja_iter(proc_iter)) as sim:
+                with OfflineSimulation(module, configuration, a.args, event_log=cooja_events(proc_iter)) as sim:
                     
                     a.args.attacker_model.setup(sim)
 
@@ -5,7 +5,8 @@ import importlib
 def parsers():
     return [
         ("SINGLE", None, ["verbose", "low verbose", "configuration", "attacker model", "fault model", "safety period",
-                          "seed", "log file", "log converter", "nonstrict", "extra metrics", "show raw log"]),
+                          "seed", "log file", "log converter", "nonstrict", "extra metrics", "show raw log",
+                          "thread count"]),
         ("GUI", "SINGLE", ["gui scale"]),
     ]
 
@@ -144,13 +145,76 @@ def run_one_file(log_file, module, a, count=1, print_warnings=False):
 
     return 0
 
+def _run_one_file_reported(log_file, module, a, count=1, print_warnings=False):
+    """Runs one log file, reporting rather than raising any error so the other files are still analysed."""
+    try:
+        return run_one_file(log_file, module, a, count=count, print_warnings=print_warnings)
+    except Exception as ex:
+        import traceback
+
+        print(f"Failed to analyse {log_file} due to {ex}", file=sys.stderr)
+        print(traceback.format_exc(), file=sys.stderr)
+
+        return 53
+
+_worker_arguments = None
+
+def _init_worker(*arguments):
+    global _worker_arguments
+    _worker_arguments = arguments
+
+def _run_one_file_worker(log_file):
+    """Runs one log file in a worker process, returning its output so that
+    the output of the files can be written in the order they were given."""
+    import contextlib
+    import io
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        ret = _run_one_file_reported(log_file, *_worker_arguments)
+
+    return (ret, stdout.getvalue(), stderr.getvalue())
+
+def _run_files(module, a, count, print_warnings):
+    log_files = a.args.log_file
+
+    processes = min(getattr(a.args, "thread_count", None) or 1, len(log_files))
+
+    # The GUI can only show one simulation
+    if processes <= 1 or a.args.mode == "GUI":
+        for log_file in log_files:
+            yield (log_file, _run_one_file_reported(log_file, module, a, count=count, print_warnings=print_warnings))
+
+        return
+
+    import multiprocessing
+
+    # Forking passes the arguments to the workers without pickling them
+    context = multiprocessing.get_context("fork")
+
+    with context.Pool(processes, initializer=_init_worker, initargs=(module, a, count, print_warnings)) as pool:
+        for (log_file, (ret, stdout, stderr)) in zip(log_files, pool.imap(_run_one_file_worker, log_files)):
+            sys.stdout.write(stdout)
+            sys.stderr.write(stderr)
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            yield (log_file, ret)
+
 def run_simulation(module, a, count=1, print_warnings=False):
     overall_return = 0
 
-    for log_file in a.args.log_file:
-        ret = run_one_file(log_file, module, a, count=count, print_warnings=print_warnings)
+    failed = []
 
+    for (log_file, ret) in _run_files(module, a, count, print_warnings):
         if ret != 0:
             overall_return = ret
+            failed.append(log_file)
+
+    if failed and len(a.args.log_file) > 1:
+        print(f"Failed to analyse {len(failed)} of {len(a.args.log_file)} log files: {', '.join(failed)}", file=sys.stderr)
 
     return overall_return
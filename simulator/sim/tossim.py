@@ -6,12 +6,12 @@ def parsers():
     return [
         ("SINGLE", None, ["verbose", "low verbose", "debug", "show raw log", "seed", "configuration", "network size", "distance",
                           "node id order", "safety period",
-                          "communication model", "noise model", "attacker model", "fault model",
+                          "communication model", "link gain threshold", "noise model", "attacker model", "fault model",
                           "start time", "extra metrics"]),
         ("PROFILE", "SINGLE", []),
         #("RAW", "SINGLE", ["log file"]),
         ("GUI", "SINGLE", ["gui scale", "gui node label", "gui timescale"]),
-        ("PARALLEL", "SINGLE", ["job size", "thread count"]),
+        ("PARALLEL", "SINGLE", ["job size", "thread count", "execution mode", "determinism check", "determinism check rate", "columnar output", "ledger", "ledger mode"]),
         ("CLUSTER", "PARALLEL", ["job id"]),
     ]
 
@@ -26,7 +26,8 @@ global_parameter_names = ('network size', 'configuration',
 def supports_parallel():
     return True
 
-def build(module, a):
+def build(module, a, build_directory=None):
+    """Builds module, or builds a copy of module in :build_directory: when one is given."""
     import os.path
 
     import simulator.Builder as Builder
@@ -44,7 +45,16 @@ def build(module, a):
     build_arguments.update(configuration.build_arguments())
 
     # Now build the simulation with the specified arguments
-    return Builder.build_sim(module.replace(".", os.path.sep), **build_arguments)
+    if build_directory is None:
+        build_directory = module.replace(".", os.path.sep)
+
+    return Builder.build_sim(build_directory, **build_arguments)
+
+def build_artifacts(module):
+    """The files produced by building module, used to identify the build."""
+    import os.path
+
+    return [os.path.join(module.replace(".", os.path.sep), "_TOSSIM*.so")]
 
 def print_version():
     import simulator.VersionDetection as VersionDetection
@@ -56,12 +66,34 @@ def print_arguments(module, a):
         if k not in a.arguments_to_hide:
             print(f"{k}={v}")
 
-def run_simulation(module, a, count=1, print_warnings=False):
+def prepare_fork_server(module, a):
+    """Performs the seed independent setup once in the parent process,
+    so that forked children do not need to repeat it.
+    Returns the keyword arguments to pass to run_simulation."""
+    import importlib
+
+    import simulator.Configuration as Configuration
+    import simulator.MetricsCommon as MetricsCommon
+
+    # Loads _TOSSIM.so
+    importlib.import_module(f"{module}.TOSSIM")
+
+    MetricsCommon.import_algorithm_metrics(module, a.args.sim, a.args.extra_metrics)
+
+    # A randomised node id order depends on the seed, so the configuration
+    # can only be shared when the topology's order is used.
+    if a.args.node_id_order == "topology":
+        return {"configuration": Configuration.create(a.args.configuration, a.args)}
+    else:
+        return {}
+
+def run_simulation(module, a, count=1, print_warnings=False, configuration=None):
     import sys
 
     import simulator.Configuration as Configuration
-    
-    configuration = Configuration.create(a.args.configuration, a.args)
+
+    if configuration is None:
+        configuration = Configuration.create(a.args.configuration, a.args)
 
     # Get the correct Simulation constructor
     if a.args.mode == "SINGLE":
@@ -0,0 +1,244 @@
+from __future__ import print_function, division
+
+from collections import OrderedDict
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from data.analysis import AnalyzerCommon, AnalysisResults
+from simulator.MetricsCommon import MetricsCommon
+
+PREAMBLE = [
+    "@version:python=3.6.0",
+    "configuration=SourceCorner",
+    "network_size=7",
+    "distance=4.5",
+    "attacker_model=SeqNosReactiveAttacker()",
+    "#Seed|Sent|Received|Delivered|Captured|ReachedSimUpperBound|ReceiveRatio|FirstNormalSentTime|TimeTaken|EventCount|NormalLatency",
+]
+
+def _row(seed):
+    return "{}|{}|{}|{}|{}|False|{}|{}|{}|{}|{}".format(
+        seed, 100 + seed * 7 % 13, 90 + seed % 11, 80 + seed % 5,
+        seed % 3 == 0, 0.5 + (seed % 10) / 20, 1.0 + seed % 4 / 8,
+        20.0 + seed % 17, 1000 + seed * 3, 0.01 * (1 + seed % 6))
+
+EXTENDED_HORIZON_PREAMBLE = PREAMBLE[:-1] + [
+    "safety_period=10.0",
+    "safety_factor=2.0",
+    PREAMBLE[-1] + "|DurationStartTime|SourceCaptureTime|NormalSentReceiveTimes",
+]
+
+def _extended_horizon_row(seed, capture_time):
+    """A run with a safety period of 10 seconds, simulated with a safety factor of 2
+    from a duration start time of 1 second. Normal messages are sent every 2 seconds."""
+    end_time = 21.0 if capture_time is None else capture_time
+
+    sent_receive = [(sent, sent + 0.1) for sent in range(2, int(end_time), 2)]
+
+    return "{}|{}|{}|{}|{}|False|1.0|2.0|{}|{}|0.1|1.0|{}|{}".format(
+        seed, len(sent_receive), len(sent_receive), len(sent_receive),
+        capture_time is not None, end_time, 1000 + seed,
+        MetricsCommon.smaller_dict_str({} if capture_time is None else {0: capture_time}),
+        MetricsCommon.compressed_dict_str(sent_receive))
+
+ATTACKER_MODELS = ("SeqNosReactiveAttacker()", "MultipleAttackers(SeqNosReactiveAttacker(),SeqNosReactiveAttacker())")
+
+INDEPENDENT_ATTACKERS_PREAMBLE = PREAMBLE[:-2] + [
+    "attacker_model=IndependentAttackers({})".format(",".join(ATTACKER_MODELS)),
+    "#AttackerModel|" + PREAMBLE[-1][1:],
+]
+
+class Analyzer(AnalyzerCommon):
+    def results_header(self):
+        d = OrderedDict()
+        d['repeats'] = lambda x: str(x.number_of_repeats)
+        d['safety factor'] = lambda x: x.opts.get('safety_factor', 'None')
+        d['attacker model'] = lambda x: x.opts['attacker_model']
+        d['sent'] = lambda x: self._format_results(x, 'Sent')
+        return d
+
+class TestAnalysisSummary(unittest.TestCase):
+
+    KWARGS = {"with_normalised": False}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "SourceCorner-7-4.5.txt")
+        self.analyzer = Analyzer("tossim", self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _append(self, lines):
+        with open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _summarise(self, flush=False):
+        self.output = io.StringIO()
+
+        with contextlib.redirect_stdout(self.output), contextlib.redirect_stderr(io.StringIO()):
+            return self.analyzer.analyse_and_summarise_path(self.path, flush, **self.KWARGS)
+
+    def assertDescribeEqual(self, merged, full):
+        for heading in full:
+            self.assertIn(heading, merged)
+
+            for stat in ("nobs", "valid", "mean", "min", "max", "std"):
+                self.assertAlmostEqual(merged[heading][stat], full[heading][stat], msg=f"{heading} {stat}")
+
+    def test_appended_rows_merged(self):
+        self._append(PREAMBLE + [_row(seed) for seed in range(1, 41)])
+
+        first = self._summarise()
+        self.assertEqual(first.number_of_repeats, 40)
+
+        # A duplicate seed with the same results is dropped when merged
+        self._append([_row(seed) for seed in range(41, 101)] + [_row(7)])
+
+        self.assertTrue(first.is_prefix_of(self.path))
+
+        merged = self._summarise()
+        self.assertIn("Merged 61 appended results", self.output.getvalue())
+
+        full = self._summarise(flush=True)
+
+        self.assertEqual(merged.number_of_repeats, 100)
+        self.assertEqual(merged.dropped_duplicates, 1)
+        self.assertEqual(merged.number_of_repeats, full.number_of_repeats)
+        self.assertEqual(merged.describe_of.keys(), full.describe_of.keys())
+        self.assertDescribeEqual(merged.describe_of, full.describe_of)
+
+    def test_all_loaders_return_every_row(self):
+        self._append(PREAMBLE + [_row(seed) for seed in range(1, 21)])
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            text = AnalysisResults(self.analyzer.analyse_path(self.path, **self.KWARGS))
+
+        summary = self._summarise()
+
+        self.assertEqual(text.number_of_repeats, 20)
+        self.assertEqual(summary.number_of_repeats, 20)
+        self.assertDescribeEqual(summary.describe_of, text.describe_of)
+
+    def test_changed_rows_reanalysed(self):
+        self._append(PREAMBLE + [_row(seed) for seed in range(1, 21)])
+
+        first = self._summarise()
+
+        with open(self.path) as f:
+            contents = f.read()
+
+        with open(self.path, "w") as f:
+            f.write(contents.replace(_row(3) + "\n", _row(30) + "\n"))
+
+        self.assertFalse(first.is_prefix_of(self.path))
+
+        summary = self._summarise()
+
+        self.assertEqual(summary.number_of_repeats, 20)
+        self.assertAlmostEqual(summary.describe_of["EventCount"]["max"], 1090)
+
+    def test_derived_safety_factors(self):
+        self._append(EXTENDED_HORIZON_PREAMBLE + [
+            _extended_horizon_row(1, 14.0),
+            _extended_horizon_row(2, None),
+            _extended_horizon_row(3, 8.0),
+        ])
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            summary = self.analyzer.analyse_and_summarise_path(self.path, False, safety_factors=[1.0, 1.5, 2.0], **self.KWARGS)
+
+        self.assertEqual(list(summary.derived.keys()), [1.0, 1.5])
+
+        (run, sf1, sf15) = summary.all_results()
+
+        self.assertEqual([x.opts["safety_factor"] for x in (run, sf1, sf15)], ["2.0", "1.0", "1.5"])
+        self.assertEqual([x.number_of_repeats for x in (run, sf1, sf15)], [3, 3, 3])
+
+        # Captures at 8 and 14 seconds, with cut offs at 11, 16 and 21 seconds
+        self.assertAlmostEqual(run.describe_of["Captured"]["mean"], 2/3)
+        self.assertAlmostEqual(sf15.describe_of["Captured"]["mean"], 2/3)
+        self.assertAlmostEqual(sf1.describe_of["Captured"]["mean"], 1/3)
+
+        self.assertEqual(sf1.describe_of["TimeTaken"]["max"], 11.0)
+        self.assertEqual(sf15.describe_of["TimeTaken"]["max"], 16.0)
+        self.assertAlmostEqual(sf15.describe_of["NormalLatency"]["mean"], 0.1)
+
+        lines = self.analyzer._result_lines(summary).split("\n")
+
+        self.assertEqual([line.split("|")[:2] for line in lines], [["3", "2.0"], ["3", "1.0"], ["3", "1.5"]])
+
+        # Rows appended later are derived too
+        self._append([_extended_horizon_row(4, 12.0)])
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            summary = self.analyzer.analyse_and_summarise_path(self.path, False, safety_factors=[1.0, 1.5, 2.0], **self.KWARGS)
+
+        self.assertEqual([x.number_of_repeats for x in summary.all_results()], [4, 4, 4])
+        self.assertAlmostEqual(summary.derived[1.0].describe_of["Captured"]["mean"], 1/4)
+        self.assertAlmostEqual(summary.derived[1.5].describe_of["Captured"]["mean"], 3/4)
+
+    def test_attacker_models(self):
+        # Each seed has a row per attacker model, the second model always sends more
+        self._append(INDEPENDENT_ATTACKERS_PREAMBLE + [
+            "{}|{}".format(attacker_model, _row(seed + 5 * i))
+            for seed in range(1, 21)
+            for (i, attacker_model) in enumerate(ATTACKER_MODELS)
+        ])
+
+        summary = self._summarise()
+
+        self.assertEqual(list(summary.attacker_models.keys()), list(ATTACKER_MODELS))
+        self.assertEqual(summary.number_of_repeats, 40)
+
+        results = summary.all_results()
+
+        self.assertEqual([x.opts["attacker_model"] for x in results], list(ATTACKER_MODELS))
+        self.assertEqual([x.number_of_repeats for x in results], [20, 20])
+        self.assertEqual([x.describe_of["EventCount"]["min"] for x in results], [1003, 1018])
+
+        lines = self.analyzer._result_lines(summary).split("\n")
+        self.assertEqual([line.split("|")[0] for line in lines], ["20", "20"])
+        self.assertEqual([line.split("|")[2] for line in lines], list(ATTACKER_MODELS))
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            text = AnalysisResults.of_each_attacker_model(self.analyzer.analyse_path(self.path, **self.KWARGS))
+
+        self.assertEqual([x.opts["attacker_model"] for x in text], list(ATTACKER_MODELS))
+
+        for (merged, full) in zip(results, text):
+            self.assertEqual(merged.number_of_repeats, full.number_of_repeats)
+            self.assertDescribeEqual(merged.describe_of, full.describe_of)
+
+    def test_failed_determinism_check(self):
+        self._append(PREAMBLE + [_row(seed) for seed in range(1, 21)] + ["@meta:determinism=fail"])
+
+        with self.assertRaisesRegex(RuntimeError, "determinism check"):
+            self._summarise()
+
+        with self.assertRaisesRegex(RuntimeError, "determinism check"):
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                self.analyzer.analyse_path(self.path, **self.KWARGS)
+
+        # Testbed results are not expected to be deterministic
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            summary = self.analyzer.analyse_and_summarise_path(self.path, True, verify_seeds=False, **self.KWARGS)
+
+        self.assertEqual(summary.number_of_repeats, 20)
+
+    def test_failed_determinism_check_appended(self):
+        self._append(PREAMBLE + [_row(seed) for seed in range(1, 21)] + ["@meta:determinism=pass"])
+
+        self.assertEqual(self._summarise().number_of_repeats, 20)
+
+        self._append([_row(seed) for seed in range(21, 41)] + ["@meta:determinism=fail"])
+
+        with self.assertRaisesRegex(RuntimeError, "determinism check"):
+            self._summarise()
+
+if __name__ == "__main__":
+    unittest.main()
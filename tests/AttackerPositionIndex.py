@@ -0,0 +1,71 @@
+from __future__ import print_function, division
+
+import unittest
+
+from simulator.Attacker import AttackerPositionIndex
+from simulator.EventDecoder import SCHEMAS
+from simulator.Topology import OrderedId
+
+class FakeSim(object):
+    def __init__(self):
+        self.handlers = []
+
+    def register_output_handler(self, name, function, decoded=False):
+        self.handlers.append((name, function, decoded))
+
+class FakeAttacker(object):
+    def __init__(self, index, position, move_to=None):
+        self.index = index
+        self.position = OrderedId(position)
+        self.move_to = move_to
+        self.seen = []
+
+    def process_attacker_rcv_event(self, event):
+        self.seen.append(event.node_id)
+
+        if self.move_to is not None:
+            self.index.move(self, self.position, OrderedId(self.move_to))
+            self.position = OrderedId(self.move_to)
+            self.move_to = None
+
+def _event(node_id):
+    return SCHEMAS['A-R'].record("D", node_id, 1.0, "Normal", 2, 0, 1, 0, 0)
+
+class TestAttackerPositionIndex(unittest.TestCase):
+
+    def test_only_attackers_at_node(self):
+        sim = FakeSim()
+        index = AttackerPositionIndex(sim)
+
+        a = FakeAttacker(index, 5, move_to=3)
+        b = FakeAttacker(index, 7)
+        c = FakeAttacker(index, 5)
+
+        for attacker in (a, b, c):
+            index.add(attacker)
+
+        # Only one handler is registered, however many attackers there are
+        self.assertEqual(len(sim.handlers), 1)
+
+        index.process_attacker_rcv_event(_event(5))
+
+        self.assertEqual((a.seen, b.seen, c.seen), ([5], [], [5]))
+        self.assertEqual(index.attackers_at(OrderedId(3)), (a,))
+        self.assertEqual(index.attackers_at(OrderedId(5)), (c,))
+
+    def test_order_kept_after_move(self):
+        index = AttackerPositionIndex(FakeSim())
+
+        a = FakeAttacker(index, 1)
+        b = FakeAttacker(index, 2)
+
+        index.add(a)
+        index.add(b)
+
+        index.move(a, a.position, OrderedId(2))
+        a.position = OrderedId(2)
+
+        self.assertEqual(index.attackers_at(OrderedId(2)), (a, b))
+
+if __name__ == "__main__":
+    unittest.main()
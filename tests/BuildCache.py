@@ -0,0 +1,91 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import simulator.Builder as Builder
+import simulator.BuildCache as BuildCache
+
+# Stands in for make, counting how many times it was run
+FAKE_MAKE = (f"{sys.executable} -c \"import os; os.makedirs('build/micaz', exist_ok=True); "
+             "open('build/micaz/main.exe', 'w').write(open('Source.nc').read()); open('built', 'a').write('x')\"")
+
+class TestBuildCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        self.algorithm = os.path.join(self.directory, "algorithm", "example")
+        self.common = os.path.join(self.directory, "algorithm", "common")
+        os.makedirs(self.algorithm)
+        os.makedirs(self.common)
+
+        self._write(os.path.join(self.algorithm, "Makefile"), "include ../common/makefile.common\n")
+        self._write(os.path.join(self.algorithm, "Source.nc"), "module SourceC {}\n")
+        self._write(os.path.join(self.common, "Common.h"), "#define A 1\n")
+
+        self.old_environ = dict(os.environ)
+        os.environ["SLP_BUILD_CACHE_DIR"] = os.path.join(self.directory, "cache")
+        os.environ["SLP_BUILD_CACHE_MAX_MB"] = "1"
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.old_environ)
+
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def _write(path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def _clean(self):
+        shutil.rmtree(os.path.join(self.algorithm, "build"), ignore_errors=True)
+
+    def _builds(self):
+        with open(os.path.join(self.algorithm, "built")) as f:
+            return len(f.read())
+
+    def test_restored_until_sources_change(self):
+        Builder._make(self.algorithm, FAKE_MAKE)
+        self._clean()
+
+        Builder._make(self.algorithm, FAKE_MAKE)
+        self.assertEqual(self._builds(), 1)
+
+        with open(os.path.join(self.algorithm, "build", "micaz", "main.exe")) as f:
+            self.assertEqual(f.read(), "module SourceC {}\n")
+
+        # Different flags are a different build
+        self._clean()
+        Builder._make(self.algorithm, FAKE_MAKE + " -DB=2")
+        self.assertEqual(self._builds(), 2)
+
+        # As is a change to the common sources
+        self._write(os.path.join(self.common, "Common.h"), "#define A 2\n")
+        self._clean()
+        Builder._make(self.algorithm, FAKE_MAKE)
+        self.assertEqual(self._builds(), 3)
+
+    def test_least_recently_used_evicted(self):
+        cache = BuildCache.BuildCache(os.path.join(self.directory, "cache"), max_bytes=2500)
+
+        for (i, key) in enumerate(("a", "b", "c")):
+            before = BuildCache.snapshot(self.algorithm)
+            self._write(os.path.join(self.algorithm, "out.bin"), key * 1000)
+            os.utime(self.algorithm)
+            cache.store(key, self.algorithm, before)
+            os.utime(cache._entry(key), (i, i))
+            os.remove(os.path.join(self.algorithm, "out.bin"))
+
+        cache.evict()
+
+        self.assertEqual(sorted(name for (last_used, size, name) in cache.entries()), ["b", "c"])
+        self.assertTrue(cache.restore("c", self.algorithm))
+        self.assertFalse(cache.restore("a", self.algorithm))
+
+if __name__ == "__main__":
+    unittest.main()
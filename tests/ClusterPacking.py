@@ -0,0 +1,82 @@
+from __future__ import print_function, division
+
+from datetime import timedelta
+import os
+import shutil
+import tempfile
+import unittest
+
+from data.run.driver.cluster_submitter import Runner, pack
+from simulator.CommandLineCommon import type_walltime
+
+def minutes(*values):
+    return [(timedelta(minutes=value), i) for (i, value) in enumerate(values)]
+
+class RecordingRunner(Runner):
+    def _submit_job(self, command):
+        self.commands.append(command)
+
+class TestClusterPacking(unittest.TestCase):
+
+    def test_pack_sequential(self):
+        submissions = pack(minutes(50, 10, 40, 30, 20, 90), timedelta(hours=1))
+
+        # Longer than the wall time, so on its own
+        self.assertEqual(submissions[0], [[(timedelta(minutes=90), 5)]])
+
+        for submission in submissions:
+            self.assertEqual(len(submission), 1)
+
+        self.assertEqual(sorted(job for submission in submissions for lane in submission for (t, job) in lane), list(range(6)))
+        self.assertEqual(len(submissions), 4)
+
+    def test_pack_lanes(self):
+        submissions = pack(minutes(30, 30, 30, 30, 20, 10), timedelta(hours=1), lanes=2)
+
+        self.assertEqual(len(submissions), 2)
+        self.assertEqual([len(submission) for submission in submissions], [2, 2])
+
+    def test_submissions(self):
+        directory = tempfile.mkdtemp()
+        old_cwd = os.getcwd()
+        os.chdir(directory)
+
+        try:
+            runner = RecordingRunner("qsub -l walltime={} -N \"{}\"", "cd $PBS_O_WORKDIR", 12,
+                                     max_walltime=timedelta(hours=48),
+                                     pack_walltime=timedelta(hours=2), pack_lanes=2)
+            runner.commands = []
+
+            self.assertEqual(runner.job_thread_count, 6)
+
+            for (i, estimate) in enumerate((30, 40, 50, None)):
+                os.makedirs(f"cluster/algo/job{i}")
+                estimated_time = None if estimate is None else timedelta(minutes=estimate)
+                runner.add_job(f"algorithm.algo tossim CLUSTER --seed {i}", f"cluster/algo/job{i}.txt", estimated_time)
+
+            # Jobs without an estimate are submitted straight away
+            self.assertEqual(len(runner.commands), 1)
+            self.assertIn("walltime=48:00:00", runner.commands[0])
+
+            runner.finish()
+
+            self.assertEqual(len(runner.commands), 2)
+
+            command = runner.commands[1]
+            self.assertIn("walltime=01:10:00", command)
+            self.assertIn('-N "cluster.algo.job2+2"', command)
+            self.assertIn(' & wait', command)
+            self.assertEqual(command.count("run.py"), 3)
+        finally:
+            os.chdir(old_cwd)
+            shutil.rmtree(directory)
+
+    def test_walltime(self):
+        self.assertEqual(type_walltime("01:10:00"), timedelta(hours=1, minutes=10))
+        self.assertEqual(type_walltime("48:00:00"), timedelta(hours=48))
+
+        with self.assertRaises(Exception):
+            type_walltime("01:70:00")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+from __future__ import print_function, division
+
+from collections import Counter
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import data.columnar as columnar
+from simulator.MetricsCommon import MetricsCommon
+
+HEADINGS = ["Seed", "Captured", "NormalLatency", "DutyCycleStart", "SentHeatMap", "DutyCycle", "Errors", "AttackerDistance"]
+
+def _row(seed):
+    sent = dict(Counter({(seed + i) % 7: i * 3 for i in range(5)}))
+    duty_cycle = {i: i / 3 for i in range(4)}
+    duty_cycle[2] = 4.0
+
+    return "|".join([
+        str(seed),
+        str(seed % 2 == 0),
+        repr(seed * 0.1),
+        "None" if seed % 3 else repr(1.5),
+        MetricsCommon.compressed_dict_str(sent),
+        MetricsCommon.smaller_dict_str(duty_cycle),
+        MetricsCommon.smaller_dict_str({}),
+        str({(0, 1): seed}),
+    ])
+
+LINES = [
+    "@version:python=3.11",
+    "configuration=SourceCorner",
+    "#" + "|".join(HEADINGS),
+] + [_row(seed) for seed in range(1, 7)] + [
+    "@meta:determinism=pass",
+    "Time taken: 0:00:01",
+]
+
+class TestColumnarResults(unittest.TestCase):
+
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp(suffix=columnar.EXTENSION)
+        os.close(fd)
+
+        columnar.write_columnar(self.path, (line + "\n" for line in LINES))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_lossless(self):
+        with columnar.ColumnarResults(self.path) as results:
+            self.assertEqual(list(results.lines()), LINES)
+
+    def test_column_kinds(self):
+        with columnar.ColumnarResults(self.path) as results:
+            self.assertEqual([results.kinds[heading] for heading in HEADINGS],
+                             ["int", "bool", "float", "float", "compressed_node_dict", "node_dict", "node_dict", "text"])
+
+            self.assertEqual(results.node_dicts("DutyCycle")[0], {0: 0.0, 1: 1/3, 2: 4.0, 3: 1.0})
+            self.assertEqual(results.node_dicts("SentHeatMap")[0], {1: 0.0, 2: 3.0, 3: 6.0, 4: 9.0, 5: 12.0})
+            self.assertEqual(results.values("Seed").tolist(), list(range(1, 7)))
+    def test_dataframe(self):
+        def parse_none(cell):
+            return float('NaN') if cell == "None" else float(cell)
+
+        def parse_dict(cell):
+            raise AssertionError("Should not need to parse node dicts")
+
+        with columnar.ColumnarResults(self.path) as results:
+            df = columnar.dataframe(results, ["Seed", "DutyCycleStart", "DutyCycle", "AttackerDistance"],
+                                    dtype={"Seed": np.uint32},
+                                    converters={"DutyCycleStart": parse_none, "DutyCycle": parse_dict, "AttackerDistance": len},
+                                    node_dict_converters=(parse_dict,))
+
+        self.assertEqual(df["Seed"].dtype, np.uint32)
+        self.assertEqual(df["DutyCycleStart"].isnull().tolist(), [True, True, False, True, True, False])
+
+        # The node dict converter is not needed, as the dicts come from the dense arrays
+        self.assertEqual(df["DutyCycle"][0], {0: 0.0, 1: 1/3, 2: 4.0, 3: 1.0})
+        self.assertEqual(df["AttackerDistance"][0], len(_row(1).split("|")[7]))
+
+if __name__ == "__main__":
+    unittest.main()
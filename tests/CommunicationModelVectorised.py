@@ -0,0 +1,47 @@
+from __future__ import print_function, division
+
+import unittest
+
+import numpy as np
+
+import simulator.CommunicationModel as CM
+import simulator.Configuration
+
+class TestCommunicationModelVectorised(unittest.TestCase):
+
+    def _setup(self, cm, seed):
+        configuration = simulator.Configuration.create_specific('SourceCorner', 11, 4.5, "topology", None)
+        topology = configuration.topology
+
+        nodes = [(topology.o2i(oid).nid, coords) for (oid, coords) in topology.nodes.items()]
+
+        cm._setup_vectorised(topology, nodes, np.random.default_rng(seed))
+
+        return len(nodes)
+
+    def test_deterministic(self):
+        for seed in [-109, -1, 0, 45]:
+            cm1 = CM.eval_input("low-asymmetry-v2")
+            cm2 = CM.eval_input("low-asymmetry-v2")
+
+            self._setup(cm1, abs(seed))
+            self._setup(cm2, abs(seed))
+
+            np.testing.assert_array_equal(cm1.link_gain, cm2.link_gain)
+            np.testing.assert_array_equal(cm1.noise_floor, cm2.noise_floor)
+
+    def test_no_asymmetry_is_symmetric(self):
+        cm = CM.eval_input("no-asymmetry-v2")
+
+        num_nodes = self._setup(cm, 44)
+
+        self.assertEqual(cm.link_gain.shape, (num_nodes, num_nodes))
+        np.testing.assert_array_equal(cm.link_gain, cm.link_gain.T)
+        np.testing.assert_array_equal(cm.noise_floor, np.full(num_nodes, cm.noise_floor_pn))
+
+    def test_version_recorded(self):
+        self.assertEqual(CM.eval_input("low-asymmetry").generator_version, 1)
+        self.assertEqual(CM.eval_input("low-asymmetry-v2").generator_version, 2)
+
+if __name__ == "__main__":
+    unittest.main()
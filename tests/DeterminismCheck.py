@@ -0,0 +1,65 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import simulator.DeterminismCheck as DeterminismCheck
+
+HEADINGS = ["Seed", "Sent", "Received", "Delivered", "Captured", "FirstNormalSentTime", "WallTime", "EventCount"]
+
+def _output(seed, sent, wall_time):
+    return f"{seed}|{sent}|10|9|False|1.5|{wall_time}|1000\n"
+
+class TestDeterminismCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.old_cache_dir = os.environ.get("SLP_DETERMINISM_CACHE_DIR")
+        os.environ["SLP_DETERMINISM_CACHE_DIR"] = self.cache_dir
+
+    def tearDown(self):
+        if self.old_cache_dir is None:
+            del os.environ["SLP_DETERMINISM_CACHE_DIR"]
+        else:
+            os.environ["SLP_DETERMINISM_CACHE_DIR"] = self.old_cache_dir
+
+        shutil.rmtree(self.cache_dir)
+
+    def test_once_per_build(self):
+        check = DeterminismCheck.DeterminismCheck("once-per-build", build_hash="abc")
+        self.assertEqual(check.seeds(), [100, 100, 44, 44])
+
+        # Wall time is allowed to differ
+        outputs = [_output(100, 5, 0.1), _output(100, 5, 0.2), _output(44, 7, 0.3), _output(44, 7, 0.4)]
+        self.assertEqual(check.check(HEADINGS, outputs), [])
+        self.assertEqual(check.verdict, "pass")
+
+        check = DeterminismCheck.DeterminismCheck("once-per-build", build_hash="abc")
+        self.assertEqual(check.seeds(), [])
+        self.assertEqual(check.verdict, "pass")
+
+        check = DeterminismCheck.DeterminismCheck("once-per-build", build_hash="def")
+        self.assertEqual(check.seeds(), [100, 100, 44, 44])
+
+    def test_failure_not_cached(self):
+        check = DeterminismCheck.DeterminismCheck("once-per-build", build_hash="abc")
+
+        outputs = [_output(100, 5, 0.1), _output(100, 6, 0.2), _output(44, 7, 0.3), ""]
+        self.assertEqual(check.check(HEADINGS, outputs), [100])
+        self.assertEqual(check.verdict, "fail")
+
+        check = DeterminismCheck.DeterminismCheck("once-per-build", build_hash="abc")
+        self.assertEqual(check.seeds(), [100, 100, 44, 44])
+
+    def test_disabled_and_sampled(self):
+        self.assertEqual(DeterminismCheck.DeterminismCheck("disabled").seeds(), [])
+        self.assertEqual(DeterminismCheck.DeterminismCheck("sampled", rate=0.0).seeds(), [])
+        self.assertEqual(DeterminismCheck.DeterminismCheck("sampled", rate=1.0).seeds(), [100, 100, 44, 44])
+
+        with self.assertRaises(RuntimeError):
+            DeterminismCheck.DeterminismCheck("sampled", rate=2.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+from __future__ import print_function, division
+
+import itertools
+import unittest
+
+import simulator.Configuration
+from simulator.Configuration import DIRECTION_FROM_FURTHER_HOPS, DIRECTION_FROM_FURTHER_METERS
+
+class TestDirectionTable(unittest.TestCase):
+
+    def test_matches_distances(self):
+        configuration = simulator.Configuration.create_specific('SourceCorner', 7, 4.5, "randomised", 44)
+        topology = configuration.topology
+
+        for (source_id, sender, receiver) in itertools.product(configuration.source_ids, topology.nodes, topology.nodes):
+            table = configuration.direction_table(source_id)
+
+            direction = table[topology.o2i(sender).nid, topology.o2i(receiver).nid]
+
+            from_further_hops = configuration.node_distance(source_id, receiver) < configuration.node_distance(source_id, sender)
+            from_further_meters = configuration.node_distance_meters(source_id, receiver) < configuration.node_distance_meters(source_id, sender)
+
+            self.assertEqual(bool(direction & DIRECTION_FROM_FURTHER_HOPS), from_further_hops)
+            self.assertEqual(bool(direction & DIRECTION_FROM_FURTHER_METERS), from_further_meters)
+
+    def test_lazy(self):
+        configuration = simulator.Configuration.create_specific('SourceCorner', 5, 4.5, "topology", None)
+
+        configuration.build_direction_tables(lazy=True)
+        self.assertEqual(configuration._direction_tables, {})
+
+        configuration.build_direction_tables()
+        self.assertEqual(set(configuration._direction_tables), configuration.source_ids)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+from __future__ import print_function, division
+
+import unittest
+
+from simulator.EventDecoder import EventDecoder
+
+class TestEventDecoding(unittest.TestCase):
+
+    def test_decode_deliver(self):
+        decoder = EventDecoder()
+
+        event = decoder.decode("M-CD", "D", "4", "1.5", "Normal,65535,3,1,12,-74,108,0102FF")
+
+        self.assertEqual(event.node_id, 4)
+        self.assertEqual(event.time, 1.5)
+        self.assertEqual(event.kind, "Normal")
+        self.assertEqual((event.proximate_source_id, event.ultimate_source_id, event.sequence_number), (3, 1, 12))
+        self.assertEqual((event.rssi, event.lqi), (-74, 108))
+        self.assertEqual(event.hex_buffer, "0102FF")
+
+    def test_decoded_once(self):
+        decoder = EventDecoder()
+        dispatcher = decoder.dispatcher("M-G")
+
+        seen = []
+
+        dispatcher.add(seen.append, decoded=True)
+        dispatcher.add(lambda *args: seen.append(args))
+        dispatcher.add(seen.append, decoded=True)
+
+        dispatcher.process_line("D:2:3.25:1001,a,b,c\n")
+
+        self.assertIs(seen[0], seen[2])
+        self.assertEqual(seen[0].data, "a,b,c")
+        self.assertEqual(seen[1], ("D", "2", "3.25", "1001,a,b,c"))
+        self.assertEqual(decoder.counts["M-G"], 1)
+
+    def test_malformed(self):
+        decoder = EventDecoder()
+
+        with self.assertRaises(RuntimeError):
+            decoder.decode("M-CR", "D", 1, 0.0, "Normal,2,1")
+
+        self.assertEqual(decoder.failures["M-CR"], 1)
+        self.assertEqual(decoder.counts["M-CR"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from simulator.OfflineLogConverter import FitIotLab
+
+class TestFitIotLabConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.directory, "serial.log")
+
+        # The second and third lines are logged out of order
+        lines = [
+            "1500000000.000100;m3-1;Metric-COMM:D:1:100:DELIVER:Normal,1",
+            "1500000000.000300;m3-2;Metric-COMM:D:2:None:DELIVER:Normal,2",
+            "1500000000.000200;m3-3;Metric-COMM:E:3:300:BCAST:Normal,3",
+            "1500000000.000400;m3-4;Connection closed",
+            "not a log line",
+            "1500000000.000500;m3-1;stdout:D:1:500:hello",
+        ]
+
+        with open(self.log_path, "w") as log_file:
+            for line in lines:
+                print(line, file=log_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ordered(self):
+        with FitIotLab(self.log_path, reorder_lines=2) as converter:
+            events = list(converter)
+
+            self.assertEqual([event.time_us for event in events],
+                             [1500000000000100, 1500000000000200, 1500000000000300, 1500000000000500])
+            self.assertEqual(tuple(events[1]), (1500000000000200, "Metric-COMM", 300, "E", 3, "BCAST:Normal,3"))
+            self.assertEqual(events[2].node_local_time, None)
+
+            self.assertEqual((converter.parsed_lines, converter.malformed_lines, converter.late_lines), (4, 2, 0))
+
+    def test_late_lines(self):
+        with FitIotLab(self.log_path, reorder_lines=0) as converter:
+            events = list(converter)
+
+            self.assertEqual(len(events), 4)
+            self.assertEqual(converter.late_lines, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+from __future__ import print_function, division
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from simulator.OfflineLogConverter import FlockLab
+
+class TestFlockLabConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        rng = random.Random(3)
+
+        self.expected = []
+
+        # Grouped by observer, with the times of each observer out of order
+        with open(os.path.join(self.directory, "serial.csv"), "w") as serial:
+            print("# timestamp,observer_id,node_id,direction,output", file=serial)
+
+            for observer_id in range(1, 6):
+                for n in range(40):
+                    timestamp = 1500000000 + rng.randint(0, 100000) / 1000
+                    output = f"Metric-COMM:D:{observer_id}:{n}:DELIVER:Normal,{n}"
+
+                    print(f"{timestamp:.6f},{observer_id},{observer_id},r,{output}", file=serial)
+                    self.expected.append((round(timestamp * 1000000), output))
+
+        with open(os.path.join(self.directory, "gpiotracing.csv"), "w") as gpiotracing:
+            print("# timestamp,observer_id,node_id,pin_name,value", file=gpiotracing)
+
+            print("1500000050.000000,2,2,LED1,1", file=gpiotracing)
+            self.expected.append((1500000050000000, "LedsC:D:2:None:0,on"))
+
+        self.expected.sort(key=lambda record: record[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _merge(self, memory_lines):
+        with FlockLab(os.path.join(self.directory, "serial.csv"), memory_lines=memory_lines) as converter:
+            return (list(converter), converter.spilled_runs)
+
+    def test_in_memory(self):
+        (lines, spilled_runs) = self._merge(memory_lines=1000)
+
+        self.assertEqual(lines, self.expected)
+        self.assertEqual(spilled_runs, 0)
+
+    def test_spilled(self):
+        (lines, spilled_runs) = self._merge(memory_lines=15)
+
+        self.assertEqual(lines, self.expected)
+        self.assertGreater(spilled_runs, 5)
+
+    def test_spill_removed_after_iterating(self):
+        converter = FlockLab(os.path.join(self.directory, "serial.csv"), memory_lines=15)
+
+        temp_dirs = []
+        real_mkdtemp = tempfile.mkdtemp
+
+        def mkdtemp(**kwargs):
+            temp_dirs.append(real_mkdtemp(dir=self.directory, **kwargs))
+            return temp_dirs[-1]
+
+        with mock.patch("tempfile.mkdtemp", mkdtemp):
+            # Each iteration spills to its own directory, which is removed when it finishes
+            self.assertEqual(list(converter), self.expected)
+            self.assertEqual(list(converter), self.expected)
+
+            lines = iter(converter)
+            next(lines)
+            lines.close()
+
+        self.assertEqual(len(temp_dirs), 3)
+        self.assertFalse(any(os.path.exists(temp_dir) for temp_dir in temp_dirs))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from __future__ import print_function, division
+
+import os
+import sys
+import tempfile
+import threading
+import types
+import unittest
+
+from run import _ForkServer
+
+class FakeArguments(object):
+    def parse(self, args):
+        self.args = types.SimpleNamespace(seed=int(args[args.index('--seed') + 1]))
+
+class FakeSim(object):
+    def __init__(self):
+        self.prepared = 0
+
+    def prepare_fork_server(self, module, a):
+        self.prepared += 1
+        return {"prepared": os.getpid()}
+
+    @staticmethod
+    def run_simulation(module, a, prepared):
+        seed = a.args.seed
+
+        print(f"seed={seed} prepared_in_parent={prepared == os.getppid()}")
+
+        if seed < 0:
+            raise RuntimeError("bad seed")
+
+        return 0
+
+class TestForkServer(unittest.TestCase):
+
+    def setUp(self):
+        self.results = []
+        self.sim = FakeSim()
+        self.server = _ForkServer(self.sim, "algorithm.fake", FakeArguments(),
+                                  ["algorithm.fake", "--seed", "1"], self._report_result, threading.Lock())
+
+    def _report_result(self, args, returncode, stdoutdata, stderrdata):
+        self.results.append((args, returncode, stdoutdata, stderrdata))
+
+    def test_runs_each_seed(self):
+        outputs = [self.server(seed) for seed in (5, 7)]
+
+        self.assertEqual(self.sim.prepared, 1)
+        self.assertEqual(outputs, ["seed=5 prepared_in_parent=True\n", "seed=7 prepared_in_parent=True\n"])
+        self.assertEqual([(args, returncode) for (args, returncode, _, _) in self.results],
+                         [("fork-server seed=5", 0), ("fork-server seed=7", 0)])
+
+    def test_failing_child(self):
+        self.server(-1)
+
+        (_, returncode, stdoutdata, stderrdata) = self.results[0]
+
+        self.assertEqual(returncode, 1)
+        self.assertEqual(stdoutdata, "seed=-1 prepared_in_parent=True\n")
+        self.assertIn("RuntimeError: bad seed", stderrdata)
+
+    def test_buffered_output_not_duplicated(self):
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+
+        stdout = sys.stdout
+
+        try:
+            with open(path, "w") as out:
+                sys.stdout = out
+
+                # Left in the buffer, so only the parent should write this
+                print("from the parent", end="", file=out)
+
+                output = self.server(3)
+
+                out.flush()
+
+            with open(path) as f:
+                self.assertEqual(f.read(), "from the parent")
+
+            self.assertEqual(output, "seed=3 prepared_in_parent=True\n")
+
+        finally:
+            sys.stdout = stdout
+            os.remove(path)
+
+if __name__ == "__main__":
+    unittest.main()
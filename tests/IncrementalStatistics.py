@@ -0,0 +1,59 @@
+from __future__ import print_function, division
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data.util import RunningMoments, QuantileSketch
+
+class TestRunningMoments(unittest.TestCase):
+
+    def test_combine_matches_pandas(self):
+        rng = np.random.RandomState(4)
+        values = rng.exponential(size=500)
+
+        moments = RunningMoments()
+        for chunk in np.array_split(values, 7):
+            that = RunningMoments()
+            that.push_many(chunk)
+            moments = moments.combine(that)
+
+        series = pd.Series(values)
+
+        self.assertEqual(moments.n, len(values))
+        self.assertAlmostEqual(moments.mean(), series.mean())
+        self.assertAlmostEqual(moments.var(), series.var())
+        self.assertAlmostEqual(moments.skew(), series.skew())
+        self.assertAlmostEqual(moments.kurt(), series.kurt())
+        self.assertEqual((moments.min, moments.max), (series.min(), series.max()))
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def test_exact_for_few_distinct_values(self):
+        rng = np.random.RandomState(5)
+        values = rng.randint(0, 300, size=5000)
+
+        sketch = QuantileSketch()
+        for chunk in np.array_split(values, 9):
+            sketch.push_many(chunk)
+
+        self.assertTrue(sketch.exact)
+        for q in (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0):
+            self.assertEqual(sketch.quantile(q), np.quantile(values, q))
+
+    def test_approximate_for_many_distinct_values(self):
+        rng = np.random.RandomState(6)
+        values = rng.normal(size=20000)
+
+        sketch = QuantileSketch()
+        for chunk in np.array_split(values, 20):
+            sketch.push_many(chunk)
+
+        self.assertFalse(sketch.exact)
+        self.assertLess(len(sketch.means), len(values) // 10)
+        for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+            self.assertAlmostEqual(sketch.quantile(q), np.quantile(values, q), places=2)
+
+if __name__ == "__main__":
+    unittest.main()
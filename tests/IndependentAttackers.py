@@ -0,0 +1,144 @@
+from __future__ import print_function, division
+
+from collections import OrderedDict
+import io
+import types
+import unittest
+
+import simulator.Attacker as Attacker
+import simulator.Configuration as Configuration
+from simulator.AttackerConfiguration import IndependentAttackers, MultipleAttackers
+from simulator.MetricsCommon import MetricsCommon
+from simulator.Simulation import Simulation
+
+class RecordingAttacker(Attacker.Attacker):
+    def setup(self, sim, ident, group=None):
+        self._sim = sim
+        self.ident = ident
+        self.group = group
+
+    def __str__(self):
+        return "RecordingAttacker()"
+
+class RecordingCollaborativeAttacker(Attacker.CollaborativeSeqNosReactiveAttacker):
+    setup = RecordingAttacker.setup
+
+    def __str__(self):
+        return "RecordingCollaborativeAttacker()"
+
+class FakeSim(object):
+    def __init__(self, attacker_model):
+        self.args = types.SimpleNamespace(attacker_model=attacker_model)
+        self.attackers = []
+        self.attacker_groups = []
+        self.attacker_found_source = False
+        self.time = 0.0
+
+    # Use the simulation's own attacker group handling
+    add_attacker = Simulation.add_attacker
+    add_attacker_group = Simulation.add_attacker_group
+    attacker_group_found_source = Simulation.attacker_group_found_source
+
+    def register_output_handler(self, name, function, decoded=False):
+        pass
+
+    def sim_time(self):
+        return self.time
+
+    def any_attacker_found_source(self):
+        return self.attacker_found_source
+
+class Metrics(MetricsCommon):
+    @staticmethod
+    def items():
+        d = OrderedDict()
+        d["Sent"]                          = lambda x: x.total_sent()
+        d["Captured"]                      = lambda x: x.captured()
+        d["TimeTaken"]                     = lambda x: x.sim_time()
+        d["EventCount"]                    = lambda x: x.event_count
+        d["AttackerMoves"]                 = lambda x: x.attacker_moves()
+        return d
+
+class TestIndependentAttackers(unittest.TestCase):
+
+    def setUp(self):
+        self.attacker_model = IndependentAttackers(
+            RecordingAttacker(),
+            MultipleAttackers(RecordingAttacker(), RecordingAttacker()))
+
+        self.sim = FakeSim(self.attacker_model)
+        self.attacker_model.setup(self.sim)
+
+        configuration = Configuration.create("SourceCorner", {"network size": 5, "distance": 4.5, "node id order": "topology", "seed": None})
+
+        self.sim.metrics = Metrics(self.sim, configuration)
+
+    def _send(self, count):
+        self.sim.metrics.sent[0]["Normal"] += count
+
+    def test_unique_idents(self):
+        self.assertEqual([attacker.ident for attacker in self.sim.attackers], [0, 1, 2])
+        self.assertEqual([[attacker.ident for attacker in group.attackers] for group in self.sim.attacker_groups], [[0], [1, 2]])
+
+    def test_results_cut_at_capture(self):
+        for attacker in self.sim.attackers:
+            attacker.moves = 1
+
+        (first, second) = self.sim.attacker_groups
+
+        self._send(3)
+        self.sim.time = 5.0
+        self.sim.attacker_group_found_source(second)
+
+        self.assertFalse(self.sim.attacker_found_source)
+
+        self._send(4)
+        self.sim.time = 10.0
+        self.sim.metrics.event_count = 20
+
+        for attacker in self.sim.attackers:
+            attacker.moves += 1
+
+        out = io.StringIO()
+        self.sim.metrics.print_results(stream=out)
+
+        # Every item is cut, apart from those about the simulation process
+        self.assertEqual(out.getvalue().splitlines(), [
+            f"{first.name}|7|False|10.0|20|{{0: 2}}",
+            f"{second.name}|3|True|5.0|20|{{1: 1, 2: 1}}",
+        ])
+
+    def test_last_capture_ends_run(self):
+        (first, second) = self.sim.attacker_groups
+
+        self.sim.time = 5.0
+        self.sim.attacker_group_found_source(first)
+        self.sim.time = 8.0
+        self.sim.attacker_group_found_source(second)
+
+        self.assertTrue(self.sim.attacker_found_source)
+        self.assertEqual((first.capture_time, second.capture_time), (5.0, 8.0))
+
+        # The results of the last group are those at the end of the run
+        self.assertEqual(list(self.sim.metrics.attacker_group_capture_results.keys()), [first.ident])
+
+    def test_collaborative_groups_independent(self):
+        attacker_model = IndependentAttackers(
+            RecordingAttacker(),
+            MultipleAttackers(RecordingCollaborativeAttacker(), RecordingCollaborativeAttacker()),
+            MultipleAttackers(RecordingCollaborativeAttacker(), RecordingCollaborativeAttacker()))
+
+        sim = FakeSim(attacker_model)
+        attacker_model.setup(sim)
+
+        (_, (a1, a2), (b1, b2)) = [group.attackers for group in sim.attacker_groups]
+
+        a1.update_state(1.0, "Normal", 3, 2, 0, 5)
+
+        # Only the attacker in the same group does not respond to the same message
+        self.assertFalse(a2.move_predicate(1.0, "Normal", 4, 2, 0, 5))
+        self.assertTrue(b1.move_predicate(1.0, "Normal", 4, 2, 0, 5))
+        self.assertTrue(b2.move_predicate(1.0, "Normal", 4, 2, 0, 5))
+
+if __name__ == "__main__":
+    unittest.main()
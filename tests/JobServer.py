@@ -0,0 +1,97 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from data.run.driver.local import PooledRunner
+
+# Stands in for run.py, each run records when it starts and finishes
+FAKE_JOB = """
+import fcntl, os, sys, threading, time
+from multiprocessing.pool import ThreadPool
+
+from simulator.JobServer import JobServerClient
+
+(job_size, events) = (int(sys.argv[2]), sys.argv[3])
+
+job_server = JobServerClient.from_environment()
+job_server.acquire_build_lock()
+job_server.release_build_lock()
+
+def record(event):
+    with open(events, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(event + "\\n")
+
+def run(seed):
+    with job_server.slot():
+        record("+")
+        time.sleep(0.05)
+        record("-")
+    return f"{sys.argv[4]}|{seed}"
+
+for line in ThreadPool(4).map(run, range(job_size)):
+    print(line)
+"""
+
+class TestPooledRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.events = os.path.join(self.directory, "events")
+
+        script = os.path.join(self.directory, "fake_run.py")
+        with open(script, "w") as f:
+            f.write(FAKE_JOB)
+
+        self.old_cwd = os.getcwd()
+        os.chdir(self.directory)
+
+        repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.old_pythonpath = os.environ.get("PYTHONPATH")
+        os.environ["PYTHONPATH"] = repository
+
+        self.runner = PooledRunner(worker_count=2, max_active_jobs=3)
+        self.runner.executable = f"{sys.executable} {script}"
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+
+        if self.old_pythonpath is None:
+            del os.environ["PYTHONPATH"]
+        else:
+            os.environ["PYTHONPATH"] = self.old_pythonpath
+
+        shutil.rmtree(self.directory)
+
+    def test_slots_shared_between_jobs(self):
+        names = [os.path.join(self.directory, f"job{i}.txt") for i in range(3)]
+
+        for (i, name) in enumerate(names):
+            self.runner.add_job(f'--job-size "{i + 2}" {self.events} {i}', name, None)
+
+        self.runner.finish()
+
+        for (i, name) in enumerate(names):
+            with open(name) as f:
+                self.assertEqual(sorted(f.read().split()), [f"{i}|{seed}" for seed in range(i + 2)])
+
+        # Each job has 4 threads, but only 2 runs happen at once across all the jobs
+        running = 0
+        most_running = 0
+        with open(self.events) as f:
+            for event in f.read().split():
+                running += 1 if event == "+" else -1
+                most_running = max(most_running, running)
+
+        self.assertEqual(most_running, 2)
+
+    def test_job_size(self):
+        self.assertEqual(PooledRunner._job_size('algorithm.x tossim PARALLEL --job-size "5" --seed "1"'), 5)
+        self.assertEqual(PooledRunner._job_size('algorithm.x tossim PARALLEL'), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+from __future__ import print_function, division
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from data.scheduler import MemoryAwareScheduler
+
+def _analyse(path):
+    with open(path) as f:
+        text = f.read()
+
+    if text.startswith("bad"):
+        raise RuntimeError("bad file")
+
+    # Use some memory in proportion to the file size
+    data = bytearray(len(text) * 20)
+
+    return (len(text), os.getpid(), len(data))
+
+class TestMemoryAwareScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_largest_first_with_reused_workers(self):
+        paths = [self._write(f"{size}.txt", "x" * size) for size in (10, 100000, 1000, 1000000)]
+
+        scheduler = MemoryAwareScheduler(_analyse, nprocs=1)
+        results = list(scheduler.run(paths))
+
+        self.assertEqual([result[0] for result in results], [os.path.join(self.directory, name) for name in ("1000000.txt", "100000.txt", "1000.txt", "10.txt")])
+        self.assertTrue(all(error is None for (path, result, error) in results))
+
+        # Files are small enough that the one worker is reused
+        self.assertEqual(len({result[1] for (path, result, error) in results}), 1)
+
+        out = io.StringIO()
+        scheduler.report(stream=out)
+        self.assertIn("over 4 files", out.getvalue())
+
+    def test_errors_and_memory_limit(self):
+        paths = [self._write("good.txt", "x" * 100), self._write("bad.txt", "bad")]
+
+        # The limit is too small for any file, so only one file is analysed at a time
+        scheduler = MemoryAwareScheduler(_analyse, nprocs=2, memory_limit=1)
+        results = {path: (result, error) for (path, result, error) in scheduler.run(paths)}
+
+        self.assertIsNone(results[paths[0]][1])
+        self.assertEqual(results[paths[0]][0][0], 100)
+
+        (ex, tb) = results[paths[1]][1]
+        self.assertIsInstance(ex, RuntimeError)
+        self.assertIn("bad file", tb)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import simulator.NoiseModel as NoiseModel
+
+class TestNoiseModelCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.old_cache_dir = os.environ.get("SLP_NOISE_CACHE_DIR")
+        os.environ["SLP_NOISE_CACHE_DIR"] = self.cache_dir
+
+    def tearDown(self):
+        if self.old_cache_dir is None:
+            del os.environ["SLP_NOISE_CACHE_DIR"]
+        else:
+            os.environ["SLP_NOISE_CACHE_DIR"] = self.old_cache_dir
+
+        shutil.rmtree(self.cache_dir)
+
+    def test_same_as_parsed(self):
+        for name in ["meyer-heavy", "casino-lab"]:
+            model = NoiseModel.eval_input(name)
+
+            expected = list(model._read_noise_from_file())[:model.count]
+
+            # First read creates the cache, the second uses it
+            self.assertEqual(model.read_noise().tolist(), expected)
+            self.assertEqual(model.read_noise().tolist(), expected)
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+from __future__ import print_function, division
+
+import contextlib
+from datetime import datetime
+import io
+import types
+import unittest
+
+from simulator import Configuration
+from simulator.FaultModel import ReliableFaultModel
+from simulator.Simulation import OfflineLineParser, OfflineEvent, OfflineSimulation, log_events
+from simulator.sim.cooja import cooja_events
+
+LINES = [
+    "2016/07/27 14:47:34.418000|Metric-COMM:D:2:42202:DELIVER:Normal,4,1,1,22\n",
+    "2016/07/27 23:59:59.999999|Metric-RCV:D:12:None:Normal,3,1,7\n",
+    "2016/07/28 00:00:00.000001|stdout:E:None:None:Something: went wrong",
+    "None|LedsC:D:3:None:0,on",
+    (datetime(2017, 1, 2, 3, 4, 5, 678901), "M-NC:D:4:100:1,SourceNode"),
+]
+
+class TestOfflineLineParser(unittest.TestCase):
+
+    def test_fast_path_matches_fallback(self):
+        parser = OfflineLineParser()
+
+        for line in LINES:
+            self.assertIsNotNone(parser.parse_fast(line))
+            self.assertEqual(parser.parse_fast(line), parser.parse_fallback(line))
+
+    def test_microseconds(self):
+        parser = OfflineLineParser()
+
+        (first, second) = (parser(LINES[1])[0], parser(LINES[2])[0])
+
+        self.assertIsInstance(first, int)
+        self.assertEqual(second - first, 2)
+        self.assertEqual(parser(LINES[0]), (1469630854418000, "Metric-COMM", 42202, "D", 2, "DELIVER:Normal,4,1,1,22"))
+
+    def test_fallback(self):
+        parser = OfflineLineParser()
+
+        # A shorter fraction of a second than the fast path handles
+        line = "2016/07/27 14:47:34.418|Metric-COMM:D:2:42202:DELIVER:Normal,4,1,1,22"
+
+        self.assertIsNone(parser.parse_fast(line))
+        self.assertEqual(parser(line), parser(LINES[0]))
+
+        self.assertIsNone(parser("2016/07/27 14:47:34.418000|Not a log line"))
+
+        self.assertEqual((parser.fast_lines, parser.fallback_lines), (1, 2))
+        self.assertIn("fast path 1 lines", parser.throughput())
+
+    def test_log_events(self):
+        parser = OfflineLineParser()
+
+        events = list(log_events([(1000, "Metric-COMM:D:2:42202:DELIVER:Normal"), (2000, "Not a log line")]))
+
+        self.assertEqual(events[0], OfflineEvent(1000, "Metric-COMM", 42202, "D", 2, "DELIVER:Normal"))
+        self.assertIs(parser(events[0]), events[0])
+
+        # Passed on for the fallback parser to reject
+        self.assertEqual(events[1], (2000, "Not a log line"))
+        self.assertIsNone(parser(events[1]))
+
+    def test_unparsable_simulator_event(self):
+        configuration = Configuration.create("SourceCorner", {"network size": 5, "distance": 4.5, "node id order": "topology", "seed": None})
+
+        args = types.SimpleNamespace(seed=1, fault_model=ReliableFaultModel(), sim="cooja", extra_metrics=None,
+                                     mode="SINGLE", verbose=False, low_verbose=False)
+
+        events = cooja_events(["1000|Not a log line", "2000|M-NC:D:0:100:1,SourceNode"])
+
+        sim = OfflineSimulation("algorithm.template", configuration, args, events)
+
+        stderr = io.StringIO()
+
+        with contextlib.redirect_stderr(stderr):
+            with sim:
+                sim.run()
+
+        self.assertIn("Warning unable to parse: '(1000, 'Not a log line')'.", stderr.getvalue())
+        self.assertEqual(sim.metrics.event_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
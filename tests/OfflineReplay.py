@@ -0,0 +1,72 @@
+from __future__ import print_function, division
+
+import contextlib
+import io
+import multiprocessing
+import time
+import types
+import unittest
+from unittest import mock
+
+import simulator.sim.offline as offline
+
+def fake_run_one_file(log_file, module, a, count=1, print_warnings=False):
+    index = int(log_file.split("-")[1])
+
+    # Later files finish first, so rows would be out of order if written as they finish
+    time.sleep(0.01 * (10 - index))
+
+    if log_file.startswith("bad"):
+        raise RuntimeError(f"cannot parse {log_file}")
+
+    print(f"row|{log_file}")
+
+    return 0
+
+class TestOfflineReplay(unittest.TestCase):
+
+    def _run(self, log_files, thread_count):
+        a = types.SimpleNamespace(args=types.SimpleNamespace(log_file=log_files, thread_count=thread_count, mode="SINGLE"))
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+
+        with mock.patch.object(offline, "run_one_file", fake_run_one_file), \
+             contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            result = offline.run_simulation("algorithm.fake", a)
+
+        return (result, stdout.getvalue(), stderr.getvalue())
+
+    def test_rows_in_order(self):
+        log_files = [f"good-{i}" for i in range(8)]
+
+        for thread_count in (None, 1, 2, 4, 8):
+            (result, stdout, stderr) = self._run(log_files, thread_count)
+
+            self.assertEqual(result, 0)
+            self.assertEqual(stdout.splitlines(), [f"row|{log_file}" for log_file in log_files])
+            self.assertEqual(stderr, "")
+
+    def test_sequential_without_thread_count(self):
+        log_files = [f"good-{i}" for i in range(4)]
+
+        # No worker processes are started unless a thread count is given
+        with mock.patch.object(multiprocessing, "get_context", side_effect=AssertionError("started a pool")):
+            (result, stdout, stderr) = self._run(log_files, None)
+
+        self.assertEqual(result, 0)
+        self.assertEqual(stdout.splitlines(), [f"row|{log_file}" for log_file in log_files])
+
+    def test_failing_file(self):
+        log_files = ["good-0", "bad-1", "good-2", "good-3"]
+
+        for thread_count in (1, 4):
+            (result, stdout, stderr) = self._run(log_files, thread_count)
+
+            self.assertEqual(result, 53)
+            self.assertEqual(stdout.splitlines(), ["row|good-0", "row|good-2", "row|good-3"])
+            self.assertIn("Failed to analyse bad-1 due to cannot parse bad-1", stderr)
+            self.assertIn("Failed to analyse 1 of 4 log files: bad-1", stderr)
+
+if __name__ == "__main__":
+    unittest.main()
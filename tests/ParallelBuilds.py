@@ -0,0 +1,78 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import simulator.BuildCache as BuildCache
+from data.run.driver.parallel_build import ParallelBuilds, ScratchDirectory
+
+class TestParallelBuilds(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        self.algorithm = os.path.join(self.directory, "algorithm", "example")
+        self.common = os.path.join(self.directory, "algorithm", "common")
+        os.makedirs(os.path.join(self.algorithm, "build", "micaz"))
+        os.makedirs(self.common)
+
+        self._write(os.path.join(self.algorithm, "Makefile"), "include ../common/makefile.common\n")
+        self._write(os.path.join(self.algorithm, "Source.nc"), "module SourceC {}\n")
+        self._write(os.path.join(self.algorithm, "build", "micaz", "main.exe"), "old build\n")
+        self._write(os.path.join(self.common, "Common.h"), "#define A 1\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def _write(path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_scratch_directory(self):
+        with ScratchDirectory(self.algorithm) as scratch:
+            self.assertNotEqual(scratch.module_path, self.algorithm)
+            self.assertTrue(os.path.isfile(os.path.join(scratch.module_path, "Source.nc")))
+            self.assertFalse(os.path.exists(os.path.join(scratch.module_path, "build")))
+
+            # The shared sources are linked and the build cache sees the same sources
+            common = os.path.join(os.path.dirname(scratch.module_path), "common")
+            self.assertTrue(os.path.islink(common))
+            self.assertEqual(BuildCache.hash_sources(scratch.module_path), BuildCache.hash_sources(self.algorithm))
+
+            # Building in the scratch directory leaves the algorithm alone
+            self._write(os.path.join(scratch.module_path, "Source.nc"), "module ChangedC {}\n")
+
+        self.assertFalse(os.path.exists(scratch.root))
+
+        with open(os.path.join(self.algorithm, "Source.nc")) as f:
+            self.assertEqual(f.read(), "module SourceC {}\n")
+
+    def test_failures_reported_per_job(self):
+        builds = ParallelBuilds(3)
+
+        # Only passed when all three jobs run at the same time
+        barrier = threading.Barrier(3, timeout=10)
+        finished = []
+
+        def build(name):
+            barrier.wait()
+            if name == "bad":
+                raise RuntimeError("make failed")
+            finished.append(name)
+
+        for name in ("a", "bad", "b"):
+            builds.submit(name, build, name)
+
+        with self.assertRaises(RuntimeError) as context:
+            builds.finish()
+
+        self.assertIn("bad", str(context.exception))
+        self.assertEqual([name for (name, ex, tb) in builds.failures], ["bad"])
+        self.assertEqual(sorted(finished), ["a", "b"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from data.run.driver.local import PooledRunner
+from simulator.RunLedger import RunLedger, ledger_path
+
+class TestRunLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.ledger = RunLedger(ledger_path(os.path.join(self.directory, "job-tossim.txt")))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_path(self):
+        self.assertEqual(self.ledger.path, os.path.join(self.directory, "job-tossim.ledger"))
+
+    def test_remaining_after_kill(self):
+        seeds = self.ledger.plan(5)
+        self.assertEqual(len(set(seeds)), 5)
+
+        self.ledger.run(seeds[0], lambda: "result\n")
+        self.ledger.run(seeds[1], lambda: "")
+
+        with self.assertRaises(RuntimeError):
+            self.ledger.run(seeds[2], self._fail)
+
+        # Killed while running, leaving an incomplete line
+        with open(self.ledger.path, "a") as f:
+            f.write(f"start {seeds[3]} 1.0\n")
+            f.write("do")
+
+        self.assertEqual(self.ledger.completed(), 1)
+        self.assertEqual(self.ledger.remaining(), seeds[1:])
+
+        # Resuming only runs the remaining seeds
+        for seed in self.ledger.remaining():
+            self.ledger.run(seed, lambda: "result\n")
+
+        self.assertEqual(self.ledger.completed(), 5)
+
+        with open(self.ledger.path) as f:
+            self.assertIn("\ndo\nstart", f.read())
+        self.assertEqual(self.ledger.remaining(), [])
+
+    def test_only_resumed_jobs_append(self):
+        results = os.path.join(self.directory, "job-tossim.txt")
+        with open(results, "w") as f:
+            f.write("result\n")
+
+        runner = PooledRunner(worker_count=1)
+
+        resumed = f'algorithm.x tossim PARALLEL --ledger "{self.ledger.path}" --ledger-mode "resume"'
+        runner.add_job(resumed, results, None)
+        self.assertEqual(runner._results_file_mode(resumed), 'a')
+
+        # A job with a ledger that is not being resumed must not overwrite the results
+        fresh = f'algorithm.x tossim PARALLEL --ledger "{self.ledger.path}"'
+        with self.assertRaises(RuntimeError):
+            runner.add_job(fresh, results, None)
+        self.assertEqual(runner._results_file_mode(fresh), 'w')
+
+    @staticmethod
+    def _fail():
+        raise RuntimeError("Bad return code")
+
+if __name__ == "__main__":
+    unittest.main()
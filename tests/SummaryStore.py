@@ -0,0 +1,93 @@
+from __future__ import print_function, division
+
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from data.results import Results
+from data.summary_store import SummaryStore, store_path, KIND_RAW, KIND_LITERAL, KIND_DICT
+
+class TestSummaryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "x-results.csv")
+
+        self._write([
+            "network size|repeats|captured|errors",
+            "11|100|{'mean':0.5,'std':nan}|None",
+            "15|200|{'mean':0.25,'std':0.1}|bad value",
+            "11|300|{'mean':0.75,'std':0.2}",
+        ])
+
+    def tearDown(self):
+        SummaryStore._loaded.clear()
+        shutil.rmtree(self.directory)
+
+    def _write(self, lines):
+        with open(self.path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def test_decoded_columns(self):
+        store = SummaryStore.open(self.path)
+
+        self.assertTrue(os.path.exists(store_path(self.path)))
+        self.assertEqual(store.rows[2], {"network size": "11", "repeats": "300", "captured": "{'mean':0.75,'std':0.2}"})
+
+        self.assertEqual(store.column("repeats"), [(KIND_LITERAL, 100), (KIND_LITERAL, 200), (KIND_LITERAL, 300)])
+
+        (kind, captured) = store.column("captured")[0]
+        self.assertEqual(kind, KIND_DICT)
+        self.assertEqual(captured["mean"], 0.5)
+        self.assertTrue(math.isnan(captured["std"]))
+
+        self.assertEqual(store.column("errors"), [(KIND_LITERAL, None), (KIND_RAW, None), None])
+
+        self.assertEqual(store.select(network_size=11), [0, 2])
+        self.assertEqual(store.select(network_size="11", repeats="300"), [2])
+
+    def test_reused_until_changed(self):
+        store = SummaryStore.open(self.path)
+        self.assertIs(SummaryStore.open(self.path), store)
+
+        # Loaded from the file on disk by a new process
+        SummaryStore._loaded.clear()
+        self.assertEqual(SummaryStore.open(self.path).rows, store.rows)
+
+        self._write([
+            "network size|repeats",
+            "21|5",
+        ])
+        os.utime(self.path, ns=(store.stat["mtime_ns"] + 10**9,) * 2)
+
+        store = SummaryStore.open(self.path)
+        self.assertEqual(store.rows, [{"network size": "21", "repeats": "5"}])
+        self.assertEqual(store.column("repeats"), [(KIND_LITERAL, 5)])
+
+    def test_results_not_shared(self):
+        self._write([
+            "network size|configuration|attacker model|noise model|communication model|fault model|distance|node id order|latest node start time|source period|repeats|errors|paths",
+            "11|SourceCorner|SeqNosReactiveAttacker()|casino-lab|low-asymmetry|ReliableFaultModel()|4.5|topology|1.0|0.5|100|{1: 2}|[3, 4]",
+        ])
+
+        def read():
+            results = Results("tossim", self.path, parameters=[], results=("repeats", "errors", "paths"))
+
+            (table,) = results.data.values()
+            return table["0.5"][()]
+
+        # Use the source periods as they are written, rather than parsing them as period models
+        with mock.patch("data.summary_store._source_period", lambda value: value):
+            (repeats, errors, paths) = read()
+
+        errors[5] = 6
+        paths.append(7)
+
+        # The decoded cells are cached, but each Results gets its own values
+        self.assertEqual(read(), (100, {1: 2}, [3, 4]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from __future__ import print_function, division
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from data.time_model import TimeModel, cross_validate
+
+def wall_time(size, period, configuration):
+    return 0.01 * size ** 2 / period * (2.0 if configuration == "SourceCorner" else 1.0)
+
+def make_rows(noise=0.05, seed=1):
+    rng = random.Random(seed)
+
+    rows = []
+    for size in (7, 11, 15, 21):
+        for period in (0.25, 0.5, 1.0, 2.0):
+            for configuration in ("SourceCorner", "SinkCorner"):
+                rows.append({
+                    "network size": str(size),
+                    "source period": str(period),
+                    "configuration": configuration,
+                    "attacker model": "SeqNosReactiveAttacker()",
+                    "wall time": wall_time(size, period, configuration) * rng.lognormvariate(0, noise),
+                    "event count": 1000 * size ** 2 / period,
+                    "repeats": 100,
+                })
+    return rows
+
+class TestTimeModel(unittest.TestCase):
+
+    def test_fit_and_predict(self):
+        model = TimeModel.fit(make_rows())
+
+        args = {"network size": 25, "source period": 0.5, "configuration": "SourceCorner",
+                "attacker model": "SeqNosReactiveAttacker()", "safety factor": 1.0}
+
+        (estimate, lower, upper) = model.predict(args)
+
+        # Extrapolates to a network size that was not in the results
+        self.assertAlmostEqual(estimate / wall_time(25, 0.5, "SourceCorner"), 1, delta=0.1)
+        self.assertLess(lower, estimate)
+        self.assertGreater(upper, estimate)
+
+        (events, lower, upper) = model.predict(args, target="event count")
+        self.assertAlmostEqual(events / (1000 * 25 ** 2 / 0.5), 1, delta=0.01)
+
+    def test_cross_validate(self):
+        accuracy = cross_validate(make_rows(), level=0.9)
+
+        self.assertLess(accuracy["wall time"]["median absolute percentage error"], 10)
+        self.assertGreaterEqual(accuracy["wall time"]["interval coverage"], 75)
+        self.assertEqual(accuracy["wall time"]["predictions"], 32)
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+
+        try:
+            model = TimeModel.fit(make_rows())
+
+            path = os.path.join(directory, "model.json")
+            model.save(path)
+
+            args = make_rows()[3]
+            self.assertEqual(TimeModel.load(path).predict(args), model.predict(args))
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    unittest.main()